@@ -0,0 +1,158 @@
+"""
+基于历史净值的业绩指标计算
+从get_fund_history已抓取的累计净值在本地计算各阶段收益、年化收益、年化波动率、
+最大回撤、夏普比率和卡玛比率，不需要再请求基金档案页。
+所有指标按基金分块做NumPy向量运算，上万只基金的多年数据也能在数秒内算完。
+"""
+
+from typing import Dict, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from panel import build_nav_panel
+
+
+# 阶段收益的窗口，字段名与get_fund_performance从档案页抓取的字段一致
+DEFAULT_WINDOWS = {
+    'monthly_1_return': pd.DateOffset(months=1),
+    'monthly_3_return': pd.DateOffset(months=3),
+    'monthly_6_return': pd.DateOffset(months=6),
+    'yearly_1_return': pd.DateOffset(years=1),
+    'yearly_3_return': pd.DateOffset(years=3),
+    'yearly_5_return': pd.DateOffset(years=5),
+}
+
+
+def _as_panel(data, field: str = 'accumulated_net_value') -> pd.DataFrame:
+    """
+    把各种形式的历史数据统一为 日期 × 基金 的宽表
+    
+    Args:
+        data: 宽表DataFrame（日期索引、基金代码为列），或 {基金代码: NavSeries/历史记录列表}
+        field: 从NavSeries中取的净值列
+    
+    Returns:
+        按日期升序排列的DataFrame
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.sort_index()
+    return build_nav_panel(data, field=field)
+
+
+def _ffill(block: np.ndarray) -> np.ndarray:
+    """沿日期方向前向填充NaN（首个有效值之前保持NaN）"""
+    index = np.where(np.isnan(block), 0, np.arange(len(block))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return block[index, np.arange(block.shape[1])]
+
+
+def _block_metrics(block: np.ndarray, dates: np.ndarray, windows: Mapping[str, pd.DateOffset],
+                   risk_free: float, periods_per_year: int) -> Dict[str, np.ndarray]:
+    """计算一块基金（block的每一列是一只基金）的全部指标"""
+    n_rows, n_cols = block.shape
+    cols = np.arange(n_cols)
+    rows = np.arange(n_rows)[:, None]
+    
+    valid = ~np.isnan(block)
+    has_data = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    last = n_rows - 1 - valid[::-1].argmax(axis=0)
+    
+    # 停牌/节假日缺失的净值用前值填充；基金最后一个净值之后保持NaN，不把已清盘基金算作零波动
+    values = _ffill(block)
+    values[rows > last] = np.nan
+    start_value = values[first, cols]
+    end_value = values[last, cols]
+    
+    metrics = {
+        'start_date': np.where(has_data, dates[first], np.datetime64('NaT')),
+        'end_date': np.where(has_data, dates[last], np.datetime64('NaT')),
+    }
+    
+    # 阶段收益：以每只基金自己的最新净值日为终点，起点取窗口开始当天或之前最近的净值
+    end_dates = pd.DatetimeIndex(dates[last])
+    for name, offset in windows.items():
+        targets = (end_dates - offset).values.astype('datetime64[D]')
+        start = np.searchsorted(dates, targets, side='right') - 1
+        # 成立不足窗口长度的基金没有该阶段收益
+        available = has_data & (start >= first)
+        base = values[np.clip(start, 0, n_rows - 1), cols]
+        metrics[name] = np.where(available, (end_value / base - 1.0) * 100, np.nan)
+    
+    metrics['since_establishment_return'] = np.where(has_data, (end_value / start_value - 1.0) * 100, np.nan)
+    
+    days = (dates[last] - dates[first]).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annual_return = np.where(days > 0, (end_value / start_value) ** (365.0 / np.maximum(days, 1)) - 1.0, np.nan)
+        
+        returns = values[1:] / values[:-1] - 1.0
+        observed = ~np.isnan(returns)
+        count = observed.sum(axis=0)
+        mean = np.where(count > 0, np.nansum(returns, axis=0) / np.maximum(count, 1), np.nan)
+        squares = np.nansum(np.where(observed, returns - mean, 0.0) ** 2, axis=0)
+        std = np.where(count > 1, np.sqrt(squares / np.maximum(count - 1, 1)), np.nan)
+        annual_volatility = std * np.sqrt(periods_per_year)
+        
+        running_max = np.fmax.accumulate(values, axis=0)
+        max_drawdown = np.fmin.reduce(values / running_max - 1.0, axis=0)
+        
+        sharpe = np.where(annual_volatility > 0,
+                          (mean * periods_per_year - risk_free / 100) / annual_volatility, np.nan)
+        calmar = np.where(max_drawdown < 0, annual_return / -max_drawdown, np.nan)
+    
+    metrics.update({
+        'annual_return': annual_return * 100,
+        'annual_volatility': annual_volatility * 100,
+        'max_drawdown': max_drawdown * 100,
+        'sharpe_ratio': sharpe,
+        'calmar_ratio': calmar,
+        'observations': np.where(has_data, last - first + 1, 0),
+    })
+    return metrics
+
+
+def compute_performance(data: Union[pd.DataFrame, Mapping[str, object]],
+                        windows: Optional[Mapping[str, pd.DateOffset]] = None,
+                        risk_free: float = 0.0, periods_per_year: int = 252,
+                        field: str = 'accumulated_net_value',
+                        chunk_size: int = 1024) -> pd.DataFrame:
+    """
+    计算多只基金的业绩指标
+    
+    收益类指标均为百分数（12.5表示12.5%），最大回撤为负数。默认使用累计净值，
+    分红不会被误算为亏损。
+    
+    Args:
+        data: 日期 × 基金 的净值宽表，或 {基金代码: NavSeries/历史记录列表}
+              （get_multiple_funds_history的返回值可直接传入）
+        windows: 阶段收益窗口 {字段名: pd.DateOffset}，默认1/3/6个月和1/3/5年
+        risk_free: 年化无风险利率（百分数，2表示2%），用于夏普比率
+        periods_per_year: 每年的净值期数，用于年化波动率
+        field: 由NavSeries取值时使用的净值列
+        chunk_size: 每次向量计算的基金数，控制临时数组的内存占用
+    
+    Returns:
+        以基金代码为索引的DataFrame，列为各阶段收益、since_establishment_return、
+        annual_return、annual_volatility、max_drawdown、sharpe_ratio、calmar_ratio、
+        start_date、end_date、observations
+    """
+    panel = _as_panel(data, field=field)
+    windows = DEFAULT_WINDOWS if windows is None else windows
+    dates = panel.index.values.astype('datetime64[D]')
+    values = panel.to_numpy()
+    
+    parts = []
+    for lo in range(0, values.shape[1], max(1, chunk_size)):
+        block = np.array(values[:, lo:lo + chunk_size], dtype=np.float64)
+        parts.append(_block_metrics(block, dates, windows, risk_free, periods_per_year))
+    
+    columns = list(windows) + [
+        'since_establishment_return', 'annual_return', 'annual_volatility', 'max_drawdown',
+        'sharpe_ratio', 'calmar_ratio', 'start_date', 'end_date', 'observations',
+    ]
+    if not parts:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='fund_code'))
+    
+    return pd.DataFrame({name: np.concatenate([part[name] for part in parts]) for name in columns},
+                        index=pd.Index(panel.columns, name='fund_code'))
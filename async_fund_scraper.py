@@ -0,0 +1,627 @@
+"""
+基金数据异步抓取引擎
+基于asyncio和aiohttp，适用于成千上万个请求同时在途的大规模抓取场景
+
+解析逻辑与fund_scraper.py完全共用，同步引擎和异步引擎返回的数据结构一致；
+日期区间校验、失败重试、fundgz负缓存和运行统计也与FundScraper相同。
+"""
+
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Iterable, List, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp为可选依赖，仅异步引擎需要
+    aiohttp = None
+
+from http_cache import MissingStore, classify_url
+from rate_limiter import HostRateLimiter
+from records import FundQuote
+from resilience import RETRY_STATUSES, RetryPolicy
+from stats import StatsCollector
+from fund_scraper import (
+    DEFAULT_USER_AGENT,
+    HISTORY_PARSERS,
+    check_date_range,
+    resolve_endpoints,
+    parse_fundgz_response,
+    parse_detail_page,
+    parse_history_meta,
+    parse_history_page,
+    parse_fund_page,
+)
+
+
+class AsyncResponse:
+    """异步请求的响应内容"""
+
+    def __init__(self, content: bytes, encoding: Optional[str] = None):
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class AsyncFundScraper:
+    """基金数据异步抓取器"""
+
+    def __init__(self, timeout: int = 10, delay: float = 0.5, max_concurrency: int = 100,
+                 rate: Optional[float] = None, burst: int = 1,
+                 host_rates: Optional[Dict] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 history_parser: str = 'fast',
+                 endpoints: Optional[Dict[str, str]] = None,
+                 as_records: bool = False, retries: int = 3, backoff: float = 0.5,
+                 collector: Optional[StatsCollector] = None,
+                 missing_store: Optional[MissingStore] = None):
+        """
+        初始化异步爬虫
+        
+        Args:
+            timeout: 请求超时时间（秒）
+            delay: 请求之间的延迟时间（秒），未指定rate时换算为每个主机 1/delay 次/秒
+            max_concurrency: 同时在途的最大请求数，批量抓取时同时处理的基金数也不超过该值
+            rate: 每个主机每秒允许的请求数，优先于delay
+            burst: 每个主机允许的突发请求数
+            host_rates: 针对特定主机的限速，格式同FundScraper
+            rate_limiter: 共享的限流器（如与FundScraper共用），指定后忽略rate/burst/host_rates
+            history_parser: 历史净值表格解析后端，'fast'(lxml)或'bs4'(BeautifulSoup)
+            endpoints: 替换上游接口地址，格式同FundScraper
+            as_records: 以FundQuote/NavRecord返回，默认返回普通字典，格式同FundScraper
+            retries: 超时、连接错误、429/5xx时的最大重试次数，0表示不重试
+            backoff: 重试的指数退避基数（秒），实际等待时间带随机抖动
+            collector: 运行统计，None时新建；可以与FundScraper共用同一个
+            missing_store: 保存fundgz 404记录的持久化负缓存，None时只在本次运行内记录
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncFundScraper需要安装aiohttp: pip install aiohttp")
+        
+        self.endpoints = resolve_endpoints(endpoints)
+        self.timeout = timeout
+        self.delay = delay
+        self.max_concurrency = max(1, max_concurrency)
+        if rate_limiter is None:
+            if rate is None and delay > 0:
+                rate = 1.0 / delay
+            rate_limiter = HostRateLimiter(rate=rate, burst=burst, host_rates=host_rates)
+        self.rate_limiter = rate_limiter
+        if history_parser not in HISTORY_PARSERS:
+            raise ValueError(f"未知的历史净值解析器: {history_parser}（可选: {', '.join(HISTORY_PARSERS)}）")
+        self.history_parser = history_parser
+        self.as_records = as_records
+        self.retry = RetryPolicy(retries=retries, backoff=backoff)
+        self.collector = collector or StatsCollector()
+        self.missing_store = missing_store
+        self._missing = set()
+        self.session = None
+        self._semaphore = None
+        # 本次运行内的档案页 {url: 下载解析任务}，并发的调用共用同一个任务
+        self._page_cache: Dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self):
+        """
+        获取（必要时创建）aiohttp会话
+        
+        会话和信号量必须在事件循环内创建，因此延迟到第一次请求时初始化。
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': DEFAULT_USER_AGENT}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def close(self):
+        """关闭会话"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _record_request(self, host: str, endpoint: str, started: float, status, size: int = 0):
+        """记录一次网络请求的耗时、状态和响应字节数（与FundScraper相同的指标）"""
+        self.collector.observe('http_request_seconds', time.perf_counter() - started, host=host, endpoint=endpoint)
+        self.collector.incr('http_requests_total', host=host, endpoint=endpoint, status=str(status))
+        if size:
+            self.collector.incr('http_response_bytes_total', size, host=host, endpoint=endpoint)
+
+    async def _request(self, url: str, params: Optional[Dict] = None,
+                       endpoint: Optional[str] = None) -> Optional[AsyncResponse]:
+        """
+        发送异步HTTP请求
+        
+        超时、连接错误和429/5xx响应按指数退避重试，等待期间不占用并发名额。
+        
+        Args:
+            url: 请求URL
+            params: 查询参数
+            endpoint: 接口名（用于运行统计），默认按URL判断
+        
+        Returns:
+            AsyncResponse对象或None
+        
+        Raises:
+            aiohttp.ClientResponseError: HTTP错误（如404，或重试耗尽后仍为5xx）
+        """
+        endpoint = endpoint or classify_url(url)
+        host = urlsplit(url).hostname or ''
+        session = await self._get_session()
+        
+        for attempt in range(self.retry.retries + 1):
+            waited = await self.rate_limiter.acquire_async(url)
+            if waited:
+                self.collector.incr('sleep_seconds_total', waited, reason='rate_limit')
+            
+            retry_after = None
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.get(url, params=params) as response:
+                        content = await response.read()
+                        self._record_request(host, endpoint, started, response.status, len(content))
+                        if response.status not in RETRY_STATUSES:
+                            response.raise_for_status()
+                            return AsyncResponse(content, response.charset)
+                        if attempt >= self.retry.retries:
+                            self.collector.incr('failures_total', host=host, endpoint=endpoint)
+                            response.raise_for_status()
+                        error = f"HTTP {response.status}"
+                        retry_after = response.headers.get('Retry-After')
+                except aiohttp.ClientResponseError:
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self._record_request(host, endpoint, started, 'error')
+                    error = repr(e)
+            
+            if attempt >= self.retry.retries:
+                break
+            
+            wait = self.retry.delay(attempt, retry_after)
+            self.collector.incr('retries_total', host=host, endpoint=endpoint)
+            self.collector.incr('sleep_seconds_total', wait, reason='retry_backoff')
+            print(f"请求失败，{wait:.1f}秒后重试({attempt + 1}/{self.retry.retries}): {url}, 错误: {error}")
+            await asyncio.sleep(wait)
+        
+        self.collector.incr('failures_total', host=host, endpoint=endpoint)
+        print(f"请求失败: {url}, 错误: {error}")
+        return None
+
+    async def _gather_bounded(self, func: Callable[[str], Awaitable], items: Iterable[str]) -> List:
+        """
+        对每一项调用协程函数func，同时最多处理max_concurrency项
+        
+        固定数量的工作协程依次领取任务，而不是一次为全部基金创建协程，
+        --all 抓取上万只基金时待处理的任务数也不会随基金数增长。
+        
+        Args:
+            func: 处理单个元素的协程函数
+            items: 待处理的元素
+        
+        Returns:
+            与items一一对应的结果列表
+        """
+        items = list(items)
+        results = [None] * len(items)
+        indexes = iter(range(len(items)))
+        
+        async def worker():
+            for index in indexes:
+                results[index] = await func(items[index])
+        
+        await asyncio.gather(*(worker() for _ in range(min(self.max_concurrency, len(items)))))
+        return results
+
+    def _quote(self, quote):
+        """按as_records返回FundQuote或普通字典"""
+        if quote is None or self.as_records or not isinstance(quote, FundQuote):
+            return quote
+        return quote.as_dict()
+
+    def _is_missing(self, url: str) -> bool:
+        """查询URL是否近期返回过404（负缓存）"""
+        if self.missing_store:
+            return self.missing_store.is_missing(url)
+        return url in self._missing
+
+    def _mark_missing(self, url: str):
+        """记录返回404的URL，之后直接跳过"""
+        if self.missing_store:
+            self.missing_store.mark_missing(url)
+        else:
+            self._missing.add(url)
+
+    async def get_fund_info(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取基金基本信息（实时估值API，404时降级到详情页）
+        
+        返回404的基金记录在负缓存中，之后直接使用备用数据源。
+        
+        Args:
+            fund_code: 基金代码（6位数字）
+        
+        Returns:
+            包含基金信息的字典，或None如果失败
+        """
+        url = self.endpoints['realtime'].format(code=fund_code)
+        
+        if self._is_missing(url):
+            self.collector.incr('fallbacks_total', endpoint='realtime', fallback='detail', reason='known_missing')
+            print(f"实时估值API不支持基金 {fund_code}（已记录），直接使用备用数据源...")
+            return await self.get_fund_from_detail_page(fund_code)
+        
+        try:
+            response = await self._request(url, endpoint='realtime')
+            if not response:
+                return None
+            
+            with self.collector.timer('parse_seconds', endpoint='realtime'):
+                info = parse_fundgz_response(fund_code, response.text)
+            if not info:
+                return None
+            
+            print(f"基金 {fund_code} 使用实时估值API成功获取数据")
+            return self._quote(info)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                self._mark_missing(url)
+                self.collector.incr('fallbacks_total', endpoint='realtime', fallback='detail', reason='not_found')
+                print(f"实时估值API不支持基金 {fund_code}（404错误），尝试使用备用数据源...")
+                return await self.get_fund_from_detail_page(fund_code)
+            else:
+                print(f"API请求失败: {fund_code}, 状态码: {e.status}")
+                return None
+        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            print(f"解析基金信息失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def get_fund_from_detail_page(self, fund_code: str) -> Optional[Dict]:
+        """
+        从基金详情页获取基金数据（备用方案）
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            包含基金信息的字典
+        """
+        url = self.endpoints['detail'].format(code=fund_code)
+        
+        try:
+            response = await self._request(url, endpoint='detail')
+            if not response:
+                print(f"无法访问基金详情页: {fund_code}")
+                return None
+            
+            with self.collector.timer('parse_seconds', endpoint='detail'):
+                info = parse_detail_page(fund_code, response.content)
+            
+            print(f"基金 {fund_code} 使用备用数据源（详情页）成功获取数据")
+            return self._quote(info)
+        except Exception as e:
+            print(f"从备用数据源获取基金信息失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def _fetch_fund_page(self, fund_code: str, url: str) -> Optional[Tuple[Dict, Dict]]:
+        """下载并解析基金档案页"""
+        response = await self._request(url, endpoint='fundpage')
+        if not response:
+            return None
+        with self.collector.timer('parse_seconds', endpoint='fundpage'):
+            return parse_fund_page(fund_code, response.content)
+
+    async def _load_fund_page(self, fund_code: str) -> Optional[Tuple[Dict, Dict]]:
+        """
+        下载并解析基金档案页，结果保存在本次运行的页面缓存中
+        
+        基本信息和历史业绩来自同一个页面，缓存保证每个URL只下载、解析一次；
+        同一基金的并发调用等待同一个下载任务。
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            (info, performance)元组，或None如果请求失败
+        """
+        url = self.endpoints['fundpage'].format(code=fund_code)
+        
+        task = self._page_cache.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_fund_page(fund_code, url))
+            self._page_cache[url] = task
+        
+        parsed = None
+        try:
+            # shield: 一个调用方被取消时不影响其他等待同一任务的调用方
+            parsed = await asyncio.shield(task)
+            return parsed
+        finally:
+            # 失败的结果不缓存，下次调用重新下载
+            if parsed is None and self._page_cache.get(url) is task:
+                del self._page_cache[url]
+
+    def clear_page_cache(self, fund_code: Optional[str] = None):
+        """
+        清空页面缓存（批量抓取结束时会自动调用）
+        
+        Args:
+            fund_code: 只清除该基金的缓存，None表示全部清空
+        """
+        if fund_code is None:
+            self._page_cache.clear()
+        else:
+            self._page_cache.pop(self.endpoints['fundpage'].format(code=fund_code), None)
+
+    async def get_fund_page_details(self, fund_code: str) -> Optional[Dict]:
+        """
+        从基金档案页一次性获取基本信息（类型、公司、经理）和历史业绩
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            合并了基本信息和业绩数据的字典
+        """
+        try:
+            parsed = await self._load_fund_page(fund_code)
+            if not parsed:
+                return None
+            
+            info, performance = parsed
+            details = dict(info)
+            details.update(performance)
+            return details
+        except Exception as e:
+            print(f"从页面获取基金信息失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def get_fund_info_from_page(self, fund_code: str) -> Optional[Dict]:
+        """
+        从基金档案页获取基金类型、公司、经理信息
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            包含基金详细信息的字典
+        """
+        try:
+            parsed = await self._load_fund_page(fund_code)
+            if not parsed:
+                return None
+            
+            return dict(parsed[0])
+        except Exception as e:
+            print(f"从页面获取基金信息失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def get_fund_performance(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取基金的历史业绩数据
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            包含基金业绩数据的字典
+        """
+        try:
+            parsed = await self._load_fund_page(fund_code)
+            if not parsed:
+                return None
+            
+            performance = parsed[1]
+            
+            return dict(performance) if performance else None
+        except Exception as e:
+            print(f"获取基金业绩数据失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def scrape_fund(self, fund_code: str, detailed: bool = False) -> Optional[Dict]:
+        """
+        抓取单个基金的所有数据
+        
+        Args:
+            fund_code: 基金代码
+            detailed: 是否获取详细信息
+        
+        Returns:
+            包含基金所有信息的字典
+        """
+        print(f"正在抓取基金: {fund_code}")
+        
+        fund_data = await self.get_fund_info(fund_code)
+        
+        if not fund_data:
+            print(f"无法获取基金 {fund_code} 的数据")
+            return None
+        
+        if detailed:
+            details = await self.get_fund_page_details(fund_code)
+            if details:
+                fund_data.update(details)
+        
+        print(f"成功获取基金 {fund_code} 的数据")
+        return fund_data
+
+    async def scrape_multiple_funds(self, fund_codes: List[str], detailed: bool = False) -> List[Dict]:
+        """
+        并发抓取多个基金的数据
+        
+        Args:
+            fund_codes: 基金代码列表
+            detailed: 是否获取详细信息
+        
+        Returns:
+            包含所有基金数据的列表（顺序与输入一致）
+        """
+        try:
+            results = await self._gather_bounded(
+                lambda code: self.scrape_fund(code, detailed=detailed), fund_codes
+            )
+        finally:
+            self.clear_page_cache()
+        
+        return [data for data in results if data]
+
+    async def _fetch_history_page(self, fund_code: str, page: int, per: int = 49,
+                                  start_date: Optional[str] = None,
+                                  end_date: Optional[str] = None) -> Optional[str]:
+        """
+        请求历史净值API的一页数据
+        
+        Args:
+            fund_code: 基金代码
+            page: 页码（从1开始）
+            per: 每页条数
+            start_date: 区间起始日期(YYYY-MM-DD)，由服务器过滤
+            end_date: 区间结束日期(YYYY-MM-DD)，由服务器过滤
+        
+        Returns:
+            响应文本，或None如果请求失败
+        """
+        url = self.endpoints['history']
+        params = {
+            'type': 'lsjz',
+            'code': fund_code,
+            'page': page,
+            'per': per
+        }
+        if start_date:
+            params['sdate'] = start_date
+        if end_date:
+            params['edate'] = end_date
+        
+        response = await self._request(url, params=params, endpoint='history')
+        if not response:
+            print(f"请求失败: {url}")
+            return None
+        return response.text
+
+    async def get_fund_history(self, fund_code: str, days: int = 30,
+                               start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        获取基金历史净值数据
+        
+        先请求第1页得到准确的总页数，再并发请求剩余需要的页，按页码顺序合并结果。
+        指定start_date/end_date时由服务器按日期区间过滤，days参数被忽略。
+        
+        Args:
+            fund_code: 基金代码
+            days: 获取最近N天的数据（默认30天）
+            start_date: 区间起始日期(YYYY-MM-DD，含)
+            end_date: 区间结束日期(YYYY-MM-DD，含)
+        
+        Returns:
+            历史净值数据列表，或None如果失败（包括日期格式错误、起始日期晚于结束日期）
+        """
+        try:
+            check_date_range(start_date, end_date)
+        except ValueError as e:
+            print(e)
+            return None
+        
+        history_data = []
+        per = 49
+        date_range = bool(start_date or end_date)
+        if date_range:
+            days = None
+            needed_pages = 1
+        else:
+            needed_pages = max(1, -(-(days + 1) // per))
+        
+        def parse(page, page_text):
+            with self.collector.timer('parse_seconds', endpoint='history', parser=self.history_parser):
+                return parse_history_page(
+                    fund_code, page_text, days, page, parser=self.history_parser,
+                    start_date=start_date, end_date=end_date
+                )
+        
+        try:
+            text = await self._fetch_history_page(fund_code, 1, per, start_date, end_date)
+            if text is not None:
+                records, reached_cutoff = parse(1, text)
+                if records:
+                    history_data.extend(records)
+                
+                total_pages = parse_history_meta(text)[1]
+                if total_pages is not None:
+                    needed_pages = total_pages if date_range else min(needed_pages, total_pages)
+                
+                if records and not reached_cutoff and needed_pages > 1:
+                    pages = list(range(2, needed_pages + 1))
+                    texts = await asyncio.gather(
+                        *(self._fetch_history_page(fund_code, page, per, start_date, end_date)
+                          for page in pages)
+                    )
+                    
+                    for page, page_text in zip(pages, texts):
+                        if page_text is None:
+                            break
+                        records, reached_cutoff = parse(page, page_text)
+                        if not records:
+                            break
+                        history_data.extend(records)
+                        if reached_cutoff:
+                            break
+            
+            if history_data:
+                print(f"基金 {fund_code} 成功获取 {len(history_data)} 条历史数据")
+                if not self.as_records:
+                    return [record.as_dict() for record in history_data]
+                return history_data
+            else:
+                print(f"未获取到基金 {fund_code} 的历史数据")
+                return None
+        
+        except Exception as e:
+            print(f"获取基金历史数据失败: {fund_code}, 错误: {e}")
+            return None
+
+    async def get_multiple_funds_history(self, fund_codes: List[str], days: int = 30,
+                                         start_date: Optional[str] = None,
+                                         end_date: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        并发获取多个基金的历史数据
+        
+        Args:
+            fund_codes: 基金代码列表
+            days: 获取最近N天的数据
+            start_date: 区间起始日期(YYYY-MM-DD)，指定后忽略days
+            end_date: 区间结束日期(YYYY-MM-DD)
+        
+        Returns:
+            {fund_code: [历史数据列表]}
+        """
+        results = await self._gather_bounded(
+            lambda code: self.get_fund_history(code, days=days, start_date=start_date, end_date=end_date),
+            fund_codes
+        )
+        
+        return {code: history for code, history in zip(fund_codes, results) if history}
+
+
+async def _demo():
+    """使用示例"""
+    async with AsyncFundScraper(delay=0, max_concurrency=50) as scraper:
+        results = await scraper.scrape_multiple_funds(['110022', '161725', '163402'])
+        for data in results:
+            print(data)
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,593 @@
+"""
+离线性能基准
+在本地测试桩上回放录制的fundgz JSONP、详情页HTML、档案页HTML和F10DataApi.aspx历史净值数据
+（可配置每个请求的延迟），测量抓取、解析和导出热点路径的性能，不访问真实网站：
+
+- 解析：每种页面单次解析耗时（微秒）
+- 抓取：实时数据 基金数/秒
+- 历史：历史净值 行数/秒
+- 导出：CSV/JSONL/JSON 行数/秒
+- 峰值内存（RSS）
+
+抓取、历史、导出基准各运行多轮（--rounds），每个指标取最好的一轮，减小调度和GC造成的抖动。
+结果可以保存为基线（--save），之后与基线对比（--compare），超出阈值的退化以非零状态码退出。
+
+用法:
+    python benchmark.py
+    python benchmark.py --funds 500 --workers 16 --latency 0.02 --save output/baseline.json
+    python benchmark.py --compare output/baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from fund_scraper import (
+    FundScraper,
+    parse_detail_page,
+    parse_fund_page,
+    parse_fundgz_response,
+    parse_history_page,
+)
+from sinks import open_sink
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+RECORDED_CODE = '110022'
+BENCHMARKS = ('parse', 'scrape', 'history', 'export')
+
+
+def load_stub_fixtures(fixtures_dir: Path = FIXTURES_DIR) -> Dict[str, str]:
+    """
+    读取测试桩回放的录制数据
+    
+    Args:
+        fixtures_dir: 录制数据目录
+    
+    Returns:
+        {realtime/detail/fundpage: 页面文本, history_head: 历史净值表头, history_row: 一行历史净值}
+    """
+    fixtures_dir = Path(fixtures_dir)
+
+    def read(name):
+        return (fixtures_dir / name).read_text(encoding='utf-8')
+    
+    head, rest = read(f'lsjz_{RECORDED_CODE}_page1.txt').split('<tbody>', 1)
+    return {
+        'realtime': read(f'fundgz_{RECORDED_CODE}.js'),
+        'detail': read(f'detail_{RECORDED_CODE}.html'),
+        'fundpage': read(f'fundpage_{RECORDED_CODE}.html'),
+        'history_head': head + '<tbody>',
+        'history_row': rest[:rest.index('</tr>') + len('</tr>')],
+    }
+
+
+def make_stub_handler(latency: float = 0.0, history_records: int = 2500,
+                      fixtures_dir: Path = FIXTURES_DIR):
+    """
+    生成测试桩的请求处理类
+    
+    录制页面中的基金代码替换为请求的代码；历史净值按录制页面的表格格式生成，
+    日期从今天往前按工作日排列，每只基金共history_records条记录，按per参数分页。
+    
+    Args:
+        latency: 每个请求的模拟延迟（秒）
+        history_records: 每只基金的历史净值记录数
+        fixtures_dir: 录制数据目录
+    
+    Returns:
+        BaseHTTPRequestHandler子类
+    """
+    fixtures = load_stub_fixtures(fixtures_dir)
+    row = fixtures['history_row']
+    recorded_date = row[row.index('<td>') + len('<td>'):row.index('</td>')]
+    dates = []
+    day = date.today()
+    while len(dates) < history_records:
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+        day -= timedelta(days=1)
+
+    def history_page(page: int, per: int) -> str:
+        rows = ''.join(row.replace(recorded_date, dates[i])
+                       for i in range((page - 1) * per, min(page * per, history_records)))
+        pages = -(-history_records // per)
+        return (f"{fixtures['history_head']}{rows}</tbody></table>\","
+                f"records:{history_records},pages:{pages},curpage:{page}}};")
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            name = parts.path.rsplit('/', 1)[-1]
+            if latency:
+                time.sleep(latency)
+            if parts.path.startswith('/js/fundgz_'):
+                body = fixtures['realtime'].replace(RECORDED_CODE, name[len('fundgz_'):-len('.js')])
+            elif parts.path.startswith('/fundpage/'):
+                body = fixtures['fundpage'].replace(RECORDED_CODE, name[:-len('.html')])
+            elif parts.path.endswith('F10DataApi.aspx'):
+                query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                body = history_page(int(query.get('page', 1)), int(query.get('per', 49)))
+            elif parts.path.endswith('.html'):
+                body = fixtures['detail'].replace(RECORDED_CODE, name[:-len('.html')])
+            else:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return StubHandler
+
+
+def _make_stub_server(latency: float, history_records: int, fixtures_dir: Path) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_stub_handler(latency, history_records, fixtures_dir))
+    server.daemon_threads = True
+    return server
+
+
+def _serve_stub(latency: float, history_records: int, fixtures_dir: Path, queue):
+    """子进程入口：启动测试桩并把端口号传回父进程"""
+    server = _make_stub_server(latency, history_records, fixtures_dir)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StubUpstream:
+    """回放录制数据的本地测试桩，FundScraper通过endpoints指向它"""
+
+    def __init__(self, latency: float = 0.0, history_records: int = 2500,
+                 fixtures_dir: Path = FIXTURES_DIR):
+        """
+        初始化测试桩
+        
+        Args:
+            latency: 每个请求的模拟延迟（秒）
+            history_records: 每只基金的历史净值记录数
+            fixtures_dir: 录制数据目录
+        """
+        self.latency = latency
+        self.history_records = history_records
+        self.fixtures_dir = Path(fixtures_dir)
+        self.base_url = None
+        self._server = None
+        self._process = None
+
+    def start(self, process: bool = False) -> 'StubUpstream':
+        """
+        启动测试桩
+        
+        Args:
+            process: 是否在子进程中运行（避免测试桩与被测代码争用GIL，命令行默认开启）
+        
+        Returns:
+            self
+        """
+        args = (self.latency, self.history_records, self.fixtures_dir)
+        if process:
+            queue = multiprocessing.Queue()
+            self._process = multiprocessing.Process(target=_serve_stub, args=args + (queue,), daemon=True)
+            self._process.start()
+            port = queue.get(timeout=30)
+        else:
+            self._server = _make_stub_server(*args)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            port = self._server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    def stop(self):
+        """停止测试桩"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    @property
+    def endpoints(self) -> Dict[str, str]:
+        """指向测试桩的FundScraper接口地址"""
+        return {
+            'realtime': self.base_url + '/js/fundgz_{code}.js',
+            'detail': self.base_url + '/{code}.html',
+            'fundpage': self.base_url + '/fundpage/{code}.html',
+            'history': self.base_url + '/f10/F10DataApi.aspx',
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程的峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽被测代码的进度输出（仍然写入，只是不显示）"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _per_call_us(func: Callable[[], object], repeat: int) -> float:
+    """多次调用取中位数，返回单次耗时（微秒）"""
+    timings = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+def bench_parse(repeat: int = 200, fixtures_dir: Path = FIXTURES_DIR) -> Dict[str, float]:
+    """
+    各解析函数在录制页面上的单次耗时
+    
+    Args:
+        repeat: 每种页面的重复次数
+        fixtures_dir: 录制数据目录
+    
+    Returns:
+        {parse_*_us: 微秒}
+    """
+    fixtures_dir = Path(fixtures_dir)
+    fundgz = (fixtures_dir / f'fundgz_{RECORDED_CODE}.js').read_text(encoding='utf-8')
+    detail = (fixtures_dir / f'detail_{RECORDED_CODE}.html').read_bytes()
+    fundpage = (fixtures_dir / f'fundpage_{RECORDED_CODE}.html').read_bytes()
+    history = (fixtures_dir / f'lsjz_{RECORDED_CODE}_page1.txt').read_text(encoding='utf-8')
+    with _quiet():
+        return {
+            'parse_fundgz_us': _per_call_us(lambda: parse_fundgz_response(RECORDED_CODE, fundgz), repeat),
+            'parse_detail_us': _per_call_us(lambda: parse_detail_page(RECORDED_CODE, detail), repeat),
+            'parse_fundpage_us': _per_call_us(lambda: parse_fund_page(RECORDED_CODE, fundpage), repeat),
+            'parse_history_fast_us': _per_call_us(
+                lambda: parse_history_page(RECORDED_CODE, history, None, parser='fast'), repeat),
+            'parse_history_bs4_us': _per_call_us(
+                lambda: parse_history_page(RECORDED_CODE, history, None, parser='bs4'), repeat),
+        }
+
+
+def _fund_codes(n: int) -> List[str]:
+    return [f'{100000 + i:06d}' for i in range(n)]
+
+
+def bench_scrape(stub: StubUpstream, funds: int = 200, workers: int = 8,
+                 detailed: bool = False) -> Dict[str, float]:
+    """
+    实时数据抓取吞吐
+    
+    Args:
+        stub: 已启动的测试桩
+        funds: 基金数
+        workers: 并发线程数
+        detailed: 是否同时抓取档案页
+    
+    Returns:
+        {scrape_funds_per_sec: 基金数/秒}
+    """
+    scraper = FundScraper(delay=0, max_workers=workers, endpoints=stub.endpoints, retries=0)
+    codes = _fund_codes(funds)
+    with _quiet():
+        started = time.perf_counter()
+        results = scraper.scrape_multiple_funds(codes, detailed=detailed)
+        elapsed = time.perf_counter() - started
+    if len(results) != funds:
+        raise RuntimeError(f"抓取结果不完整: {len(results)}/{funds}")
+    return {'scrape_funds_per_sec': funds / elapsed}
+
+
+def bench_history(stub: StubUpstream, funds: int = 50, days: int = 365, workers: int = 8,
+                  parser: str = 'fast') -> Tuple[Dict[str, float], Dict[str, list]]:
+    """
+    历史净值抓取吞吐
+    
+    Args:
+        stub: 已启动的测试桩
+        funds: 基金数
+        days: 每只基金的天数
+        workers: 并发线程数
+        parser: 历史净值解析器
+    
+    Returns:
+        ({history_rows_per_sec: 行数/秒, history_funds_per_sec: 基金数/秒}, 抓取到的历史数据（供导出基准使用）)
+    """
+    scraper = FundScraper(delay=0, max_workers=workers, endpoints=stub.endpoints, retries=0,
+                          history_parser=parser)
+    codes = _fund_codes(funds)
+    with _quiet():
+        started = time.perf_counter()
+        history = scraper.get_multiple_funds_history(codes, days=days)
+        elapsed = time.perf_counter() - started
+    rows = sum(len(records) for records in history.values())
+    if len(history) != funds or not rows:
+        raise RuntimeError(f"历史净值结果不完整: {len(history)}/{funds}")
+    return {'history_rows_per_sec': rows / elapsed, 'history_funds_per_sec': funds / elapsed}, history
+
+
+def bench_export(history: Dict[str, list]) -> Dict[str, float]:
+    """
+    导出吞吐（流式CSV、流式JSONL、整体JSON）
+    
+    Args:
+        history: {基金代码: 历史记录列表}
+    
+    Returns:
+        {export_*_rows_per_sec: 行数/秒}
+    """
+    records = [record for data in history.values() for record in data]
+    scraper = FundScraper(delay=0)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir, _quiet():
+        for fmt in ('csv', 'jsonl'):
+            path = os.path.join(tmpdir, f'history.{fmt}')
+            started = time.perf_counter()
+            with open_sink(path) as sink:
+                for record in records:
+                    sink.write(record)
+            result[f'export_{fmt}_rows_per_sec'] = len(records) / (time.perf_counter() - started)
+        started = time.perf_counter()
+        scraper.save_history_to_json(history, os.path.join(tmpdir, 'history.json'))
+        result['export_json_rows_per_sec'] = len(records) / (time.perf_counter() - started)
+    return result
+
+
+def best_of(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """
+    多轮结果中每个指标取最好的一轮
+    
+    吞吐受调度、GC等干扰时只会变慢，取最好的一轮比单次运行或平均值稳定得多。
+    
+    Args:
+        runs: 每轮的 {指标名: 值}
+    
+    Returns:
+        {指标名: 最好值}（吞吐取最大，耗时和内存取最小）
+    """
+    best: Dict[str, float] = {}
+    for run in runs:
+        for metric, value in run.items():
+            if metric not in best:
+                best[metric] = value
+            elif higher_is_better(metric):
+                best[metric] = max(best[metric], value)
+            else:
+                best[metric] = min(best[metric], value)
+    return best
+
+
+def run_benchmarks(only=BENCHMARKS, funds: int = 200, history_funds: int = 50, days: int = 365,
+                   workers: int = 8, latency: float = 0.0, repeat: int = 200, detailed: bool = False,
+                   parser: str = 'fast', stub_process: bool = False, rounds: int = 5) -> Dict[str, float]:
+    """
+    运行基准
+    
+    Args:
+        only: 要运行的基准（parse/scrape/history/export），export依赖history的结果
+        funds: 实时数据抓取的基金数
+        history_funds: 历史净值抓取的基金数
+        days: 历史净值天数
+        workers: 并发线程数
+        latency: 测试桩每个请求的延迟（秒）
+        repeat: 解析基准的重复次数
+        detailed: 实时数据是否同时抓取档案页
+        parser: 历史净值解析器
+        stub_process: 是否在子进程中运行测试桩
+        rounds: 抓取、历史、导出基准各运行的轮数，每个指标取最好的一轮
+    
+    Returns:
+        {指标名: 值}
+    """
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"未知的基准: {', '.join(sorted(unknown))}（可选: {', '.join(BENCHMARKS)}）")
+    results: Dict[str, float] = {}
+    if 'parse' in only:
+        results.update(bench_parse(repeat))
+    if {'scrape', 'history', 'export'} & set(only):
+        runs = []
+        with StubUpstream(latency=latency).start(process=stub_process) as stub:
+            for _ in range(max(1, rounds)):
+                run: Dict[str, float] = {}
+                if 'scrape' in only:
+                    run.update(bench_scrape(stub, funds, workers, detailed=detailed))
+                if 'history' in only or 'export' in only:
+                    metrics, history = bench_history(stub, history_funds, days, workers, parser=parser)
+                    if 'history' in only:
+                        run.update(metrics)
+                    if 'export' in only:
+                        run.update(bench_export(history))
+                runs.append(run)
+        results.update(best_of(runs))
+    rss = peak_rss_mb()
+    if rss is not None:
+        results['peak_rss_mb'] = rss
+    return results
+
+
+def higher_is_better(metric: str) -> bool:
+    """吞吐类指标（*_per_sec）越大越好，耗时和内存越小越好"""
+    return metric.endswith('_per_sec')
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            threshold: float = 0.25) -> List[Dict]:
+    """
+    与基线对比
+    
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        threshold: 判定为退化的相对变化（0.25表示变差超过25%）
+    
+    Returns:
+        [{'metric', 'baseline', 'current', 'change', 'regression'}]，change为相对变化（正数表示变好）
+    """
+    rows = []
+    for metric, current in results.items():
+        before = baseline.get(metric)
+        if not before:
+            continue
+        change = (current - before) / before
+        if not higher_is_better(metric):
+            change = -change
+        rows.append({'metric': metric, 'baseline': before, 'current': current,
+                     'change': change, 'regression': change < -threshold})
+    return rows
+
+
+def save_results(results: Dict[str, float], filepath: str, params: Dict):
+    """
+    保存结果（作为之后对比的基线）
+    
+    Args:
+        results: 指标
+        filepath: 文件路径
+        params: 运行参数（一并记录，对比时提示参数不一致）
+    """
+    path = Path(filepath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': params,
+        'results': results,
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"基准结果已保存到: {filepath}")
+
+
+def load_baseline(filepath: str) -> Dict:
+    """
+    读取基线文件
+    
+    Args:
+        filepath: save_results保存的文件
+    
+    Returns:
+        文件内容（含results和params）
+    """
+    return json.loads(Path(filepath).read_text(encoding='utf-8'))
+
+
+def _format_value(metric: str, value: float) -> str:
+    if metric.endswith('_us'):
+        return f"{value:,.1f} µs"
+    if metric.endswith('_mb'):
+        return f"{value:,.1f} MB"
+    return f"{value:,.1f}/s"
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(
+        description='离线性能基准（本地测试桩回放录制数据，不访问真实网站）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  # 保存基线
+  python benchmark.py --save output/bench_baseline.json
+  
+  # 修改代码后对比，任一指标变差超过25%时以状态码1退出
+  python benchmark.py --compare output/bench_baseline.json
+  
+  # 模拟20ms网络延迟，只测抓取和历史净值
+  python benchmark.py --only scrape history --latency 0.02 --workers 16
+        """
+    )
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help='只运行指定的基准（默认全部）')
+    parser.add_argument('--funds', type=int, default=200, help='实时数据抓取的基金数（默认: 200）')
+    parser.add_argument('--history-funds', type=int, default=50, help='历史净值抓取的基金数（默认: 50）')
+    parser.add_argument('--days', type=int, default=365, help='历史净值天数（默认: 365）')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='并发线程数（默认: 8）')
+    parser.add_argument('--latency', type=float, default=0.0, help='测试桩每个请求的延迟，秒（默认: 0）')
+    parser.add_argument('--repeat', type=int, default=200, help='解析基准的重复次数（默认: 200）')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='抓取、历史、导出基准的运行轮数，每个指标取最好的一轮（默认: 5）')
+    parser.add_argument('-d', '--detailed', action='store_true', help='实时数据同时抓取档案页')
+    parser.add_argument('--history-parser', choices=['fast', 'bs4'], default='fast',
+                        help='历史净值解析器（默认: fast）')
+    parser.add_argument('--in-process-stub', action='store_true',
+                        help='测试桩与基准在同一进程运行（默认在子进程中运行，避免争用GIL）')
+    parser.add_argument('--save', metavar='PATH', help='保存结果作为基线')
+    parser.add_argument('--compare', metavar='PATH', help='与基线对比')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='判定为退化的相对变化（默认: 0.25，即25%%，高于多轮取最好后的运行间抖动）')
+    args = parser.parse_args(argv)
+    
+    params = {key: getattr(args, key) for key in
+              ('only', 'funds', 'history_funds', 'days', 'workers', 'latency', 'repeat', 'rounds', 'detailed',
+               'history_parser')}
+    print(f"运行基准: {', '.join(args.only)}（基金 {args.funds}，历史 {args.history_funds} 只 × {args.days} 天，"
+          f"线程 {args.workers}，延迟 {args.latency * 1000:.0f}ms，{args.rounds} 轮取最好）")
+    results = run_benchmarks(only=args.only, funds=args.funds, history_funds=args.history_funds,
+                             days=args.days, workers=args.workers, latency=args.latency,
+                             repeat=args.repeat, detailed=args.detailed, parser=args.history_parser,
+                             stub_process=not args.in_process_stub, rounds=args.rounds)
+    
+    print("=" * 60)
+    for metric, value in results.items():
+        print(f"{metric:<32}{_format_value(metric, value):>20}")
+    print("=" * 60)
+    
+    if args.save:
+        save_results(results, args.save, params)
+    
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline.get('params') and baseline['params'] != params:
+            print(f"注意: 基线的运行参数不同 {baseline['params']}")
+        rows = compare(results, baseline.get('results', {}), threshold=args.threshold)
+        print(f"与基线对比（{args.compare}，{baseline.get('created', '')}）:")
+        for row in rows:
+            flag = '  ← 退化' if row['regression'] else ''
+            print(f"{row['metric']:<32}{_format_value(row['metric'], row['baseline']):>16} → "
+                  f"{_format_value(row['metric'], row['current']):>16}  {row['change']:+.1%}{flag}")
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
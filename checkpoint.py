@@ -0,0 +1,154 @@
+"""
+批量抓取的检查点日志
+每个基金抓取完成后立即把结果追加到日志文件，进程中断（网络异常、Ctrl-C、OOM）后
+重新运行同一命令即可跳过已完成的基金，只抓取剩余部分。
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from records import to_plain
+
+
+class Checkpoint:
+    """基于JSON Lines日志的检查点，每行记录一个已完成基金的结果"""
+    
+    JOURNAL_FILE = 'journal.jsonl'
+    META_FILE = 'meta.json'
+
+    def __init__(self, directory: str, params: Dict):
+        """
+        打开（或创建）检查点目录
+        
+        Args:
+            directory: 检查点目录
+            params: 本次运行的参数（如抓取模式、天数），与已有检查点不一致时拒绝续跑
+        
+        Raises:
+            ValueError: 检查点目录属于参数不同的另一次运行
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.params = dict(params)
+        self._lock = threading.Lock()
+        
+        meta_path = self.directory / self.META_FILE
+        if meta_path.exists():
+            saved = json.loads(meta_path.read_text(encoding='utf-8'))
+            if saved != self.params:
+                raise ValueError(
+                    f"检查点 {directory} 的运行参数 {saved} 与本次 {self.params} 不一致，"
+                    f"请使用新的检查点目录或删除该目录"
+                )
+        else:
+            meta_path.write_text(json.dumps(self.params, ensure_ascii=False), encoding='utf-8')
+        
+        self.journal_path = self.directory / self.JOURNAL_FILE
+        # 基金代码 -> 日志中该行的偏移量，合并时按偏移量读取，无需把全部结果留在内存中
+        self._offsets: Dict[str, int] = {}
+        self._load()
+        self._file = open(self.journal_path, 'ab')
+
+    def _load(self):
+        """读取已有日志，建立基金代码到偏移量的索引"""
+        if not self.journal_path.exists():
+            return
+        
+        valid_end = 0
+        with open(self.journal_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                except ValueError:
+                    # 进程在写入过程中被终止，丢弃不完整的最后一行
+                    break
+                self._offsets[entry['fund_code']] = offset
+                offset += len(line)
+                valid_end = offset
+        
+        with open(self.journal_path, 'r+b') as f:
+            f.truncate(valid_end)
+
+    def __contains__(self, fund_code: str) -> bool:
+        return fund_code in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def pending(self, fund_codes: Iterable[str]) -> List[str]:
+        """
+        过滤出尚未完成的基金代码
+        
+        Args:
+            fund_codes: 基金代码列表
+        
+        Returns:
+            未完成的基金代码列表（保持输入顺序）
+        """
+        return [code for code in fund_codes if code not in self._offsets]
+
+    def record(self, fund_code: str, data):
+        """
+        记录一个已完成基金的结果，写入后立即刷新到磁盘
+        
+        Args:
+            fund_code: 基金代码
+            data: 抓取结果（基金数据或历史记录列表），读取时以字典形式返回
+        """
+        line = (json.dumps({'fund_code': fund_code, 'data': data}, ensure_ascii=False, default=to_plain) + '\n').encode('utf-8')
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            self._offsets[fund_code] = offset
+
+    def get(self, fund_code: str):
+        """
+        读取某个基金的结果
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            记录的结果，未完成时为None
+        """
+        offset = self._offsets.get(fund_code)
+        if offset is None:
+            return None
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())['data']
+
+    def items(self, fund_codes: Iterable[str]) -> Iterator[Tuple[str, object]]:
+        """
+        按给定顺序逐个读取已完成基金的结果
+        
+        Args:
+            fund_codes: 基金代码列表（决定输出顺序，未完成的基金被跳过）
+        
+        Yields:
+            (基金代码, 结果)元组
+        """
+        with open(self.journal_path, 'rb') as f:
+            for code in fund_codes:
+                offset = self._offsets.get(code)
+                if offset is None:
+                    continue
+                f.seek(offset)
+                yield code, json.loads(f.readline())['data']
+
+    def close(self):
+        """关闭日志文件"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
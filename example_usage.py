@@ -4,6 +4,7 @@
 """
 
 from fund_scraper import FundScraper
+from records import format_percent
 import pandas as pd
 
 
@@ -237,7 +238,7 @@ def example_9_fund_history():
         print(f"\n成功获取 {len(history)} 条历史数据:")
         print("\n最近5条记录：")
         for record in history[:5]:
-            print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 累计净值: {record['accumulated_net_value']}, 增长率: {record['growth_rate']}")
+            print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 累计净值: {record['accumulated_net_value']}, 增长率: {format_percent(record['growth_rate'])}")
     else:
         print("未能获取历史数据")
 
@@ -262,7 +263,7 @@ def example_10_multiple_funds_history():
         for fund_code, history_list in history_data.items():
             print(f"\n基金 {fund_code}: {len(history_list)} 条历史记录")
             for record in history_list[:3]:
-                print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {record['growth_rate']}")
+                print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {format_percent(record['growth_rate'])}")
             if len(history_list) > 3:
                 print(f"  ... 更多记录")
         
@@ -302,12 +303,12 @@ def example_11_test_different_fund_types():
             print(f"✓ 成功获取 {len(history)} 条记录")
             print(f"  最新日期: {history[0]['date']}")
             print(f"  最新净值: {history[0]['unit_net_value']}")
-            print(f"  增长率: {history[0]['growth_rate']}")
+            print(f"  增长率: {format_percent(history[0]['growth_rate'])}")
             
             if len(history) >= 3:
                 print("\n  前3条记录:")
                 for i, record in enumerate(history[:3], 1):
-                    print(f"    {i}. 日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {record['growth_rate']}")
+                    print(f"    {i}. 日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {format_percent(record['growth_rate'])}")
         else:
             print(f"✗ 获取失败")
     
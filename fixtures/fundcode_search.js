@@ -0,0 +1 @@
+﻿var r = [["000001","HXCZHH","华夏成长混合","混合型-灵活","HUAXIACHENGZHANGHUNHE"],["000011","HXDPJXHHA","华夏大盘精选混合A","混合型-偏股","HUAXIADAPANJINGXUANHUNHEA"],["000051","HXHS300ETFLJA","华夏沪深300ETF联接A","指数型-股票","HUAXIAHUSHEN300ETFLIANJIEA"],["000198","TTXJJ","天弘余额宝货币","货币型-普通货币","TIANHONGYUEBAOHUOBI"],["000300","DCZYDZZQA","德邦德信中证中高收益债A","债券型-长债","DEBANGDEXINZHONGZHENGZHONGGAOSHOUYIZHAIA"],["110022","YFDXFHYGP","易方达消费行业股票","股票型","YIFANGDAXIAOFEIHANGYEGUPIAO"],["161725","ZSZZBJZSLOF","招商中证白酒指数(LOF)A","指数型-股票","ZHAOSHANGZHONGZHENGBAIJIUZHISHULOFA"],["163402","XQHXHH","兴全趋势投资混合(LOF)","混合型-偏股","XINGQUANQUSHITOUZIHUNHELOF"],["518600","GTHJETF","广发上海金ETF","商品（不含QDII）","GUANGFASHANGHAIJINETF"],["001714","GFYLCYGP","工银文体产业股票A","股票型","GONGYINWENTICHANYEGUPIAOA"]];
\ No newline at end of file
@@ -0,0 +1 @@
+jsonpgz({"fundcode":"110022","name":"易方达消费行业股票","jzrq":"2024-01-12","dwjz":"3.8510","gsz":"3.8734","gszzl":"0.58","gztime":"2024-01-15 15:00"});
@@ -5,102 +5,799 @@
 
 import requests
 import json
-import time
 import csv
 import re
-from typing import List, Dict, Optional, Union
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 import pandas as pd
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
 from pathlib import Path
 
+from rate_limiter import HostRateLimiter
+from http_cache import HttpCache, MissingStore, classify_url
+from history_store import HistoryStore
+from resilience import RETRY_STATUSES, RetryPolicy, HostCircuitBreakers
+from records import FundListing, FundQuote, NavRecord, parse_percent, records_to_frame, to_plain
+from nav_series import NavSeries
+from stats import StatsCollector
+from transport import ReplayTransport
+
+
+# ---------------------------------------------------------------------------
+# 响应解析函数
+# 同步引擎(FundScraper)与异步引擎(AsyncFundScraper)共用，保证两者返回的数据完全一致
+# ---------------------------------------------------------------------------
+
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+FUNDGZ_PATTERN = re.compile(r'jsonpgz\((.*)\)')
+HISTORY_CONTENT_PATTERN = re.compile(r'content:"(.*?)",records', re.DOTALL)
+HISTORY_META_PATTERN = re.compile(r'records:\s*(\d+)\s*,\s*pages:\s*(\d+)')
+FUND_LIST_PATTERN = re.compile(r'=\s*(\[.*\])\s*;?\s*$', re.DOTALL)
+
+# 上游接口地址，{code}为基金代码；可通过endpoints参数替换（如指向本地测试桩或镜像）
+DEFAULT_ENDPOINTS = {
+    'realtime': 'https://fundgz.1234567.com.cn/js/fundgz_{code}.js',
+    'detail': 'http://fund.eastmoney.com/{code}.html',
+    'fundpage': 'https://fundpage.eastmoney.com/{code}.html',
+    'history': 'http://fund.eastmoney.com/f10/F10DataApi.aspx',
+    'fundlist': 'http://fund.eastmoney.com/js/fundcode_search.js',
+}
+
+
+def resolve_endpoints(endpoints: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    合并自定义的上游接口地址
+    
+    Args:
+        endpoints: {接口名: URL模板}，接口名为realtime/detail/fundpage/history
+    
+    Returns:
+        完整的接口地址字典
+    
+    Raises:
+        ValueError: 未知的接口名
+    """
+    unknown = set(endpoints or {}) - set(DEFAULT_ENDPOINTS)
+    if unknown:
+        raise ValueError(f"未知的接口: {', '.join(sorted(unknown))}（可选: {', '.join(DEFAULT_ENDPOINTS)}）")
+    return {**DEFAULT_ENDPOINTS, **(endpoints or {})}
+
+
+def check_date_range(start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """
+    校验历史净值的日期区间（同步引擎和异步引擎共用）
+    
+    Args:
+        start_date: 区间起始日期(YYYY-MM-DD)
+        end_date: 区间结束日期(YYYY-MM-DD)
+    
+    Raises:
+        ValueError: 日期格式错误，或起始日期晚于结束日期
+    """
+    for value in (start_date, end_date):
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"无效的日期: {value}，格式应为YYYY-MM-DD") from None
+    if start_date and end_date and start_date > end_date:
+        raise ValueError(f"起始日期 {start_date} 晚于结束日期 {end_date}")
+
+
+def parse_fundgz_response(fund_code: str, text: str) -> Optional[FundQuote]:
+    """
+    解析实时估值API(fundgz)返回的JSONP数据
+    
+    Args:
+        fund_code: 基金代码
+        text: 响应文本，格式为 jsonpgz({...});
+        
+    Returns:
+        FundQuote对象，或None如果无法解析
+        
+    Raises:
+        json.JSONDecodeError, ValueError: JSON内容或数值格式错误
+    """
+    json_str = FUNDGZ_PATTERN.search(text)
+    if not json_str:
+        print(f"无法解析基金代码 {fund_code} 的数据")
+        return None
+    
+    data = json.loads(json_str.group(1))
+    
+    return FundQuote(
+        fund_code=fund_code,
+        fund_name=data.get('name', ''),
+        unit_net_value=float(data.get('gsz', 0)),
+        accumulated_net_value=float(data.get('jsn', 0)),
+        daily_growth_rate=float(data.get('dwjz', 0)) if data.get('dwjz') else 0.0,
+        update_date=data.get('gztime', ''),
+        status=data.get('isrising', ''),
+    )
+
+
+def parse_detail_page(fund_code: str, content: bytes) -> FundQuote:
+    """
+    解析基金详情页(fund.eastmoney.com/{code}.html)中的净值信息
+    
+    Args:
+        fund_code: 基金代码
+        content: 页面HTML内容
+        
+    Returns:
+        FundQuote对象
+    """
+    soup = BeautifulSoup(content, 'lxml')
+    
+    info = FundQuote(fund_code=fund_code)
+    
+    # 获取基金名称 - 尝试多个选择器
+    fund_name_elem = soup.select_one('.fundDetail-tit')
+    if not fund_name_elem:
+        fund_name_elem = soup.select_one('h1.title')
+    if not fund_name_elem:
+        fund_name_elem = soup.select_one('div.title h1')
+    
+    if fund_name_elem:
+        info['fund_name'] = fund_name_elem.get_text(strip=True)
+    else:
+        info['fund_name'] = ''
+    
+    # 获取单位净值 - 查找包含净值的数字
+    unit_net_value = 0.0
+    daily_growth_rate = 0.0
+    update_date = ''
+    
+    # 尝试从数据表中获取净值信息
+    data_nums = soup.select_one('.dataNums')
+    if data_nums:
+        # 查找所有的数字元素
+        numbers = data_nums.select('.ui-font-large')
+        if numbers:
+            try:
+                unit_net_value = float(numbers[0].get_text(strip=True))
+            except (ValueError, IndexError):
+                pass
+        
+        # 查找日增长率
+        growth_elems = data_nums.select('.ui-font-large.red, .ui-font-large.green')
+        if len(growth_elems) > 1:
+            try:
+                growth_text = growth_elems[1].get_text(strip=True)
+                # 移除%符号
+                growth_text = growth_text.rstrip('%')
+                daily_growth_rate = float(growth_text)
+            except (ValueError, IndexError):
+                pass
+    
+    # 如果未找到，尝试从其他位置获取净值信息
+    if unit_net_value == 0.0:
+        # 查找包含净值的所有表格
+        tables = soup.find_all('table')
+        for table in tables:
+            rows = table.find_all('tr')
+            for row in rows:
+                cols = row.find_all(['td', 'th'])
+                if len(cols) >= 2:
+                    header = cols[0].get_text(strip=True)
+                    value = cols[1].get_text(strip=True)
+                    
+                    if '单位净值' in header or '最新净值' in header:
+                        try:
+                            unit_net_value = float(value)
+                        except ValueError:
+                            pass
+                    elif '日增长率' in header or '涨幅' in header or '日增幅' in header:
+                        try:
+                            value_clean = value.rstrip('%')
+                            daily_growth_rate = float(value_clean)
+                        except ValueError:
+                            pass
+                    elif '净值日期' in header or '更新日期' in header:
+                        update_date = value
+    
+    # 如果仍未找到净值，尝试从页面的其他部分查找
+    if unit_net_value == 0.0:
+        # 查找所有包含数字的元素
+        all_texts = soup.get_text()
+        match = re.search(r'单位净值[：:]\s*([\d.]+)', all_texts)
+        if match:
+            try:
+                unit_net_value = float(match.group(1))
+            except ValueError:
+                pass
+    
+    info['unit_net_value'] = unit_net_value
+    info['daily_growth_rate'] = daily_growth_rate
+    info['update_date'] = update_date
+    info['accumulated_net_value'] = 0.0
+    info['status'] = ''
+    
+    return info
+
+
+def parse_fund_page(fund_code: str, content: bytes) -> Tuple[Dict, Dict]:
+    """
+    一次解析基金档案页(fundpage.eastmoney.com/{code}.html)，同时提取基本信息和历史业绩
+    
+    Args:
+        fund_code: 基金代码
+        content: 页面HTML内容
+        
+    Returns:
+        (info, performance)元组，分别与parse_fund_page_info和parse_fund_performance的结果相同
+    """
+    soup = BeautifulSoup(content, 'lxml')
+    return _extract_fund_page_info(fund_code, soup), _extract_fund_performance(soup)
+
+
+def parse_fund_page_info(fund_code: str, content: bytes) -> Dict:
+    """
+    解析基金档案页(fundpage.eastmoney.com/{code}.html)中的基金类型、公司、经理信息
+    
+    Args:
+        fund_code: 基金代码
+        content: 页面HTML内容
+        
+    Returns:
+        基金详细信息字典
+    """
+    return _extract_fund_page_info(fund_code, BeautifulSoup(content, 'lxml'))
+
+
+def parse_fund_performance(content: bytes) -> Dict:
+    """
+    解析基金档案页中的历史业绩（各阶段收益率）
+    
+    Args:
+        content: 页面HTML内容
+        
+    Returns:
+        业绩数据字典（未找到时为空字典）
+    """
+    return _extract_fund_performance(BeautifulSoup(content, 'lxml'))
+
+
+def _extract_fund_page_info(fund_code: str, soup: BeautifulSoup) -> Dict:
+    """从已解析的基金档案页中提取基金类型、公司、经理信息"""
+    # 提取基金类型、基金公司、基金经理信息
+    info = {'fund_code': fund_code}
+    
+    # 获取基金名称和基本信息
+    fund_name = soup.select_one('div.title h1')
+    if fund_name:
+        info['fund_name'] = fund_name.get_text(strip=True)
+    
+    # 查找基金类型
+    fund_type_elem = soup.find('dt', string='基金类型')
+    if fund_type_elem:
+        fund_type = fund_type_elem.find_next('dd')
+        if fund_type:
+            info['fund_type'] = fund_type.get_text(strip=True)
+    
+    # 查找基金公司
+    company_elem = soup.find('dt', string='基金公司')
+    if company_elem:
+        company = company_elem.find_next('dd')
+        if company:
+            info['fund_company'] = company.get_text(strip=True)
+    
+    # 查找基金经理
+    manager_elem = soup.find('dt', string='基金经理')
+    if manager_elem:
+        manager = manager_elem.find_next('dd')
+        if manager:
+            manager_name = manager.find('a')
+            if manager_name:
+                info['fund_manager'] = manager_name.get_text(strip=True)
+    
+    return info
+
+
+def _extract_fund_performance(soup: BeautifulSoup) -> Dict:
+    """从已解析的基金档案页中提取各阶段收益率"""
+    performance = {}
+    
+    # 查找业绩表格或相关信息
+    # 这个可能需要根据网站的实际结构调整
+    tables = soup.find_all('table')
+    for table in tables:
+        rows = table.find_all('tr')
+        for row in rows:
+            cols = row.find_all(['td', 'th'])
+            if len(cols) >= 2:
+                header = cols[0].get_text(strip=True)
+                value = cols[1].get_text(strip=True)
+                
+                # 匹配各个时期的收益率
+                if '1个月' in header or '近1月' in header:
+                    performance['monthly_1_return'] = value
+                elif '3个月' in header or '近3月' in header:
+                    performance['monthly_3_return'] = value
+                elif '6个月' in header or '近6月' in header:
+                    performance['monthly_6_return'] = value
+                elif '1年' in header or '近1年' in header:
+                    performance['yearly_1_return'] = value
+                elif '3年' in header or '近3年' in header:
+                    performance['yearly_3_return'] = value
+                elif '5年' in header or '近5年' in header:
+                    performance['yearly_5_return'] = value
+                elif '成立以来' in header:
+                    performance['since_establishment_return'] = value
+    
+    return performance
+
+
+def parse_history_meta(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    解析历史净值API返回的总记录数和总页数
+    
+    Args:
+        text: 响应文本，格式为 var apidata={ content:"...", records:XX, pages:XX, curpage:XX}
+        
+    Returns:
+        (records, pages)元组，无法解析时为(None, None)
+    """
+    match = HISTORY_META_PATTERN.search(text)
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def _extract_history_rows_bs4(html_content: str) -> Tuple[Optional[List[List[str]]], str]:
+    """
+    使用BeautifulSoup提取历史净值表格的单元格文本
+    
+    Args:
+        html_content: content字段中的HTML表格
+        
+    Returns:
+        (rows, error)元组：rows为每行单元格文本的列表，无法解析时为None，error为失败原因
+    """
+    soup = BeautifulSoup(html_content, 'lxml')
+    table = soup.find('table')
+    
+    if not table:
+        return None, '未找到表格'
+    
+    tbody = table.find('tbody')
+    if not tbody:
+        return None, '表格为空'
+    
+    return [[td.get_text(strip=True) for td in row.find_all('td')]
+            for row in tbody.find_all('tr')], ''
+
+
+def _extract_history_rows_fast(html_content: str) -> Tuple[Optional[List[List[str]]], str]:
+    """
+    使用lxml和XPath提取历史净值表格的单元格文本
+    
+    不构建BeautifulSoup对象，直接在lxml的元素树上取值，结果与_extract_history_rows_bs4一致。
+    
+    Args:
+        html_content: content字段中的HTML表格
+        
+    Returns:
+        (rows, error)元组：rows为每行单元格文本的列表，无法解析时为None，error为失败原因
+    """
+    if not html_content.strip():
+        return None, '未找到表格'
+    
+    tree = lxml_html.fromstring(html_content)
+    tables = tree.xpath('descendant-or-self::table[1]')
+    if not tables:
+        return None, '未找到表格'
+    
+    tbodies = tables[0].xpath('.//tbody[1]')
+    if not tbodies:
+        return None, '表格为空'
+    
+    return [[''.join(text.strip() for text in td.itertext()) for td in row.iterfind('td')]
+            for row in tbodies[0].iterfind('tr')], ''
+
+
+# 历史净值表格解析后端：fast基于lxml，bs4为原有的BeautifulSoup实现
+HISTORY_PARSERS = {
+    'fast': _extract_history_rows_fast,
+    'bs4': _extract_history_rows_bs4,
+}
+
+
+def parse_history_page(fund_code: str, text: str, days: Optional[int], page: int = 1,
+                       parser: str = 'fast',
+                       start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       raw: bool = False):
+    """
+    解析历史净值API(F10DataApi.aspx)返回的一页数据
+    
+    Args:
+        fund_code: 基金代码
+        text: 响应文本
+        days: 只保留最近N天的数据，None表示不按天数截止（按日期区间查询时）
+        page: 页码（仅用于日志）
+        parser: 表格解析后端，'fast'(lxml)或'bs4'(BeautifulSoup)，两者结果一致
+        start_date: 只保留不早于该日期(YYYY-MM-DD)的数据，遇到更早的记录即停止
+        end_date: 跳过晚于该日期(YYYY-MM-DD)的数据
+        raw: 返回表格的原始单元格 (日期, 单位净值, 累计净值, 日增长率) 而不是NavRecord，
+             供NavSeries.from_rows按列转换
+        
+    Returns:
+        (records, reached_cutoff)元组：
+        records为本页在范围内的记录列表，页面无法解析时为None；
+        reached_cutoff表示是否已遇到超出范围的记录
+    
+    Raises:
+        ValueError: 未知的解析后端
+    """
+    if parser not in HISTORY_PARSERS:
+        raise ValueError(f"未知的历史净值解析器: {parser}（可选: {', '.join(HISTORY_PARSERS)}）")
+    
+    # API返回的是JavaScript变量，格式为: var apidata={ content:"...", records:XX, pages:XX}
+    # 需要提取HTML表格并解析
+    content_match = HISTORY_CONTENT_PATTERN.search(text)
+    if not content_match:
+        print(f"基金 {fund_code} 第{page}页: 未找到content字段")
+        return None, False
+    
+    rows, error = HISTORY_PARSERS[parser](content_match.group(1))
+    if rows is None:
+        print(f"基金 {fund_code} 第{page}页: {error}")
+        return None, False
+    
+    if not rows:
+        print(f"基金 {fund_code} 第{page}页: 没有数据行")
+        return None, False
+    
+    records = []
+    now = datetime.now()
+    
+    for cols in rows:
+        try:
+            if len(cols) < 4:
+                continue
+            
+            # 解析日期
+            date_str = cols[0]
+            if not date_str:
+                continue
+            
+            # 验证日期格式
+            try:
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+            except ValueError:
+                continue
+            
+            # 检查是否在指定天数范围内
+            if days is not None and (now - date_obj).days > days:
+                # 已经超出天数范围，停止抓取
+                return records, True
+            
+            # 已经到达区间起点之前，停止抓取
+            if start_date and date_str < start_date:
+                return records, True
+            
+            # 服务器已按区间过滤，这里只做兜底
+            if end_date and date_str > end_date:
+                continue
+            
+            if raw:
+                records.append((date_str, cols[1], cols[2], cols[3]))
+                continue
+            
+            # 解析单位净值
+            unit_net_value = 0.0
+            try:
+                unit_net_value = float(cols[1])
+            except (ValueError, IndexError):
+                pass
+            
+            # 解析累计净值
+            accumulated_net_value = 0.0
+            try:
+                accumulated_net_value = float(cols[2])
+            except (ValueError, IndexError):
+                pass
+            
+            records.append(NavRecord(
+                fund_code=fund_code,
+                date=date_str,
+                unit_net_value=unit_net_value,
+                accumulated_net_value=accumulated_net_value,
+                growth_rate=parse_percent(cols[3]),
+            ))
+            
+        except Exception as e:
+            print(f"解析历史记录时出错: {e}")
+            continue
+    
+    return records, False
+
+
+def parse_fund_list(content: bytes) -> List[FundListing]:
+    """
+    解析基金代码表(fundcode_search.js)
+    
+    Args:
+        content: 响应正文，格式为 var r = [["000001","HXCZHH","华夏成长混合","混合型-灵活","HUAXIACHENGZHANGHUNHE"],...];
+        
+    Returns:
+        FundListing列表，按代码表中的顺序
+        
+    Raises:
+        ValueError: 无法解析
+    """
+    text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+    match = FUND_LIST_PATTERN.search(text)
+    if not match:
+        raise ValueError("基金代码表格式无法识别")
+    return [FundListing(*(str(value).strip() for value in row[:5]))
+            for row in json.loads(match.group(1)) if len(row) >= 5]
+
 
 class FundScraper:
     """基金数据抓取器"""
 
-    def __init__(self, timeout: int = 10, delay: float = 0.5):
+    def __init__(self, timeout: int = 10, delay: float = 0.5, max_workers: int = 1,
+                 rate: Optional[float] = None, burst: int = 1,
+                 host_rates: Optional[Dict[str, Union[float, tuple]]] = None,
+                 cache: Optional[HttpCache] = None, history_workers: int = 4,
+                 history_parser: str = 'fast', retries: int = 3, backoff: float = 0.5,
+                 circuit_threshold: Optional[float] = 0.5, circuit_cooldown: float = 30.0,
+                 endpoints: Optional[Dict[str, str]] = None,
+                 collector: Optional[StatsCollector] = None, transport=None,
+                 missing_store: Optional[MissingStore] = None, as_records: bool = False):
         """
         初始化爬虫
         
         Args:
             timeout: 请求超时时间（秒）
-            delay: 请求之间的延迟时间（秒）
+            delay: 请求之间的延迟时间（秒），未指定rate时换算为每个主机 1/delay 次/秒
+            max_workers: 批量抓取时的默认并发线程数（1表示串行）
+            rate: 每个主机每秒允许的请求数，优先于delay
+            burst: 每个主机允许的突发请求数
+            host_rates: 针对特定主机的限速，{主机名: 速率} 或 {主机名: (速率, 突发数)}
+            cache: 持久化HTTP响应缓存，None表示不使用缓存
+            history_workers: 单个基金历史净值分页并发请求的线程数
+            history_parser: 历史净值表格解析后端，'fast'(lxml)或'bs4'(BeautifulSoup)
+            retries: 超时、连接错误、429/5xx时的最大重试次数，0表示不重试
+            backoff: 重试的指数退避基数（秒），实际等待时间带随机抖动
+            circuit_threshold: 触发主机熔断的错误率（0~1），None或<=0表示不熔断
+            circuit_cooldown: 熔断持续时间（秒）
+            endpoints: 替换上游接口地址，{接口名: URL模板}，见DEFAULT_ENDPOINTS
+            collector: 运行统计（请求耗时、流量、解析耗时、重试、降级、等待时间），None时新建；
+                       多个抓取器可共用同一个
+            transport: 传输层（transport.RecordTransport录制 / ReplayTransport回放），None表示直接访问网络；
+                       回放时不重试、不熔断，存档中没有的请求每次都直接失败，保证回放结果确定
+            missing_store: 未使用cache时保存fundgz 404记录的持久化负缓存，
+                           两者都为None时只在本次运行内记录
+            as_records: 实时行情和历史净值以带__slots__的FundQuote/NavRecord返回（大批量抓取时省内存，
+                        序列化需要records.to_plain，转换DataFrame需要records_to_frame）；
+                        默认返回普通字典，与旧版相同
         """
+        self.endpoints = resolve_endpoints(endpoints)
         self.timeout = timeout
         self.delay = delay
+        self.max_workers = max(1, max_workers)
+        self.history_workers = max(1, history_workers)
+        if history_parser not in HISTORY_PARSERS:
+            raise ValueError(f"未知的历史净值解析器: {history_parser}（可选: {', '.join(HISTORY_PARSERS)}）")
+        self.history_parser = history_parser
+        if rate is None and delay > 0:
+            rate = 1.0 / delay
+        # 按主机限速，所有线程共享同一组令牌桶
+        self.rate_limiter = HostRateLimiter(rate=rate, burst=burst, host_rates=host_rates)
+        self.cache = cache
+        if isinstance(transport, ReplayTransport):
+            retries, circuit_threshold = 0, None
+        self.retry = RetryPolicy(retries=retries, backoff=backoff)
+        self.breakers = None
+        if circuit_threshold and circuit_threshold > 0:
+            self.breakers = HostCircuitBreakers(threshold=circuit_threshold, cooldown=circuit_cooldown)
+        # 运行统计：请求、重试、熔断、降级等全部计数都记录在这里
+        self.collector = collector or StatsCollector()
+        self.as_records = as_records
+        # 负缓存：HTTP缓存文件中的missing表，其次是单独的负缓存文件，都没有时只在本次运行内记录
+        self.missing_store = cache or missing_store
+        self._missing = set()
+        # 本次运行内已解析的档案页 {url: (info, performance)}
+        self._page_cache: Dict[str, Tuple[Dict, Dict]] = {}
+        self._page_cache_lock = threading.Lock()
+        self.transport = transport
         self.session = requests.Session()
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
+        # 批量抓取历史净值时，每个工作线程内还有history_workers个分页线程，连接池按嵌套后的总并发一次建好，
+        # 避免运行中重新挂载适配器
+        self._ensure_pool_size(self.max_workers * self.history_workers)
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                         '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': DEFAULT_USER_AGENT
         })
 
-    def _request(self, url: str, params: Optional[Dict] = None) -> Optional[requests.Response]:
+    def _ensure_pool_size(self, workers: int):
+        """
+        确保Session的连接池不小于并发线程数，否则多余的连接会被丢弃重建
+        
+        嵌套的线程池（批量历史净值中的分页请求）会在工作线程中调用，检查和挂载必须在锁内完成，
+        否则并发调用会互相覆盖适配器。
+        
+        Args:
+            workers: 并发线程数
+        """
+        size = max(10, workers)
+        with self._pool_lock:
+            if size <= self._pool_size:
+                return
+            if self.transport is not None:
+                adapter = self.transport.adapter(size)
+            else:
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self._pool_size = size
+
+    def _record_request(self, host: str, endpoint: str, started: float, status, size: int = 0):
+        """记录一次网络请求的耗时、状态和响应字节数"""
+        self.collector.observe('http_request_seconds', time.perf_counter() - started, host=host, endpoint=endpoint)
+        self.collector.incr('http_requests_total', host=host, endpoint=endpoint, status=str(status))
+        if size:
+            self.collector.incr('http_response_bytes_total', size, host=host, endpoint=endpoint)
+
+    def _request(self, url: str, params: Optional[Dict] = None,
+                 endpoint: Optional[str] = None) -> Optional[requests.Response]:
         """
         发送HTTP请求
         
+        启用缓存时，有效期内的响应直接从缓存返回（不占用限流配额）；
+        过期的响应使用ETag/Last-Modified发送条件请求，服务器返回304时继续使用缓存内容。
+        
+        超时、连接错误和429/5xx响应按指数退避重试；主机错误率过高时熔断，
+        熔断期间直接返回None而不发送请求。
+        
         Args:
             url: 请求URL
             params: 查询参数
+            endpoint: 接口名（用于运行统计和缓存有效期），默认按URL判断
             
         Returns:
             Response对象或None
             
         Raises:
-            requests.exceptions.HTTPError: HTTP错误（如404）
+            requests.exceptions.HTTPError: HTTP错误（如404，或重试耗尽后仍为5xx）
         """
-        try:
-            response = self.session.get(url, params=params, timeout=self.timeout)
+        endpoint = endpoint or classify_url(url)
+        host = urlsplit(url).hostname or ''
+        
+        entry = self.cache.get(url, params, endpoint) if self.cache else None
+        if entry and entry.fresh:
+            self.collector.incr('cache_hits_total', endpoint=endpoint, result='fresh')
+            return entry.to_response()
+        
+        breaker = self.breakers.get(url) if self.breakers else None
+        headers = entry.validators() if entry else None
+        
+        for attempt in range(self.retry.retries + 1):
+            if breaker and not breaker.allow():
+                self.collector.incr('circuit_rejected_total', host=host, endpoint=endpoint)
+                print(f"主机熔断中，跳过请求: {url}")
+                return None
+            
+            waited = self.rate_limiter.acquire(url)
+            if waited:
+                self.collector.incr('sleep_seconds_total', waited, reason='rate_limit')
+            
+            response = None
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                self._record_request(host, endpoint, started, 'error')
+                error = e
+            except requests.RequestException as e:
+                # 不可重试的错误（URL无效等）与主机是否正常无关，但必须释放半开状态的试探名额
+                self._record_request(host, endpoint, started, 'error')
+                if breaker:
+                    breaker.release()
+                print(f"请求失败: {url}, 错误: {e}")
+                return None
+            else:
+                self._record_request(host, endpoint, started, response.status_code, len(response.content))
+                if response.status_code not in RETRY_STATUSES:
+                    if breaker:
+                        breaker.record(True)
+                    if response.status_code == 304 and entry:
+                        self.collector.incr('cache_hits_total', endpoint=endpoint, result='revalidated')
+                        self.cache.refresh(entry, response.headers)
+                        return entry.to_response()
+                    response.raise_for_status()
+                    if self.cache:
+                        self.cache.put(url, params, response, endpoint)
+                    return response
+                error = f"HTTP {response.status_code}"
+            
+            if breaker and breaker.record(False):
+                self.collector.incr('circuit_trips_total', host=host)
+                print(f"主机错误率过高，暂停请求 {breaker.cooldown:.0f} 秒: {url}")
+            
+            if attempt >= self.retry.retries:
+                break
+            
+            wait = self.retry.delay(attempt, response.headers.get('Retry-After') if response is not None else None)
+            self.collector.incr('retries_total', host=host, endpoint=endpoint)
+            self.collector.incr('sleep_seconds_total', wait, reason='retry_backoff')
+            print(f"请求失败，{wait:.1f}秒后重试({attempt + 1}/{self.retry.retries}): {url}, 错误: {error}")
+            time.sleep(wait)
+        
+        self.collector.incr('failures_total', host=host, endpoint=endpoint)
+        if response is not None:
             response.raise_for_status()
-            return response
-        except requests.exceptions.HTTPError:
-            raise
-        except requests.RequestException as e:
-            print(f"请求失败: {url}, 错误: {e}")
-            return None
+        print(f"请求失败: {url}, 错误: {error}")
+        return None
+
+    def _quote(self, quote):
+        """按as_records返回FundQuote或普通字典"""
+        if quote is None or self.as_records or not isinstance(quote, FundQuote):
+            return quote
+        return quote.as_dict()
+
+    def _is_missing(self, url: str) -> bool:
+        """查询URL是否近期返回过404（负缓存）"""
+        if self.missing_store:
+            return self.missing_store.is_missing(url)
+        return url in self._missing
+
+    def _mark_missing(self, url: str):
+        """记录返回404的URL，之后的运行直接跳过"""
+        if self.missing_store:
+            self.missing_store.mark_missing(url)
+        else:
+            self._missing.add(url)
 
     def get_fund_info(self, fund_code: str) -> Optional[Dict]:
         """
         获取基金基本信息
         
+        实时估值API不支持的基金（ETF、货币基金等返回404）会记录在负缓存中，
+        之后直接使用备用数据源，不再请求实时估值API。
+        
         Args:
             fund_code: 基金代码（6位数字）
             
         Returns:
             包含基金信息的字典，或None如果失败
         """
-        time.sleep(self.delay)
+        url = self.endpoints['realtime'].format(code=fund_code)
         
-        url = f"https://fundgz.1234567.com.cn/js/fundgz_{fund_code}.js"
+        if self._is_missing(url):
+            self.collector.incr('fallbacks_total', endpoint='realtime', fallback='detail', reason='known_missing')
+            print(f"实时估值API不支持基金 {fund_code}（已记录），直接使用备用数据源...")
+            return self.get_fund_from_detail_page(fund_code)
         
         try:
-            response = self._request(url)
+            response = self._request(url, endpoint='realtime')
             if not response:
                 return None
             
-            # 解析JSONP响应
-            content = response.text
-            # 提取JSON数据
-            json_str = re.search(r'jsonpgz\((.*)\)', content)
-            if not json_str:
-                print(f"无法解析基金代码 {fund_code} 的数据")
+            with self.collector.timer('parse_seconds', endpoint='realtime'):
+                info = parse_fundgz_response(fund_code, response.text)
+            if not info:
                 return None
             
-            data = json.loads(json_str.group(1))
-            
-            info = {
-                'fund_code': fund_code,
-                'fund_name': data.get('name', ''),
-                'unit_net_value': float(data.get('gsz', 0)),
-                'accumulated_net_value': float(data.get('jsn', 0)),
-                'daily_growth_rate': float(data.get('dwjz', 0)) if data.get('dwjz') else 0,
-                'update_date': data.get('gztime', ''),
-                'status': data.get('isrising', ''),
-            }
-            
             print(f"基金 {fund_code} 使用实时估值API成功获取数据")
-            return info
+            return self._quote(info)
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
+                self._mark_missing(url)
+                self.collector.incr('fallbacks_total', endpoint='realtime', fallback='detail', reason='not_found')
                 print(f"实时估值API不支持基金 {fund_code}（404错误），尝试使用备用数据源...")
                 return self.get_fund_from_detail_page(fund_code)
             else:
@@ -121,106 +818,85 @@ class FundScraper:
         Returns:
             包含基金信息的字典
         """
-        time.sleep(self.delay)
-        
-        url = f"http://fund.eastmoney.com/{fund_code}.html"
+        url = self.endpoints['detail'].format(code=fund_code)
         
         try:
-            response = self._request(url)
+            response = self._request(url, endpoint='detail')
             if not response:
                 print(f"无法访问基金详情页: {fund_code}")
                 return None
             
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            info = {'fund_code': fund_code}
+            with self.collector.timer('parse_seconds', endpoint='detail'):
+                info = parse_detail_page(fund_code, response.content)
             
-            # 获取基金名称 - 尝试多个选择器
-            fund_name_elem = soup.select_one('.fundDetail-tit')
-            if not fund_name_elem:
-                fund_name_elem = soup.select_one('h1.title')
-            if not fund_name_elem:
-                fund_name_elem = soup.select_one('div.title h1')
+            print(f"基金 {fund_code} 使用备用数据源（详情页）成功获取数据")
+            return self._quote(info)
+        except Exception as e:
+            print(f"从备用数据源获取基金信息失败: {fund_code}, 错误: {e}")
+            return None
+
+    def _load_fund_page(self, fund_code: str) -> Optional[Tuple[Dict, Dict]]:
+        """
+        下载并解析基金档案页，结果保存在本次运行的页面缓存中
+        
+        基本信息和历史业绩来自同一个页面，缓存保证每个URL只下载、解析一次。
+        
+        Args:
+            fund_code: 基金代码
             
-            if fund_name_elem:
-                info['fund_name'] = fund_name_elem.get_text(strip=True)
+        Returns:
+            (info, performance)元组，或None如果请求失败
+        """
+        url = self.endpoints['fundpage'].format(code=fund_code)
+        
+        with self._page_cache_lock:
+            if url in self._page_cache:
+                return self._page_cache[url]
+        
+        response = self._request(url, endpoint='fundpage')
+        if not response:
+            return None
+        
+        with self.collector.timer('parse_seconds', endpoint='fundpage'):
+            parsed = parse_fund_page(fund_code, response.content)
+        with self._page_cache_lock:
+            self._page_cache[url] = parsed
+        return parsed
+
+    def clear_page_cache(self, fund_code: Optional[str] = None):
+        """
+        清空页面缓存（批量抓取结束时会自动调用）
+        
+        Args:
+            fund_code: 只清除该基金的缓存，None表示全部清空
+        """
+        with self._page_cache_lock:
+            if fund_code is None:
+                self._page_cache.clear()
             else:
-                info['fund_name'] = ''
+                self._page_cache.pop(self.endpoints['fundpage'].format(code=fund_code), None)
+
+    def get_fund_page_details(self, fund_code: str) -> Optional[Dict]:
+        """
+        从基金档案页一次性获取基本信息（类型、公司、经理）和历史业绩
+        
+        Args:
+            fund_code: 基金代码
             
-            # 获取单位净值 - 查找包含净值的数字
-            unit_net_value = 0.0
-            daily_growth_rate = 0.0
-            update_date = ''
-            
-            # 尝试从数据表中获取净值信息
-            data_nums = soup.select_one('.dataNums')
-            if data_nums:
-                # 查找所有的数字元素
-                numbers = data_nums.select('.ui-font-large')
-                if numbers:
-                    try:
-                        unit_net_value = float(numbers[0].get_text(strip=True))
-                    except (ValueError, IndexError):
-                        pass
-                
-                # 查找日增长率
-                growth_elems = data_nums.select('.ui-font-large.red, .ui-font-large.green')
-                if len(growth_elems) > 1:
-                    try:
-                        growth_text = growth_elems[1].get_text(strip=True)
-                        # 移除%符号
-                        growth_text = growth_text.rstrip('%')
-                        daily_growth_rate = float(growth_text)
-                    except (ValueError, IndexError):
-                        pass
-            
-            # 如果未找到，尝试从其他位置获取净值信息
-            if unit_net_value == 0.0:
-                # 查找包含净值的所有表格
-                tables = soup.find_all('table')
-                for table in tables:
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        cols = row.find_all(['td', 'th'])
-                        if len(cols) >= 2:
-                            header = cols[0].get_text(strip=True)
-                            value = cols[1].get_text(strip=True)
-                            
-                            if '单位净值' in header or '最新净值' in header:
-                                try:
-                                    unit_net_value = float(value)
-                                except ValueError:
-                                    pass
-                            elif '日增长率' in header or '涨幅' in header or '日增幅' in header:
-                                try:
-                                    value_clean = value.rstrip('%')
-                                    daily_growth_rate = float(value_clean)
-                                except ValueError:
-                                    pass
-                            elif '净值日期' in header or '更新日期' in header:
-                                update_date = value
-            
-            # 如果仍未找到净值，尝试从页面的其他部分查找
-            if unit_net_value == 0.0:
-                # 查找所有包含数字的元素
-                all_texts = soup.get_text()
-                match = re.search(r'单位净值[：:]\s*([\d.]+)', all_texts)
-                if match:
-                    try:
-                        unit_net_value = float(match.group(1))
-                    except ValueError:
-                        pass
-            
-            info['unit_net_value'] = unit_net_value
-            info['daily_growth_rate'] = daily_growth_rate
-            info['update_date'] = update_date
-            info['accumulated_net_value'] = 0.0
-            info['status'] = ''
+        Returns:
+            合并了基本信息和业绩数据的字典
+        """
+        try:
+            parsed = self._load_fund_page(fund_code)
+            if not parsed:
+                return None
             
-            print(f"基金 {fund_code} 使用备用数据源（详情页）成功获取数据")
-            return info
+            info, performance = parsed
+            details = dict(info)
+            details.update(performance)
+            return details
         except Exception as e:
-            print(f"从备用数据源获取基金信息失败: {fund_code}, 错误: {e}")
+            print(f"从页面获取基金信息失败: {fund_code}, 错误: {e}")
             return None
 
     def get_fund_info_from_page(self, fund_code: str) -> Optional[Dict]:
@@ -233,49 +909,12 @@ class FundScraper:
         Returns:
             包含基金详细信息的字典
         """
-        time.sleep(self.delay)
-        
-        url = f"https://fundpage.eastmoney.com/{fund_code}.html"
-        
         try:
-            response = self._request(url)
-            if not response:
+            parsed = self._load_fund_page(fund_code)
+            if not parsed:
                 return None
             
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            # 提取基金类型、基金公司、基金经理信息
-            info = {'fund_code': fund_code}
-            
-            # 获取基金名称和基本信息
-            fund_name = soup.select_one('div.title h1')
-            if fund_name:
-                info['fund_name'] = fund_name.get_text(strip=True)
-            
-            # 查找基金类型
-            fund_type_elem = soup.find('dt', string='基金类型')
-            if fund_type_elem:
-                fund_type = fund_type_elem.find_next('dd')
-                if fund_type:
-                    info['fund_type'] = fund_type.get_text(strip=True)
-            
-            # 查找基金公司
-            company_elem = soup.find('dt', string='基金公司')
-            if company_elem:
-                company = company_elem.find_next('dd')
-                if company:
-                    info['fund_company'] = company.get_text(strip=True)
-            
-            # 查找基金经理
-            manager_elem = soup.find('dt', string='基金经理')
-            if manager_elem:
-                manager = manager_elem.find_next('dd')
-                if manager:
-                    manager_name = manager.find('a')
-                    if manager_name:
-                        info['fund_manager'] = manager_name.get_text(strip=True)
-            
-            return info
+            return dict(parsed[0])
         except Exception as e:
             print(f"从页面获取基金信息失败: {fund_code}, 错误: {e}")
             return None
@@ -290,47 +929,14 @@ class FundScraper:
         Returns:
             包含基金业绩数据的字典
         """
-        time.sleep(self.delay)
-        
-        url = f"https://fundpage.eastmoney.com/{fund_code}.html"
-        
         try:
-            response = self._request(url)
-            if not response:
+            parsed = self._load_fund_page(fund_code)
+            if not parsed:
                 return None
             
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            performance = {}
-            
-            # 查找业绩表格或相关信息
-            # 这个可能需要根据网站的实际结构调整
-            tables = soup.find_all('table')
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cols = row.find_all(['td', 'th'])
-                    if len(cols) >= 2:
-                        header = cols[0].get_text(strip=True)
-                        value = cols[1].get_text(strip=True)
-                        
-                        # 匹配各个时期的收益率
-                        if '1个月' in header or '近1月' in header:
-                            performance['monthly_1_return'] = value
-                        elif '3个月' in header or '近3月' in header:
-                            performance['monthly_3_return'] = value
-                        elif '6个月' in header or '近6月' in header:
-                            performance['monthly_6_return'] = value
-                        elif '1年' in header or '近1年' in header:
-                            performance['yearly_1_return'] = value
-                        elif '3年' in header or '近3年' in header:
-                            performance['yearly_3_return'] = value
-                        elif '5年' in header or '近5年' in header:
-                            performance['yearly_5_return'] = value
-                        elif '成立以来' in header:
-                            performance['since_establishment_return'] = value
-            
-            return performance if performance else None
+            performance = parsed[1]
+            
+            return dict(performance) if performance else None
         except Exception as e:
             print(f"获取基金业绩数据失败: {fund_code}, 错误: {e}")
             return None
@@ -356,38 +962,116 @@ class FundScraper:
             return None
         
         if detailed:
-            # 获取详细信息
-            page_info = self.get_fund_info_from_page(fund_code)
-            if page_info:
-                fund_data.update(page_info)
-            
-            # 获取历史业绩
-            performance = self.get_fund_performance(fund_code)
-            if performance:
-                fund_data.update(performance)
+            # 获取详细信息和历史业绩（同一页面只下载解析一次）
+            details = self.get_fund_page_details(fund_code)
+            if details:
+                fund_data.update(details)
         
         print(f"成功获取基金 {fund_code} 的数据")
         return fund_data
 
-    def scrape_multiple_funds(self, fund_codes: List[str], detailed: bool = False) -> List[Dict]:
+    def _map_concurrent(self, func, items: List, max_workers: Optional[int] = None) -> List:
+        """
+        对列表中的每一项调用func，可选使用线程池并发执行
+        
+        所有线程共享同一个requests.Session，结果顺序与输入顺序一致。
+        
+        Args:
+            func: 处理单个元素的函数（如接收基金代码）
+            items: 待处理的元素列表
+            max_workers: 并发线程数，None表示使用实例默认值
+            
+        Returns:
+            与items一一对应的结果列表
+        """
+        workers = self.max_workers if max_workers is None else max(1, max_workers)
+        workers = min(workers, len(items)) if items else 1
+        
+        if workers <= 1:
+            return [func(item) for item in items]
+        
+        self._ensure_pool_size(workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _iter_concurrent(self, func, items: Iterable, max_workers: Optional[int] = None) -> Iterator:
+        """
+        _map_concurrent的生成器版本，结果按输入顺序逐个产出
+        
+        线程池中同时只保留少量待完成的任务，items可以是生成器，
+        内存占用与元素总数无关。
+        
+        Args:
+            func: 处理单个元素的函数
+            items: 待处理的元素（列表或生成器）
+            max_workers: 并发线程数，None表示使用实例默认值
+            
+        Yields:
+            与items一一对应的结果
+        """
+        workers = self.max_workers if max_workers is None else max(1, max_workers)
+        
+        if workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+        
+        self._ensure_pool_size(workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def iter_funds(self, fund_codes: Iterable[str], detailed: bool = False,
+                   max_workers: Optional[int] = None) -> Iterator[Dict]:
+        """
+        逐个产出基金数据，抓取到一个就返回一个
+        
+        Args:
+            fund_codes: 基金代码列表或生成器
+            detailed: 是否获取详细信息
+            max_workers: 并发线程数（默认使用初始化时的max_workers）
+            
+        Yields:
+            基金数据字典（顺序与输入一致，失败的基金被跳过）
+        """
+        def scrape(code):
+            try:
+                return self.scrape_fund(code, detailed=detailed)
+            finally:
+                self.clear_page_cache(code)
+        
+        for data in self._iter_concurrent(scrape, fund_codes, max_workers=max_workers):
+            if data:
+                yield data
+
+    def scrape_multiple_funds(self, fund_codes: List[str], detailed: bool = False,
+                              max_workers: Optional[int] = None) -> List[Dict]:
         """
         批量抓取多个基金的数据
         
         Args:
             fund_codes: 基金代码列表
             detailed: 是否获取详细信息
+            max_workers: 并发线程数（默认使用初始化时的max_workers）
             
         Returns:
-            包含所有基金数据的列表
+            包含所有基金数据的列表（顺序与输入一致）
         """
-        results = []
-        
-        for code in fund_codes:
-            data = self.scrape_fund(code, detailed=detailed)
-            if data:
-                results.append(data)
+        try:
+            results = self._map_concurrent(
+                lambda code: self.scrape_fund(code, detailed=detailed),
+                fund_codes,
+                max_workers=max_workers
+            )
+        finally:
+            self.clear_page_cache()
         
-        return results
+        return [data for data in results if data]
 
     def save_to_csv(self, data: Union[List[Dict], pd.DataFrame], filepath: str) -> bool:
         """
@@ -402,7 +1086,7 @@ class FundScraper:
         """
         try:
             if isinstance(data, list):
-                df = pd.DataFrame(data)
+                df = records_to_frame(data)
             else:
                 df = data
             
@@ -435,7 +1119,7 @@ class FundScraper:
             Path(filepath).parent.mkdir(parents=True, exist_ok=True)
             
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                json.dump(data, f, ensure_ascii=False, indent=2, default=to_plain)
             
             print(f"数据已保存到: {filepath}")
             return True
@@ -448,150 +1132,167 @@ class FundScraper:
         将数据转换为DataFrame
         
         Args:
-            data: 基金数据列表
+            data: 基金数据列表（FundQuote/NavRecord或字典）
             
         Returns:
             DataFrame对象
         """
-        return pd.DataFrame(data)
+        return records_to_frame(data)
+
+    def _fetch_history_page(self, fund_code: str, page: int, per: int,
+                            start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> Optional[str]:
+        """
+        请求历史净值API的一页数据
+        
+        Args:
+            fund_code: 基金代码
+            page: 页码（从1开始）
+            per: 每页条数
+            start_date: 区间起始日期(YYYY-MM-DD)，由服务器过滤
+            end_date: 区间结束日期(YYYY-MM-DD)，由服务器过滤
+            
+        Returns:
+            响应文本，或None如果请求失败
+        """
+        url = self.endpoints['history']
+        params = {
+            'type': 'lsjz',
+            'code': fund_code,
+            'page': page,
+            'per': per
+        }
+        if start_date:
+            params['sdate'] = start_date
+        if end_date:
+            params['edate'] = end_date
+        
+        response = self._request(url, params=params, endpoint='history')
+        if not response:
+            print(f"请求失败: {url}")
+            return None
+        return response.text
+
+    def get_fund_list(self) -> Optional[List[FundListing]]:
+        """
+        下载全部基金的代码表（代码、拼音缩写、名称、类型）
+        
+        Returns:
+            FundListing列表，或None如果失败
+        """
+        url = self.endpoints['fundlist']
+        
+        try:
+            response = self._request(url, endpoint='fundlist')
+            if not response:
+                return None
+            
+            with self.collector.timer('parse_seconds', endpoint='fundlist'):
+                listings = parse_fund_list(response.content)
+            print(f"基金代码表: 共 {len(listings)} 只基金")
+            return listings
+        except Exception as e:
+            print(f"获取基金代码表失败: {e}")
+            return None
 
-    def get_fund_history(self, fund_code: str, days: int = 30) -> Optional[List[Dict]]:
+    def get_fund_history(self, fund_code: str, days: int = 30,
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> Optional[List[Dict]]:
         """
         获取基金历史净值数据
         
         Args:
             fund_code: 基金代码
             days: 获取最近N天的数据（默认30天）
+            start_date: 区间起始日期(YYYY-MM-DD，含)
+            end_date: 区间结束日期(YYYY-MM-DD，含)
         
         Returns:
-            历史净值数据列表，或None如果失败
+            历史净值数据列表（按日期从新到旧，as_records时为NavRecord），或None如果失败
+        """
+        history = self._collect_history(fund_code, days=days, start_date=start_date, end_date=end_date)
+        if history and not self.as_records:
+            return [record.as_dict() for record in history]
+        return history
+
+    def _collect_history(self, fund_code: str, days: int = 30,
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None, raw: bool = False) -> Optional[List]:
         """
-        time.sleep(self.delay)
+        请求并解析基金的历史净值各页
         
-        url = "http://fund.eastmoney.com/f10/F10DataApi.aspx"
+        先请求第1页，从返回的records/pages字段得到准确的总页数，
+        再并发请求剩余需要的页（受限流器约束），按页码顺序合并结果。
         
+        指定start_date/end_date时，日期区间通过sdate/edate参数交给服务器过滤，
+        只传输区间内的数据，days参数被忽略。
+        
+        Args:
+            fund_code: 基金代码
+            days: 获取最近N天的数据（默认30天）
+            start_date: 区间起始日期(YYYY-MM-DD，含)
+            end_date: 区间结束日期(YYYY-MM-DD，含)
+            raw: 返回表格的原始单元格元组而不是NavRecord（见parse_history_page）
+        
+        Returns:
+            历史净值数据列表（按日期从新到旧），或None如果失败
+        """
         history_data = []
-        page = 1
+        date_range = bool(start_date or end_date)
         
-        # 计算需要抓取的页数（每页最多49条记录）
-        max_pages = max(1, (days // 49) + 2)
+        try:
+            check_date_range(start_date, end_date)
+        except ValueError as e:
+            print(e)
+            return None
+        
+        # 每页最多49条记录
+        per = 49
+        
+        if date_range:
+            # 区间查询不按天数截止，总页数完全由第1页返回的pages决定
+            days = None
+            needed_pages = 1
+        else:
+            # 每个自然日最多一条净值，最近days天的数据不会超过days+1条
+            needed_pages = max(1, -(-(days + 1) // per))
+        
+        def fetch(page):
+            return self._fetch_history_page(fund_code, page, per,
+                                            start_date=start_date, end_date=end_date)
+        
+        def parse(page, page_text):
+            with self.collector.timer('parse_seconds', endpoint='history', parser=self.history_parser):
+                return parse_history_page(
+                    fund_code, page_text, days, page,
+                    parser=self.history_parser, start_date=start_date, end_date=end_date, raw=raw
+                )
         
         try:
-            while page <= max_pages:
-                params = {
-                    'type': 'lsjz',
-                    'code': fund_code,
-                    'page': page,
-                    'per': 49
-                }
-                
-                response = self._request(url, params=params)
-                if not response:
-                    print(f"请求失败: {url}")
-                    break
-                
-                # API返回的是JavaScript变量，格式为: var apidata={ content:"...", records:XX, pages:XX}
-                # 需要提取HTML表格并解析
-                
-                # 提取HTML内容
-                content_match = re.search(r'content:"(.*?)",records', response.text, re.DOTALL)
-                if not content_match:
-                    print(f"基金 {fund_code} 第{page}页: 未找到content字段")
-                    break
-                
-                html_content = content_match.group(1)
-                
-                # 使用BeautifulSoup解析表格
-                soup = BeautifulSoup(html_content, 'lxml')
-                table = soup.find('table')
+            text = fetch(1)
+            if text is not None:
+                records, reached_cutoff = parse(1, text)
+                if records:
+                    history_data.extend(records)
                 
-                if not table:
-                    print(f"基金 {fund_code} 第{page}页: 未找到表格")
-                    break
+                total_pages = parse_history_meta(text)[1]
+                if total_pages is not None:
+                    needed_pages = total_pages if date_range else min(needed_pages, total_pages)
                 
-                tbody = table.find('tbody')
-                if not tbody:
-                    print(f"基金 {fund_code} 第{page}页: 表格为空")
-                    break
-                
-                rows = tbody.find_all('tr')
-                if not rows:
-                    print(f"基金 {fund_code} 第{page}页: 没有数据行")
-                    break
-                
-                page_has_valid_data = False
-                
-                for row in rows:
-                    try:
-                        cols = row.find_all('td')
-                        if len(cols) < 4:
-                            continue
-                        
-                        # 解析日期
-                        date_str = cols[0].get_text(strip=True)
-                        if not date_str:
-                            continue
-                        
-                        # 验证日期格式
-                        try:
-                            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                        except ValueError:
-                            continue
-                        
-                        # 检查是否在指定天数范围内
-                        days_ago = (datetime.now() - date_obj).days
-                        if days_ago > days:
-                            # 已经超出天数范围，停止抓取
-                            page = max_pages + 1
+                if records and not reached_cutoff and needed_pages > 1:
+                    pages = list(range(2, needed_pages + 1))
+                    texts = self._map_concurrent(fetch, pages, max_workers=self.history_workers)
+                    
+                    # 按页码顺序合并，遇到失败页、空页或超出范围的记录即停止
+                    for page, page_text in zip(pages, texts):
+                        if page_text is None:
+                            break
+                        records, reached_cutoff = parse(page, page_text)
+                        if not records:
+                            break
+                        history_data.extend(records)
+                        if reached_cutoff:
                             break
-                        
-                        page_has_valid_data = True
-                        
-                        # 解析单位净值
-                        unit_net_value = 0.0
-                        try:
-                            unit_net_value_str = cols[1].get_text(strip=True)
-                            unit_net_value = float(unit_net_value_str)
-                        except (ValueError, IndexError):
-                            pass
-                        
-                        # 解析累计净值
-                        accumulated_net_value = 0.0
-                        try:
-                            accumulated_net_value_str = cols[2].get_text(strip=True)
-                            accumulated_net_value = float(accumulated_net_value_str)
-                        except (ValueError, IndexError):
-                            pass
-                        
-                        # 解析增长率
-                        growth_rate = '0%'
-                        try:
-                            growth_rate = cols[3].get_text(strip=True)
-                            if not growth_rate or growth_rate == '':
-                                growth_rate = '0%'
-                        except IndexError:
-                            pass
-                        
-                        # 构建历史记录
-                        history_record = {
-                            'fund_code': fund_code,
-                            'date': date_str,
-                            'unit_net_value': unit_net_value,
-                            'accumulated_net_value': accumulated_net_value,
-                            'growth_rate': growth_rate,
-                        }
-                        history_data.append(history_record)
-                        
-                    except Exception as e:
-                        print(f"解析历史记录时出错: {e}")
-                        continue
-                
-                # 如果本页没有有效数据，停止抓取
-                if not page_has_valid_data:
-                    break
-                
-                page += 1
-                time.sleep(self.delay)
             
             if history_data:
                 print(f"基金 {fund_code} 成功获取 {len(history_data)} 条历史数据")
@@ -606,28 +1307,143 @@ class FundScraper:
             traceback.print_exc()
             return None
 
-    def get_multiple_funds_history(self, fund_codes: List[str], days: int = 30) -> Dict[str, List[Dict]]:
+    def get_nav_series(self, fund_code: str, days: int = 30,
+                       start_date: Optional[str] = None,
+                       end_date: Optional[str] = None) -> Optional[NavSeries]:
+        """
+        获取基金历史净值，以NumPy数组形式的NavSeries返回
+        
+        表格的单元格直接按列转换为数组，不为每一行构造NavRecord。
+        
+        Args:
+            fund_code: 基金代码
+            days: 获取最近N天的数据（默认30天）
+            start_date: 区间起始日期(YYYY-MM-DD，含)
+            end_date: 区间结束日期(YYYY-MM-DD，含)
+        
+        Returns:
+            NavSeries对象（按日期从旧到新），或None如果失败
+        """
+        rows = self._collect_history(fund_code, days=days, start_date=start_date, end_date=end_date, raw=True)
+        if not rows:
+            return None
+        return NavSeries.from_rows(fund_code, rows)
+
+    def get_multiple_funds_history(self, fund_codes: List[str], days: int = 30,
+                                   max_workers: Optional[int] = None,
+                                   start_date: Optional[str] = None,
+                                   end_date: Optional[str] = None) -> Dict[str, List[Dict]]:
         """
         批量获取多个基金的历史数据
         
         Args:
             fund_codes: 基金代码列表
             days: 获取最近N天的数据
+            max_workers: 并发线程数（默认使用初始化时的max_workers）
+            start_date: 区间起始日期(YYYY-MM-DD)，指定后忽略days
+            end_date: 区间结束日期(YYYY-MM-DD)
             
         Returns:
             {fund_code: [历史数据列表]}
         """
-        history_dict = {}
-        
         total = len(fund_codes)
-        for idx, code in enumerate(fund_codes, 1):
+        
+        def fetch(item):
+            idx, code = item
             print(f"[{idx}/{total}] 正在获取基金 {code} 的历史数据...")
-            history = self.get_fund_history(code, days=days)
+            return self.get_fund_history(code, days=days, start_date=start_date, end_date=end_date)
+        
+        results = self._map_concurrent(fetch, list(enumerate(fund_codes, 1)), max_workers=max_workers)
+        
+        history_dict = {}
+        for code, history in zip(fund_codes, results):
             if history:
                 history_dict[code] = history
         
         return history_dict
 
+    def iter_history(self, fund_codes: Iterable[str], days: int = 30,
+                     max_workers: Optional[int] = None,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None) -> Iterator[Dict]:
+        """
+        逐条产出多个基金的历史净值，每个基金抓取完成后立即产出其全部记录
+        
+        Args:
+            fund_codes: 基金代码列表或生成器
+            days: 获取最近N天的数据
+            max_workers: 并发线程数（默认使用初始化时的max_workers）
+            start_date: 区间起始日期(YYYY-MM-DD)，指定后忽略days
+            end_date: 区间结束日期(YYYY-MM-DD)
+            
+        Yields:
+            历史净值记录（含fund_code字段），基金之间保持输入顺序
+        """
+        def fetch(item):
+            idx, code = item
+            print(f"[{idx}] 正在获取基金 {code} 的历史数据...")
+            return self.get_fund_history(code, days=days, start_date=start_date, end_date=end_date)
+        
+        for history in self._iter_concurrent(fetch, enumerate(fund_codes, 1), max_workers=max_workers):
+            if history:
+                yield from history
+
+    def sync_history(self, fund_code: str, store: HistoryStore, days: int = 365) -> int:
+        """
+        增量同步基金历史净值到本地存储
+        
+        以本地最新日期的次日作为start_date交给服务器过滤，只传输新增的数据，新记录追加到存储中。
+        本地没有该基金的数据时，首次同步最近days天。
+        
+        Args:
+            fund_code: 基金代码
+            store: 本地历史净值存储
+            days: 首次同步时回溯的天数
+            
+        Returns:
+            新增的记录数
+        """
+        last_date = store.last_date(fund_code)
+        if last_date:
+            start = datetime.strptime(last_date, '%Y-%m-%d') + timedelta(days=1)
+        else:
+            start = datetime.now() - timedelta(days=days)
+        
+        if start.date() > datetime.now().date():
+            print(f"基金 {fund_code} 本地数据已是最新（本地最新: {last_date}）")
+            return 0
+        
+        # 直接写入存储，不需要转换为字典
+        history = self._collect_history(fund_code, start_date=start.strftime('%Y-%m-%d'))
+        if not history:
+            print(f"基金 {fund_code} 没有新的历史数据（本地最新: {last_date or '无'}）")
+            return 0
+        
+        added = store.append(history)
+        print(f"基金 {fund_code} 新增 {added} 条历史数据（本地最新: {last_date or '无'}）")
+        return added
+
+    def sync_multiple_funds_history(self, fund_codes: List[str], store: HistoryStore, days: int = 365,
+                                    max_workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        批量增量同步多个基金的历史净值
+        
+        Args:
+            fund_codes: 基金代码列表
+            store: 本地历史净值存储
+            days: 首次同步时回溯的天数
+            max_workers: 并发线程数（默认使用初始化时的max_workers）
+            
+        Returns:
+            {fund_code: 新增记录数}
+        """
+        results = self._map_concurrent(
+            lambda code: self.sync_history(code, store, days=days),
+            fund_codes,
+            max_workers=max_workers
+        )
+        return dict(zip(fund_codes, results))
+
     def save_history_to_csv(self, history_data: Union[Dict[str, List[Dict]], List[Dict]], filepath: str) -> bool:
         """
         保存历史数据到CSV文件
@@ -652,7 +1468,7 @@ class FundScraper:
                 print("没有数据可保存")
                 return False
             
-            df = pd.DataFrame(combined_data)
+            df = records_to_frame(combined_data)
             
             # 确保目录存在
             Path(filepath).parent.mkdir(parents=True, exist_ok=True)
@@ -680,7 +1496,7 @@ class FundScraper:
             Path(filepath).parent.mkdir(parents=True, exist_ok=True)
             
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(history_data, f, ensure_ascii=False, indent=2)
+                json.dump(history_data, f, ensure_ascii=False, indent=2, default=to_plain)
             
             print(f"历史数据已保存到: {filepath}")
             return True
@@ -0,0 +1,408 @@
+"""
+本地基金数据查询服务
+在FundScraper前面提供一个小型HTTP/JSON接口，多个内部工具共用同一份抓取结果：
+- 进程内LRU缓存，每类接口单独设置有效期
+- 请求合并（singleflight）：同一基金的并发请求只触发一次上游抓取，其余请求等待并共享结果
+
+接口:
+    GET /quote/<code>                        实时估值/最新净值
+    GET /detail/<code>                       详细信息（含档案页的类型、公司、经理、阶段业绩）
+    GET /history/<code>?days=30              历史净值（也可用 start=YYYY-MM-DD&end=YYYY-MM-DD）
+    GET /health                              健康检查
+    GET /stats                               缓存与上游请求统计
+
+用法:
+    python scrape_funds.py serve --port 8080
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from fund_scraper import FundScraper, DEFAULT_ENDPOINTS
+from http_cache import HttpCache
+from records import to_plain
+from universe import FUND_CODE_PATTERN
+
+
+# 各接口在进程内缓存中的默认有效期（秒）
+DEFAULT_SERVE_TTLS = {
+    'quote': 30,
+    'detail': 3600,
+    'history': 3600,
+}
+
+
+class LRUCache:
+    """带过期时间的线程安全LRU缓存"""
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        初始化缓存
+        
+        Args:
+            max_entries: 最多保存的条目数，超出时淘汰最久未使用的条目
+        """
+        self.max_entries = max(1, max_entries)
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        读取缓存
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            (是否命中, 值)，过期的条目视为未命中并被删除
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        """
+        写入缓存
+        
+        Args:
+            key: 缓存键
+            value: 值
+            ttl: 有效期（秒），<=0时不缓存
+        """
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """合并同一键的并发调用：只有第一个调用者真正执行，其余等待并共享结果（或异常）"""
+
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+        
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls: Dict[Hashable, 'SingleFlight._Call'] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行func，同一key已有在途调用时等待其结果
+        
+        Args:
+            key: 合并键
+            func: 无参函数
+        
+        Returns:
+            (结果, 是否与其他调用共享了结果)
+        
+        Raises:
+            Exception: func抛出的异常（所有等待者都会收到）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+
+class FundService:
+    """缓存 + 请求合并的基金数据查询"""
+
+    def __init__(self, scraper: FundScraper, ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = 4096):
+        """
+        初始化服务
+        
+        Args:
+            scraper: 上游FundScraper实例（所有请求共用）
+            ttls: 各接口的缓存有效期 {quote/detail/history: 秒}，未指定的使用DEFAULT_SERVE_TTLS
+            max_entries: 进程内缓存的最大条目数
+        
+        Raises:
+            ValueError: 未知的接口名
+        """
+        unknown = set(ttls or {}) - set(DEFAULT_SERVE_TTLS)
+        if unknown:
+            raise ValueError(f"未知的接口: {', '.join(sorted(unknown))}（可选: {', '.join(DEFAULT_SERVE_TTLS)}）")
+        self.scraper = scraper
+        self.ttls = {**DEFAULT_SERVE_TTLS, **(ttls or {})}
+        self.cache = LRUCache(max_entries)
+        self.flight = SingleFlight()
+        # hits（缓存命中）、misses、coalesced（合并到在途请求）、upstream（实际上游抓取）、errors
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _get(self, endpoint: str, key: Tuple, fetch: Callable[[], Any]) -> Any:
+        """先查缓存，未命中时通过singleflight抓取并写入缓存（失败结果不缓存）"""
+        hit, value = self.cache.get(key)
+        if hit:
+            self._count('hits')
+            return value
+        self._count('misses')
+        
+        def load():
+            # 等待期间可能已有其他请求写入缓存
+            hit, value = self.cache.get(key)
+            if hit:
+                return value
+            self._count('upstream')
+            value = fetch()
+            if value:
+                self.cache.put(key, value, self.ttls[endpoint])
+            return value
+        
+        value, shared = self.flight.do(key, load)
+        if shared:
+            self._count('coalesced')
+        return value
+
+    def quote(self, fund_code: str):
+        """
+        实时估值/最新净值
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            基金数据（字典，scraper指定as_records时为FundQuote），或None如果获取失败
+        """
+        return self._get('quote', ('quote', fund_code), lambda: self.scraper.get_fund_info(fund_code))
+
+    def detail(self, fund_code: str):
+        """
+        详细信息
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            基金数据（含档案页字段），或None如果获取失败
+        """
+        def fetch():
+            try:
+                return self.scraper.scrape_fund(fund_code, detailed=True)
+            finally:
+                self.scraper.clear_page_cache(fund_code)
+        
+        return self._get('detail', ('detail', fund_code), fetch)
+
+    def history(self, fund_code: str, days: int = 30, start_date: Optional[str] = None,
+                end_date: Optional[str] = None):
+        """
+        历史净值
+        
+        Args:
+            fund_code: 基金代码
+            days: 最近N天（指定start_date/end_date时忽略）
+            start_date: 区间起始日期
+            end_date: 区间结束日期
+        
+        Returns:
+            历史净值记录列表，或None如果获取失败
+        """
+        # 与实际请求的参数一致地规范化，省略days、days=0和days=30共用同一个缓存条目
+        days = None if start_date or end_date else (days or 30)
+        key = ('history', fund_code, days, start_date, end_date)
+        return self._get('history', key, lambda: self.scraper.get_fund_history(
+            fund_code, days=days or 30, start_date=start_date, end_date=end_date))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        统计信息
+        
+        Returns:
+            缓存命中、请求合并、上游请求次数，以及上游抓取器的运行统计（StatsCollector.snapshot）
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['cache_entries'] = len(self.cache)
+        stats['upstream_stats'] = self.scraper.collector.snapshot()
+        return stats
+
+
+class FundRequestHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理，服务对象通过server.service获取"""
+    
+    server_version = 'FundServer/1.0'
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=to_plain).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        service: FundService = self.server.service
+        parts = urlsplit(self.path)
+        segments = [segment for segment in parts.path.split('/') if segment]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        
+        if segments == ['health']:
+            return self._send_json(200, {'status': 'ok'})
+        if segments == ['stats']:
+            return self._send_json(200, service.snapshot())
+        if len(segments) != 2 or segments[0] not in ('quote', 'detail', 'history'):
+            return self._send_json(404, {'error': f"未知的接口: {parts.path}"})
+        
+        endpoint, fund_code = segments
+        if not FUND_CODE_PATTERN.match(fund_code):
+            return self._send_json(400, {'error': f"无效的基金代码: {fund_code}"})
+        
+        try:
+            if endpoint == 'quote':
+                data = service.quote(fund_code)
+            elif endpoint == 'detail':
+                data = service.detail(fund_code)
+            else:
+                try:
+                    days = int(query.get('days', 30))
+                    for value in (query.get('start'), query.get('end')):
+                        if value:
+                            datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    return self._send_json(400, {'error': "参数错误: days应为整数，start/end格式应为YYYY-MM-DD"})
+                data = service.history(fund_code, days=days, start_date=query.get('start'),
+                                       end_date=query.get('end'))
+        except Exception as e:
+            service._count('errors')
+            return self._send_json(502, {'error': f"上游请求失败: {e}"})
+        
+        if not data:
+            return self._send_json(404, {'error': f"未获取到基金 {fund_code} 的数据"})
+        return self._send_json(200, data)
+
+
+def make_server(service: FundService, host: str = '127.0.0.1', port: int = 8080,
+                quiet: bool = False) -> ThreadingHTTPServer:
+    """
+    创建多线程HTTP服务（调用serve_forever()开始处理请求）
+    
+    Args:
+        service: FundService实例
+        host: 监听地址
+        port: 监听端口，0表示随机端口
+        quiet: 是否关闭每个请求的访问日志
+    
+    Returns:
+        ThreadingHTTPServer对象
+    """
+    server = ThreadingHTTPServer((host, port), FundRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def _parse_assignment(value: str, what: str) -> Tuple[str, str]:
+    """解析 NAME=VALUE 形式的参数"""
+    name, sep, rest = value.partition('=')
+    if not sep or not name or not rest:
+        raise ValueError(f"无效的{what}: {value}，格式应为 NAME=VALUE")
+    return name.strip(), rest.strip()
+
+
+def main(argv=None):
+    """serve子命令入口"""
+    parser = argparse.ArgumentParser(
+        prog='scrape_funds.py serve',
+        description='本地基金数据查询服务（HTTP/JSON）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python scrape_funds.py serve --port 8080
+  curl http://127.0.0.1:8080/quote/110022
+  curl "http://127.0.0.1:8080/history/110022?days=90"
+  
+  # 指向本地测试桩
+  python scrape_funds.py serve --endpoint realtime=http://127.0.0.1:9000/js/fundgz_{code}.js
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认: 127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8080, help='监听端口（默认: 8080）')
+    parser.add_argument('--ttl', action='append', default=[], metavar='ENDPOINT=SECONDS',
+                        help='接口的缓存有效期，可重复指定（接口: quote, detail, history）')
+    parser.add_argument('--max-entries', type=int, default=4096, help='进程内缓存的最大条目数（默认: 4096）')
+    parser.add_argument('--endpoint', action='append', default=[], metavar='NAME=URL',
+                        help=f"替换上游接口地址，可重复指定（接口: {', '.join(DEFAULT_ENDPOINTS)}）")
+    parser.add_argument('-t', '--timeout', type=int, default=10, help='上游请求超时时间（秒，默认: 10）')
+    parser.add_argument('-l', '--delay', type=float, default=0.5, help='上游请求间隔（秒，默认: 0.5）')
+    parser.add_argument('--rate', type=float, help='每个上游主机每秒允许的请求数（默认由 --delay 换算）')
+    parser.add_argument('--burst', type=int, default=1, help='每个上游主机允许的突发请求数（默认: 1）')
+    parser.add_argument('--retries', type=int, default=3, help='上游请求的最大重试次数（默认: 3）')
+    parser.add_argument('--cache', metavar='PATH', help='同时启用持久化HTTP缓存（SQLite文件）')
+    parser.add_argument('--quiet', action='store_true', help='不输出每个请求的访问日志')
+    args = parser.parse_args(argv)
+    
+    try:
+        ttls = {name: float(value) for name, value in
+                (_parse_assignment(item, '缓存有效期') for item in args.ttl)}
+        endpoints = dict(_parse_assignment(item, '接口地址') for item in args.endpoint)
+        scraper = FundScraper(
+            timeout=args.timeout, delay=args.delay, rate=args.rate, burst=args.burst,
+            retries=args.retries, endpoints=endpoints,
+            cache=HttpCache(args.cache) if args.cache else None,
+        )
+        service = FundService(scraper, ttls=ttls, max_entries=args.max_entries)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    server = make_server(service, host=args.host, port=args.port, quiet=args.quiet)
+    print(f"基金数据服务已启动: http://{args.host}:{server.server_address[1]}  (Ctrl-C 停止)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
@@ -0,0 +1,168 @@
+"""
+本地历史净值存储
+基于SQLite保存每个基金的历史净值，供增量同步记录已有的最新日期
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from records import NavRecord, parse_percent
+from nav_series import NavSeries
+
+
+class HistoryStore:
+    """基于SQLite的本地历史净值存储"""
+    
+    COLUMNS = ('fund_code', 'date', 'unit_net_value', 'accumulated_net_value', 'growth_rate')
+
+    def __init__(self, path: str):
+        """
+        初始化存储
+        
+        Args:
+            path: SQLite数据库文件路径
+        """
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nav_history (
+                fund_code TEXT NOT NULL,
+                date TEXT NOT NULL,
+                unit_net_value REAL,
+                accumulated_net_value REAL,
+                growth_rate REAL,
+                PRIMARY KEY (fund_code, date)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（sqlite3连接不能跨线程共享）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def last_date(self, fund_code: str) -> Optional[str]:
+        """
+        查询基金在本地的最新净值日期
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            最新日期(YYYY-MM-DD)，本地没有数据时为None
+        """
+        row = self._conn().execute(
+            "SELECT MAX(date) FROM nav_history WHERE fund_code = ?", (fund_code,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def append(self, records: Iterable[Dict]) -> int:
+        """
+        追加历史记录，已存在的(基金代码, 日期)会被忽略
+        
+        Args:
+            records: 历史记录（get_fund_history返回的NavRecord，或同字段的字典）
+        
+        Returns:
+            实际新增的记录数
+        """
+        rows = [record.as_tuple() if isinstance(record, NavRecord)
+                else tuple(record[col] for col in self.COLUMNS)
+                for record in records]
+        conn = self._conn()
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO nav_history "
+            "(fund_code, date, unit_net_value, accumulated_net_value, growth_rate) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        return conn.total_changes - before
+
+    def load(self, fund_code: str, start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> List[NavRecord]:
+        """
+        读取基金的历史记录
+        
+        Args:
+            fund_code: 基金代码
+            start_date: 起始日期（含）
+            end_date: 结束日期（含）
+        
+        Returns:
+            NavRecord列表，按日期从新到旧排列（与get_fund_history一致）
+        """
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM nav_history WHERE fund_code = ?"
+        args = [fund_code]
+        if start_date:
+            sql += " AND date >= ?"
+            args.append(start_date)
+        if end_date:
+            sql += " AND date <= ?"
+            args.append(end_date)
+        sql += " ORDER BY date DESC"
+        # 旧版数据库中growth_rate以'1.23%'文本保存，读取时统一转换为数值
+        return [NavRecord(code, date, unit, accumulated, parse_percent(growth))
+                for code, date, unit, accumulated, growth in self._conn().execute(sql, args)]
+
+    def load_series(self, fund_code: str, start_date: Optional[str] = None,
+                    end_date: Optional[str] = None) -> NavSeries:
+        """
+        读取基金的历史记录为NavSeries，不经过逐条的记录对象
+        
+        Args:
+            fund_code: 基金代码
+            start_date: 起始日期（含）
+            end_date: 结束日期（含）
+        
+        Returns:
+            NavSeries对象（按日期从旧到新，本地没有数据时为空序列）
+        """
+        sql = "SELECT date, unit_net_value, accumulated_net_value, growth_rate FROM nav_history WHERE fund_code = ?"
+        args = [fund_code]
+        if start_date:
+            sql += " AND date >= ?"
+            args.append(start_date)
+        if end_date:
+            sql += " AND date <= ?"
+            args.append(end_date)
+        sql += " ORDER BY date"
+        rows = self._conn().execute(sql, args).fetchall()
+        if not rows:
+            return NavSeries(fund_code, [], [], [], [])
+        
+        dates, unit, accumulated, growth = zip(*rows)
+        growth = [value if isinstance(value, float) else parse_percent(value) for value in growth]
+        return NavSeries(fund_code, dates,
+                         np.array(unit, dtype=np.float64),
+                         np.array(accumulated, dtype=np.float64),
+                         np.array([np.nan if value is None else value for value in growth], dtype=np.float64))
+
+    def fund_codes(self) -> List[str]:
+        """
+        列出存储中的所有基金代码
+        
+        Returns:
+            基金代码列表
+        """
+        return [row[0] for row in self._conn().execute(
+            "SELECT DISTINCT fund_code FROM nav_history ORDER BY fund_code"
+        )]
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
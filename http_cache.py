@@ -0,0 +1,370 @@
+"""
+持久化HTTP响应缓存
+基于SQLite存储，按接口类别设置不同的有效期，支持ETag/Last-Modified条件请求和按容量的LRU淘汰
+未启用响应缓存时，MissingStore单独保存fundgz返回404的负缓存
+
+SQLite使用WAL模式，多个命令行进程可以同时读写同一个缓存文件。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+# 各类接口的默认缓存有效期（秒）
+DEFAULT_TTLS = {
+    'realtime': 60,           # fundgz实时估值，盘中每分钟更新
+    'detail': 3600,           # fund.eastmoney.com 基金详情页
+    'fundpage': 24 * 3600,    # fundpage.eastmoney.com 基金档案（类型、公司、经理）
+    'history': 4 * 3600,      # F10DataApi.aspx 历史净值，每个交易日更新一次
+    'fundlist': 24 * 3600,    # fundcode_search.js 全部基金代码表，每天更新
+    'missing': 7 * 24 * 3600, # 负缓存：fundgz返回404的基金（ETF、货币基金等），很少变化
+    'default': 3600,
+}
+
+# 未启用HTTP缓存时，命令行默认使用的负缓存文件
+DEFAULT_MISSING_PATH = '.fund_missing.db'
+
+
+def classify_url(url: str) -> str:
+    """
+    根据URL判断接口类别，用于选择缓存有效期
+    
+    Args:
+        url: 请求URL
+    
+    Returns:
+        接口类别: realtime / detail / fundpage / history / fundlist / default
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    if host.startswith('fundgz.') or '/fundgz_' in parts.path:
+        return 'realtime'
+    if 'F10DataApi' in parts.path:
+        return 'history'
+    if 'fundcode_search' in parts.path:
+        return 'fundlist'
+    if host.startswith('fundpage.'):
+        return 'fundpage'
+    if host == 'fund.eastmoney.com' and parts.path.endswith('.html'):
+        return 'detail'
+    return 'default'
+
+
+def make_cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """
+    生成缓存键（参数顺序无关）
+    
+    Args:
+        url: 请求URL
+        params: 查询参数
+    
+    Returns:
+        缓存键（SHA1十六进制字符串）
+    """
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha1(f"{url}?{query}".encode('utf-8')).hexdigest()
+
+
+class CacheEntry:
+    """缓存中的一条响应"""
+
+    def __init__(self, key: str, url: str, content: bytes, headers: Dict, encoding: Optional[str],
+                 etag: Optional[str], last_modified: Optional[str], fresh: bool):
+        self.key = key
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def validators(self) -> Dict[str, str]:
+        """
+        生成条件请求头
+        
+        Returns:
+            包含If-None-Match/If-Modified-Since的请求头字典
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self) -> requests.Response:
+        """
+        还原为requests.Response对象，调用方无需区分是否命中缓存
+        
+        Returns:
+            Response对象
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.content
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.url = self.url
+        return response
+
+
+class MissingStore:
+    """
+    基于SQLite的负缓存：记录fundgz返回404的URL
+    
+    HttpCache在同一个文件中包含这张表；未启用HTTP缓存时也可以单独使用，
+    让下一次运行同样跳过这些注定失败的请求。
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        """
+        初始化负缓存
+        
+        Args:
+            path: SQLite数据库文件路径
+            ttl: 记录的有效期（秒），默认为DEFAULT_TTLS['missing']
+        """
+        self.path = str(path)
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttl is not None:
+            self.ttls['missing'] = ttl
+        self._local = threading.local()
+        
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS missing (
+                url TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（sqlite3连接不能跨线程共享）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_missing(self, url: str) -> bool:
+        """
+        查询URL是否在负缓存中（近期返回过404）
+        
+        Args:
+            url: 请求URL
+        
+        Returns:
+            在有效期内记录过404时为True
+        """
+        row = self._conn().execute("SELECT stored_at FROM missing WHERE url = ?", (url,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttls['missing']
+
+    def mark_missing(self, url: str):
+        """
+        将返回404的URL写入负缓存
+        
+        Args:
+            url: 请求URL
+        """
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO missing (url, stored_at) VALUES (?, ?)", (url, time.time()))
+        conn.commit()
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class HttpCache(MissingStore):
+    """基于SQLite的持久化HTTP响应缓存（同一文件中包含负缓存表）"""
+    
+    # 每写入多少条记录检查一次容量
+    EVICT_CHECK_INTERVAL = 50
+
+    def __init__(self, path: str, ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: int = 512 * 1024 * 1024):
+        """
+        初始化缓存
+        
+        Args:
+            path: SQLite数据库文件路径
+            ttls: 各类接口的缓存有效期（秒），覆盖DEFAULT_TTLS中的对应项
+            max_bytes: 缓存内容总大小上限，超出后按最近访问时间淘汰
+        """
+        super().__init__(path)
+        self.ttls.update(ttls or {})
+        self.max_bytes = max_bytes
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+        
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                content BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        conn.commit()
+
+    def get(self, url: str, params: Optional[Dict] = None,
+            endpoint: Optional[str] = None) -> Optional[CacheEntry]:
+        """
+        查询缓存
+        
+        Args:
+            url: 请求URL
+            params: 查询参数
+            endpoint: 接口类别（决定有效期），默认使用写入时记录的类别
+        
+        Returns:
+            CacheEntry对象（fresh表示是否仍在有效期内），未命中时为None
+        """
+        key = make_cache_key(url, params)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT url, endpoint, content, headers, encoding, etag, last_modified, stored_at "
+            "FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        stored_url, stored_endpoint, content, headers, encoding, etag, last_modified, stored_at = row
+        now = time.time()
+        endpoint = endpoint or stored_endpoint
+        fresh = now - stored_at < self.ttls.get(endpoint, self.ttls['default'])
+        
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        
+        return CacheEntry(key, stored_url, content, json.loads(headers), encoding,
+                          etag, last_modified, fresh)
+
+    def put(self, url: str, params: Optional[Dict], response: requests.Response,
+            endpoint: Optional[str] = None):
+        """
+        写入缓存
+        
+        Args:
+            url: 请求URL
+            params: 查询参数
+            response: 成功的响应对象
+            endpoint: 接口类别（决定有效期），默认按URL判断；
+                      接口地址被替换（镜像、测试桩）时URL无法识别，应由调用方传入
+        """
+        now = time.time()
+        content = response.content
+        headers = dict(response.headers)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, url, endpoint, content, headers, encoding, etag, last_modified, stored_at, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (make_cache_key(url, params), response.url or url, endpoint or classify_url(url), content,
+             json.dumps(headers), response.encoding,
+             response.headers.get('ETag'), response.headers.get('Last-Modified'),
+             now, now, len(content))
+        )
+        conn.commit()
+        
+        with self._puts_lock:
+            self._puts += 1
+            check = self._puts % self.EVICT_CHECK_INTERVAL == 1
+        if check:
+            self.evict()
+
+    def refresh(self, entry: CacheEntry, headers: Optional[Dict] = None):
+        """
+        服务器返回304后刷新缓存条目的有效期
+        
+        Args:
+            entry: 缓存条目
+            headers: 304响应头（可能带有新的ETag/Last-Modified）
+        """
+        headers = headers or {}
+        etag = headers.get('ETag') or entry.etag
+        last_modified = headers.get('Last-Modified') or entry.last_modified
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "UPDATE responses SET stored_at = ?, accessed_at = ?, etag = ?, last_modified = ? WHERE key = ?",
+            (now, now, etag, last_modified, entry.key)
+        )
+        conn.commit()
+        entry.fresh = True
+
+    def evict(self) -> int:
+        """
+        超出容量上限时按最近访问时间淘汰最久未使用的条目
+        
+        Returns:
+            淘汰的条目数
+        """
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        
+        removed = 0
+        excess = total - self.max_bytes
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+            removed += 1
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        conn.commit()
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM missing")
+        conn.commit()
+
+
+def parse_cache_ttl(text: str):
+    """
+    解析命令行中的缓存有效期配置
+    
+    Args:
+        text: 格式为 类别=秒数，如 history=86400
+    
+    Returns:
+        (类别, 秒数)
+    
+    Raises:
+        ValueError: 格式错误或类别未知
+    """
+    endpoint, _, seconds = text.partition('=')
+    endpoint = endpoint.strip()
+    if endpoint not in DEFAULT_TTLS or not seconds:
+        raise ValueError(f"无效的缓存有效期配置: {text}（可用类别: {', '.join(DEFAULT_TTLS)}）")
+    return endpoint, float(seconds)
@@ -0,0 +1,232 @@
+"""
+单个基金的净值序列
+以NumPy数组按列保存历史净值：日期为datetime64[D]，净值和增长率为float64，按日期从旧到新排列。
+批量分析时直接对数组做向量运算，避免逐行处理字典和反复解析日期字符串。
+"""
+
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from records import NavRecord, parse_percent
+
+
+def _to_float_array(values: Sequence) -> np.ndarray:
+    """把可能含None的数值列表转换为float64数组，None转为NaN"""
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class NavSeries:
+    """NumPy数组支撑的单基金净值序列"""
+    
+    __slots__ = ('fund_code', 'dates', 'unit_net_value', 'accumulated_net_value', 'growth_rate')
+    
+    FIELDS = ('unit_net_value', 'accumulated_net_value', 'growth_rate')
+
+    def __init__(self, fund_code: str, dates, unit_net_value, accumulated_net_value,
+                 growth_rate=None):
+        """
+        初始化净值序列
+        
+        日期未按升序排列时（如get_fund_history返回的从新到旧顺序）会自动排序。
+        
+        Args:
+            fund_code: 基金代码
+            dates: 日期数组（datetime64或'YYYY-MM-DD'字符串）
+            unit_net_value: 单位净值数组
+            accumulated_net_value: 累计净值数组
+            growth_rate: 日增长率数组（百分数），None表示全部缺失
+        
+        Raises:
+            ValueError: 各列长度不一致
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        unit = np.asarray(unit_net_value, dtype=np.float64)
+        accumulated = np.asarray(accumulated_net_value, dtype=np.float64)
+        if growth_rate is None:
+            growth = np.full(len(dates), np.nan)
+        else:
+            growth = np.asarray(growth_rate, dtype=np.float64)
+        
+        if not (len(dates) == len(unit) == len(accumulated) == len(growth)):
+            raise ValueError(
+                f"基金 {fund_code} 的净值序列各列长度不一致: "
+                f"{len(dates)}/{len(unit)}/{len(accumulated)}/{len(growth)}"
+            )
+        
+        if len(dates) > 1 and not (dates[1:] >= dates[:-1]).all():
+            if (dates[1:] <= dates[:-1]).all():
+                # 网站返回的顺序是从新到旧，反转即可（得到视图，不复制）
+                order = slice(None, None, -1)
+            else:
+                order = np.argsort(dates, kind='stable')
+            dates, unit, accumulated, growth = dates[order], unit[order], accumulated[order], growth[order]
+        
+        self.fund_code = fund_code
+        self.dates = dates
+        self.unit_net_value = unit
+        self.accumulated_net_value = accumulated
+        self.growth_rate = growth
+
+    @classmethod
+    def from_records(cls, records: Iterable, fund_code: Optional[str] = None) -> 'NavSeries':
+        """
+        由历史记录构建序列
+        
+        Args:
+            records: get_fund_history/HistoryStore.load返回的NavRecord列表（也接受同字段的字典）
+            fund_code: 基金代码，None表示取第一条记录的fund_code
+        
+        Returns:
+            NavSeries对象
+        """
+        rows = [record.as_tuple() if isinstance(record, NavRecord)
+                else tuple(record[name] for name in NavRecord.FIELDS)
+                for record in records]
+        if not rows:
+            return cls(fund_code or '', [], [], [], [])
+        
+        codes, dates, unit, accumulated, growth = zip(*rows)
+        # 旧版字典记录中的增长率是'1.23%'文本
+        growth = [value if isinstance(value, float) else parse_percent(value) for value in growth]
+        return cls(fund_code or codes[0], dates, unit, accumulated, _to_float_array(growth))
+
+    @classmethod
+    def from_rows(cls, fund_code: str, rows: Iterable[Sequence]) -> 'NavSeries':
+        """
+        由历史净值表格的原始单元格构建序列
+        
+        Args:
+            fund_code: 基金代码
+            rows: 表格行，每行依次为日期、单位净值、累计净值、日增长率文本
+                  （parse_history_page(raw=True)的结果）
+        
+        Returns:
+            NavSeries对象
+        """
+        rows = [row for row in rows if len(row) >= 4 and row[0]]
+        dates = [row[0] for row in rows]
+        # 与parse_percent相同的宽松转换：空单元格为0，'--'等无法解析的值为NaN
+        unit, accumulated, growth = (_to_float_array([parse_percent(row[i]) for row in rows]) for i in (1, 2, 3))
+        return cls(fund_code, dates, unit, accumulated, growth)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return f"NavSeries({self.fund_code!r}, empty)"
+        return f"NavSeries({self.fund_code!r}, {len(self)} rows, {self.dates[0]} ~ {self.dates[-1]})"
+
+    def __getitem__(self, key: slice) -> 'NavSeries':
+        """
+        按位置切片，返回共享底层数组的新序列
+        
+        Args:
+            key: 切片
+        
+        Returns:
+            NavSeries对象
+        
+        Raises:
+            TypeError: key不是切片
+        """
+        if not isinstance(key, slice):
+            raise TypeError("NavSeries只支持切片，按日期取数请使用between()")
+        return NavSeries(self.fund_code, self.dates[key], self.unit_net_value[key],
+                         self.accumulated_net_value[key], self.growth_rate[key])
+
+    @property
+    def start(self) -> Optional[np.datetime64]:
+        """第一个净值日期，空序列为None"""
+        return self.dates[0] if len(self) else None
+
+    @property
+    def end(self) -> Optional[np.datetime64]:
+        """最后一个净值日期，空序列为None"""
+        return self.dates[-1] if len(self) else None
+
+    def between(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> 'NavSeries':
+        """
+        按日期区间切片（二分查找，返回视图，不复制数据）
+        
+        Args:
+            start_date: 起始日期(YYYY-MM-DD，含)，None表示不限
+            end_date: 结束日期(YYYY-MM-DD，含)，None表示不限
+        
+        Returns:
+            区间内的NavSeries
+        """
+        lo = 0 if start_date is None else np.searchsorted(self.dates, np.datetime64(start_date, 'D'), 'left')
+        hi = len(self) if end_date is None else np.searchsorted(self.dates, np.datetime64(end_date, 'D'), 'right')
+        return self[lo:hi]
+
+    def returns(self, field: str = 'accumulated_net_value') -> np.ndarray:
+        """
+        计算相邻净值日之间的简单收益率
+        
+        Args:
+            field: 使用的净值列，默认累计净值（已包含分红）
+        
+        Returns:
+            长度为len-1的收益率数组（0.01表示1%）
+        
+        Raises:
+            ValueError: 不支持的列名
+        """
+        if field not in ('unit_net_value', 'accumulated_net_value'):
+            raise ValueError(f"不支持的净值列: {field}")
+        values = getattr(self, field)
+        if len(values) < 2:
+            return np.empty(0, dtype=np.float64)
+        return values[1:] / values[:-1] - 1.0
+
+    def date_index(self) -> pd.DatetimeIndex:
+        """
+        转换为pandas日期索引
+        
+        Returns:
+            DatetimeIndex（名称为date）
+        """
+        return pd.DatetimeIndex(self.dates, name='date')
+
+    def to_series(self, field: str = 'accumulated_net_value') -> pd.Series:
+        """
+        转换为以日期为索引的pandas Series，数值与本对象共享内存
+        
+        Args:
+            field: 列名（unit_net_value/accumulated_net_value/growth_rate）
+        
+        Returns:
+            Series对象（名称为基金代码）
+        
+        Raises:
+            ValueError: 不支持的列名
+        """
+        if field not in self.FIELDS:
+            raise ValueError(f"不支持的列: {field}")
+        return pd.Series(getattr(self, field), index=self.date_index(), name=self.fund_code, copy=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为以日期为索引的DataFrame，各列与本对象共享内存
+        
+        Returns:
+            DataFrame对象（列为unit_net_value/accumulated_net_value/growth_rate）
+        """
+        return pd.DataFrame({name: getattr(self, name) for name in self.FIELDS},
+                            index=self.date_index(), copy=False)
+
+    def to_records(self) -> List[NavRecord]:
+        """
+        转换回NavRecord列表（按日期从新到旧，与get_fund_history一致）
+        
+        Returns:
+            NavRecord列表
+        """
+        dates = self.dates.astype(str).tolist()
+        growth = [None if np.isnan(value) else value for value in self.growth_rate.tolist()]
+        rows = zip(dates, self.unit_net_value.tolist(), self.accumulated_net_value.tolist(), growth)
+        return [NavRecord(self.fund_code, date, unit, accumulated, rate)
+                for date, unit, accumulated, rate in reversed(list(rows))]
@@ -0,0 +1,217 @@
+"""
+对齐的净值宽表
+把多只基金的历史净值对齐为 交易日 × 基金 的矩阵，供分析和相关性计算使用。
+支持float32存储、分类类型的基金代码列和可配置的缺口填充；NavPanelBuilder可以边抓取边逐只加入基金，
+构建过程中每只基金只保留一列NumPy数组，不需要同时持有全部长表记录。
+"""
+
+from itertools import groupby
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from nav_series import NavSeries
+
+
+FILL_METHODS = (None, 'ffill', 'interpolate')
+
+
+def _ffill(matrix: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    """
+    沿日期方向前向填充NaN（首个有效值之前保持NaN）
+    
+    Args:
+        matrix: 日期 × 基金 的二维数组
+        limit: 最多连续填充的期数，None表示不限
+    
+    Returns:
+        填充后的新数组
+    """
+    rows = np.arange(len(matrix))[:, None]
+    source = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(source, axis=0, out=source)
+    filled = matrix[source, np.arange(matrix.shape[1])]
+    if limit is not None:
+        filled[rows - source > limit] = np.nan
+    return filled
+
+
+def _interpolate(matrix: np.ndarray) -> np.ndarray:
+    """
+    在每只基金的首尾有效值之间按位置线性插值（首尾之外保持NaN）
+    
+    Args:
+        matrix: 日期 × 基金 的二维数组
+    
+    Returns:
+        插值后的新数组
+    """
+    filled = matrix.copy()
+    positions = np.arange(len(matrix))
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        valid = ~np.isnan(column)
+        if valid.sum() < 2:
+            continue
+        first, last = np.flatnonzero(valid)[[0, -1]]
+        inside = slice(first, last + 1)
+        filled[inside, j] = np.interp(positions[inside], positions[valid], column[valid])
+    return filled
+
+
+class NavPanelBuilder:
+    """逐只基金构建净值宽表"""
+
+    def __init__(self, field: str = 'accumulated_net_value', dtype=np.float64):
+        """
+        初始化构建器
+        
+        Args:
+            field: 使用的净值列（unit_net_value/accumulated_net_value/growth_rate）
+            dtype: 矩阵的数值类型，np.float32可使内存减半
+        
+        Raises:
+            ValueError: 不支持的列名
+        """
+        if field not in NavSeries.FIELDS:
+            raise ValueError(f"不支持的列: {field}")
+        self.field = field
+        self.dtype = np.dtype(dtype)
+        self._codes: List[str] = []
+        self._dates: List[np.ndarray] = []
+        self._values: List[np.ndarray] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def add(self, fund_code: str, history: Union[NavSeries, Iterable]):
+        """
+        加入一只基金
+        
+        同一基金重复加入时替换之前的数据。
+        
+        Args:
+            fund_code: 基金代码
+            history: NavSeries，或该基金的历史记录列表
+        """
+        series = history if isinstance(history, NavSeries) else NavSeries.from_records(history, fund_code=fund_code)
+        if not len(series):
+            return
+        values = getattr(series, self.field).astype(self.dtype)
+        if fund_code in self._positions:
+            index = self._positions[fund_code]
+            self._dates[index] = series.dates
+            self._values[index] = values
+            return
+        self._positions[fund_code] = len(self._codes)
+        self._codes.append(fund_code)
+        self._dates.append(series.dates)
+        self._values.append(values)
+
+    def add_records(self, records: Iterable) -> int:
+        """
+        从多只基金的记录流中加入数据（如iter_history的输出），同一基金的记录需相邻
+        
+        Args:
+            records: NavRecord（或同字段的字典）迭代器
+        
+        Returns:
+            加入的基金数
+        """
+        count = 0
+        for fund_code, group in groupby(records, key=lambda record: record['fund_code']):
+            self.add(fund_code, list(group))
+            count += 1
+        return count
+
+    def _union_dates(self) -> np.ndarray:
+        """所有基金净值日期的并集（按天标记占用，避免对全部日期排序去重）"""
+        if not self._dates:
+            return np.empty(0, dtype='datetime64[D]')
+        first = min(dates[0] for dates in self._dates).astype(np.int64)
+        last = max(dates[-1] for dates in self._dates).astype(np.int64)
+        occupied = np.zeros(last - first + 1, dtype=bool)
+        for dates in self._dates:
+            occupied[dates.astype(np.int64) - first] = True
+        return (np.flatnonzero(occupied) + first).astype('datetime64[D]')
+
+    def build(self, index: Optional[Union[pd.DatetimeIndex, Iterable]] = None,
+              fill: Optional[str] = None, limit: Optional[int] = None,
+              categorical: bool = False) -> pd.DataFrame:
+        """
+        生成对齐的宽表
+        
+        Args:
+            index: 日期索引（如交易日历），None表示使用所有基金出现过的净值日期的并集；
+                   不在索引中的净值会被丢弃
+            fill: 缺口填充方式：None（保留NaN）、'ffill'（沿用上一净值）、'interpolate'（线性插值），
+                  均不会填充基金首个净值之前和最后一个净值之后的日期
+            limit: ffill时最多连续填充的期数
+            categorical: 列索引是否使用分类类型（基金较多时节省内存、加快按代码分组）
+        
+        Returns:
+            以日期为索引（名称date）、基金代码为列的DataFrame
+        
+        Raises:
+            ValueError: 不支持的填充方式
+        """
+        if fill not in FILL_METHODS:
+            raise ValueError(f"不支持的填充方式: {fill}，可选: {FILL_METHODS[1:]}")
+        
+        if index is None:
+            dates = self._union_dates()
+        else:
+            dates = np.unique(np.asarray(pd.DatetimeIndex(index).values, dtype='datetime64[D]'))
+        
+        # 按列（Fortran顺序）分配，逐只基金写入时是连续内存，转为DataFrame时也不需要复制
+        matrix = np.full((len(dates), len(self._codes)), np.nan, dtype=self.dtype, order='F')
+        for j, (fund_dates, values) in enumerate(zip(self._dates, self._values)):
+            positions = np.searchsorted(dates, fund_dates)
+            inside = positions < len(dates)
+            inside[inside] = dates[positions[inside]] == fund_dates[inside]
+            matrix[positions[inside], j] = values[inside]
+        
+        if fill is not None and matrix.size:
+            valid = ~np.isnan(matrix)
+            has_data = valid.any(axis=0)
+            last = len(matrix) - 1 - valid[::-1].argmax(axis=0)
+            matrix = _ffill(matrix, limit) if fill == 'ffill' else _interpolate(matrix)
+            # 基金最后一个净值之后（已清盘或尚未更新）不做填充
+            matrix[(np.arange(len(matrix))[:, None] > last) | ~has_data] = np.nan
+            matrix = np.asfortranarray(matrix)
+        
+        columns = pd.CategoricalIndex(self._codes, name='fund_code') if categorical \
+            else pd.Index(self._codes, name='fund_code')
+        return pd.DataFrame(matrix, index=pd.DatetimeIndex(dates, name='date'), columns=columns, copy=False)
+
+
+def build_nav_panel(history: Union[Mapping[str, object], Iterable],
+                    field: str = 'accumulated_net_value', dtype=np.float64,
+                    index: Optional[Union[pd.DatetimeIndex, Iterable]] = None,
+                    fill: Optional[str] = None, limit: Optional[int] = None,
+                    categorical: bool = False) -> pd.DataFrame:
+    """
+    把多只基金的历史净值对齐为 交易日 × 基金 的宽表
+    
+    Args:
+        history: {基金代码: NavSeries/历史记录列表}（get_multiple_funds_history的返回值），
+                 或iter_history产出的记录流
+        field: 使用的净值列，默认累计净值
+        dtype: 数值类型，np.float32可使内存减半
+        index: 日期索引，None表示使用所有净值日期的并集
+        fill: 缺口填充方式（None/'ffill'/'interpolate'）
+        limit: ffill时最多连续填充的期数
+        categorical: 列索引是否使用分类类型
+    
+    Returns:
+        以日期为索引、基金代码为列的DataFrame
+    """
+    builder = NavPanelBuilder(field=field, dtype=dtype)
+    if isinstance(history, Mapping):
+        for fund_code, data in history.items():
+            builder.add(fund_code, data)
+    else:
+        builder.add_records(history)
+    return builder.build(index=index, fill=fill, limit=limit, categorical=categorical)
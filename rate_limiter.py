@@ -0,0 +1,163 @@
+"""
+按主机限速的令牌桶限流器
+同一主机的请求共享一个令牌桶，可在多个线程或协程之间共享
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """令牌桶：以rate个/秒的速度补充令牌，最多积累burst个"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 每秒补充的令牌数（即允许的平均请求速率）
+            burst: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        预订一个令牌
+        
+        令牌不足时余额会变为负数，相当于为当前调用者排队预留了一个未来的时间点，
+        因此并发调用者会按到达顺序依次获得令牌，总速率不会超过rate。
+        
+        Returns:
+            获得令牌前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """
+        阻塞直到获得一个令牌
+        
+        Returns:
+            实际等待的秒数
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        acquire的协程版本，等待期间不阻塞事件循环
+        
+        Returns:
+            实际等待的秒数
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """按主机划分令牌桶的限流器，不同主机之间互不影响"""
+
+    def __init__(self, rate: Optional[float] = None, burst: int = 1,
+                 host_rates: Optional[Dict[str, Union[float, Tuple[float, int]]]] = None):
+        """
+        初始化限流器
+        
+        Args:
+            rate: 每个主机默认的每秒请求数，None或<=0表示不限速
+            burst: 每个主机默认的突发请求数
+            host_rates: 针对特定主机的配置，{主机名: 速率} 或 {主机名: (速率, 突发数)}
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.host_rates = {}
+        for host, value in (host_rates or {}).items():
+            if isinstance(value, (tuple, list)):
+                self.host_rates[host] = (value[0], int(value[1]) if value[1] else self.burst)
+            else:
+                self.host_rates[host] = (value, self.burst)
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str) -> Optional[TokenBucket]:
+        """
+        获取URL所属主机的令牌桶（首次访问时创建）
+        
+        Args:
+            url: 请求URL或主机名
+        
+        Returns:
+            TokenBucket对象，不限速时为None
+        """
+        host = urlsplit(url).hostname or url
+        bucket = self._buckets.get(host, False)
+        if bucket is not False:
+            return bucket
+        
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self.host_rates.get(host, (self.rate, self.burst))
+                self._buckets[host] = TokenBucket(rate, burst) if rate and rate > 0 else None
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> float:
+        """
+        在向url发送请求前调用，必要时阻塞等待
+        
+        Args:
+            url: 请求URL
+        
+        Returns:
+            实际等待的秒数
+        """
+        bucket = self._bucket(url)
+        return bucket.acquire() if bucket else 0.0
+
+    async def acquire_async(self, url: str) -> float:
+        """
+        acquire的协程版本
+        
+        Args:
+            url: 请求URL
+        
+        Returns:
+            实际等待的秒数
+        """
+        bucket = self._bucket(url)
+        return await bucket.acquire_async() if bucket else 0.0
+
+
+def parse_host_rate(text: str) -> Tuple[str, Tuple[float, Optional[int]]]:
+    """
+    解析命令行中的主机限速配置
+    
+    Args:
+        text: 格式为 主机名=速率 或 主机名=速率:突发数，如 fundgz.1234567.com.cn=10:5
+    
+    Returns:
+        (主机名, (速率, 突发数))，未指定突发数时为None
+    
+    Raises:
+        ValueError: 格式错误
+    """
+    host, _, spec = text.partition('=')
+    if not host or not spec:
+        raise ValueError(f"无效的主机限速配置: {text}")
+    rate, _, burst = spec.partition(':')
+    return host.strip(), (float(rate), int(burst) if burst else None)
@@ -0,0 +1,241 @@
+"""
+基金数据记录类型
+实时行情(FundQuote)、历史净值(NavRecord)和基金代码表(FundListing)使用带__slots__的数据类保存，数值字段均为float，
+大批量回溯时比同等内容的dict节省大量内存。
+
+FundScraper默认仍然返回普通字典（json.dumps、pd.DataFrame等可以直接使用），
+指定 as_records=True 时才返回这些记录对象。记录对象支持 record['field']、record['field'] = value、
+record.get('field')、keys()、values()、items() 和按字段名迭代，as_dict() 返回与旧版相同字段名的普通字典；
+序列化时使用 json.dumps(..., default=to_plain)，转换为DataFrame时使用 records_to_frame。
+"""
+
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+
+# Python 3.10起dataclass才支持slots参数，更早的版本退化为普通数据类（功能相同，只是内存占用更大）
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+def parse_percent(value) -> Optional[float]:
+    """
+    将百分比文本转换为数值
+    
+    Args:
+        value: 如 '1.23%'、'-0.5'、1.23；空字符串视为0
+    
+    Returns:
+        百分数数值（'1.23%' -> 1.23），无法解析（如 '--'）时为None
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().rstrip('%').strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def format_percent(value: Optional[float]) -> str:
+    """
+    将百分数数值格式化为显示文本（parse_percent的逆操作）
+    
+    Args:
+        value: 百分数数值，如 1.23；None表示无数据
+    
+    Returns:
+        如 '1.23%'，无数据时为 '--'
+    """
+    return f"{value:.2f}%" if value is not None else '--'
+
+
+class _RecordMixin:
+    """为数据类提供与dict兼容的访问"""
+    
+    __slots__ = ()
+    
+    FIELDS: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        # __slots__的记录不能增加字段
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default=None):
+        """与dict.get相同"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        """字段名列表"""
+        return list(self.FIELDS)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def values(self) -> List[Any]:
+        """字段值列表（与keys()顺序相同）"""
+        return [self[key] for key in self.keys()]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """(字段名, 字段值)列表，与dict.items相同"""
+        return [(key, self[key]) for key in self.keys()]
+
+    def as_tuple(self) -> Tuple:
+        """
+        按FIELDS顺序返回字段值
+        
+        Returns:
+            字段值元组
+        """
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        转换为普通字典（字段名与旧版dict记录相同）
+        
+        Returns:
+            字典
+        """
+        return dict(zip(self.FIELDS, self.as_tuple()))
+
+
+@dataclass(**_SLOTS)
+class NavRecord(_RecordMixin):
+    """一条历史净值记录"""
+    
+    fund_code: str
+    date: str
+    unit_net_value: float
+    accumulated_net_value: float
+    growth_rate: Optional[float]  # 日增长率（百分数，1.23表示1.23%），无数据时为None
+
+
+NavRecord.FIELDS = tuple(f.name for f in fields(NavRecord))
+
+
+@dataclass(**_SLOTS)
+class FundQuote(_RecordMixin):
+    """一只基金的实时行情/最新净值"""
+    
+    fund_code: str
+    fund_name: str = ''
+    unit_net_value: float = 0.0
+    accumulated_net_value: float = 0.0
+    daily_growth_rate: float = 0.0
+    update_date: str = ''
+    status: str = ''
+    # 详细模式下合并进来的其他字段（基金类型、公司、经理、阶段业绩等）；
+    # 第一次写入时才创建，普通行情不为每条记录分配一个空字典
+    extra: Optional[Dict[str, Any]] = None
+
+    def __getitem__(self, key: str):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS or (self.extra is not None and key in self.extra)
+
+    def keys(self) -> List[str]:
+        return list(self.FIELDS) + list(self.extra or ())
+
+    def update(self, other: Dict[str, Any]):
+        """
+        合并其他字段（与dict.update相同），用于详细模式补充档案页信息
+        
+        Args:
+            other: 字段字典
+        """
+        for key, value in other.items():
+            self[key] = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = dict(zip(self.FIELDS, self.as_tuple()))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+FundQuote.FIELDS = tuple(f.name for f in fields(FundQuote) if f.name != 'extra')
+
+
+@dataclass(**_SLOTS)
+class FundListing(_RecordMixin):
+    """基金代码表(fundcode_search.js)中的一只基金"""
+    
+    fund_code: str
+    abbreviation: str  # 拼音首字母缩写，如 HXCZHH
+    fund_name: str
+    fund_type: str     # 如 混合型-灵活、股票型、债券型-长债
+    pinyin: str        # 全拼，如 HUAXIACHENGZHANGHUNHE
+
+
+FundListing.FIELDS = tuple(f.name for f in fields(FundListing))
+
+
+def to_plain(obj):
+    """
+    json.dump的default函数，把记录对象转换为字典
+    
+    Args:
+        obj: 无法直接序列化的对象
+    
+    Returns:
+        可序列化的字典
+    
+    Raises:
+        TypeError: 不是记录对象
+    """
+    if isinstance(obj, _RecordMixin):
+        return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def records_to_frame(records: Iterable) -> pd.DataFrame:
+    """
+    将记录列表转换为DataFrame
+    
+    全部是NavRecord时直接按列构建，不经过中间字典；其他情况逐条转换为字典。
+    
+    Args:
+        records: NavRecord/FundQuote/dict组成的列表
+    
+    Returns:
+        DataFrame对象
+    """
+    records = list(records)
+    if records and all(type(record) is NavRecord for record in records):
+        return pd.DataFrame.from_records([record.as_tuple() for record in records],
+                                         columns=list(NavRecord.FIELDS))
+    return pd.DataFrame([record.as_dict() if isinstance(record, _RecordMixin) else record
+                         for record in records])
@@ -0,0 +1,182 @@
+"""
+请求重试与熔断
+为幂等的GET请求提供带随机抖动的指数退避重试，并为每个主机维护一个熔断器：
+主机错误率超过阈值时暂停向其发送请求，冷却后先放行一个试探请求，成功再恢复。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+# 值得重试的HTTP状态码：限流和服务端临时错误
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """指数退避重试策略（full jitter）"""
+
+    def __init__(self, retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0):
+        """
+        初始化重试策略
+        
+        Args:
+            retries: 失败后最多重试的次数，0表示不重试
+            backoff: 退避基数（秒），第n次重试前最多等待 backoff * 2^n 秒
+            max_backoff: 单次等待的上限（秒）
+        """
+        self.retries = max(0, retries)
+        self.backoff = max(0.0, backoff)
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        计算第attempt次重试前的等待时间
+        
+        在[0, backoff * 2^attempt]之间随机取值，避免大量并发请求在同一时刻重试。
+        服务器返回Retry-After（秒）时至少等待该时长。
+        
+        Args:
+            attempt: 已失败的次数（从0开始）
+            retry_after: 响应头中的Retry-After值
+        
+        Returns:
+            等待秒数
+        """
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if retry_after:
+            try:
+                wait = max(wait, min(self.max_backoff, float(retry_after)))
+            except ValueError:
+                pass
+        return wait
+
+
+class CircuitBreaker:
+    """单个主机的熔断器：closed（正常）-> open（熔断）-> half-open（试探）"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold: float = 0.5, window: int = 20, min_requests: int = 10,
+                 cooldown: float = 30.0):
+        """
+        初始化熔断器
+        
+        Args:
+            threshold: 触发熔断的错误率（0~1）
+            window: 统计错误率的最近请求数
+            min_requests: 窗口内至少有这么多请求才判断错误率
+            cooldown: 熔断持续时间（秒），之后放行一个试探请求
+        """
+        self.threshold = threshold
+        self.min_requests = max(1, min_requests)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._results = deque(maxlen=max(self.min_requests, window))
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        判断当前是否允许发送请求
+        
+        Returns:
+            True表示可以发送；熔断期间或已有试探请求在途时为False
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """
+        结束一次不代表主机状态的请求（如URL无效、回放存档中没有该请求）
+        
+        不计入错误率；如果它是半开状态下的试探请求，释放试探名额，让下一个请求重新试探。
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record(self, success: bool) -> bool:
+        """
+        记录一次请求结果
+        
+        Args:
+            success: 请求是否成功（主机正常响应，包括404等客户端错误）
+        
+        Returns:
+            本次记录是否触发了熔断
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if success:
+                    self.state = self.CLOSED
+                    self._results.clear()
+                    return False
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                return True
+            
+            self._results.append(success)
+            if self.state == self.CLOSED and len(self._results) >= self.min_requests:
+                failures = self._results.count(False)
+                if failures / len(self._results) >= self.threshold:
+                    self.state = self.OPEN
+                    self._opened_at = time.monotonic()
+                    return True
+            return False
+
+
+class HostCircuitBreakers:
+    """按主机划分的熔断器集合"""
+
+    def __init__(self, **kwargs):
+        """
+        初始化熔断器集合
+        
+        Args:
+            **kwargs: 传给每个CircuitBreaker的参数（threshold/window/min_requests/cooldown）
+        """
+        self._kwargs = kwargs
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        """
+        获取URL所属主机的熔断器（首次访问时创建）
+        
+        Args:
+            url: 请求URL或主机名
+        
+        Returns:
+            CircuitBreaker对象
+        """
+        host = urlsplit(url).hostname or url
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(**self._kwargs))
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        """
+        查询各主机熔断器的状态
+        
+        Returns:
+            {主机名: 状态}
+        """
+        return {host: breaker.state for host, breaker in self._breakers.items()}
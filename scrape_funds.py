@@ -6,11 +6,25 @@
 import argparse
 import json
 import sys
+from contextlib import redirect_stdout
+from itertools import groupby
+from operator import itemgetter
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import pandas as pd
 
 from fund_scraper import FundScraper
+from records import format_percent
+from rate_limiter import parse_host_rate
+from http_cache import DEFAULT_MISSING_PATH, HttpCache, MissingStore, parse_cache_ttl
+from history_store import HistoryStore
+from sinks import open_sink
+from checkpoint import Checkpoint
+from watch import FundWatcher
+from transport import RecordTransport, ReplayTransport
+from universe import DEFAULT_UNIVERSE_PATH, DEFAULT_UNIVERSE_TTL, FundUniverse, is_valid_fund_code
+from sharding import dedup, parse_shard, select_shard, shard_path
 
 
 def load_fund_codes_from_file(filepath: str) -> List[str]:
@@ -53,6 +67,73 @@ def load_fund_codes_from_file(filepath: str) -> List[str]:
     return []
 
 
+def stream_records(records, output_file: str) -> dict:
+    """
+    将记录逐条写入流式输出文件，每个基金写完后立即刷新到磁盘
+    
+    Args:
+        records: 记录生成器（每条记录包含fund_code字段）
+        output_file: 输出文件路径（.csv 或 .jsonl）
+    
+    Returns:
+        {fund_code: 写入的记录数}
+    """
+    counts = {}
+    with open_sink(output_file) as sink:
+        for record in records:
+            code = record['fund_code']
+            if code not in counts:
+                sink.flush()
+                counts[code] = 0
+            sink.write(record)
+            counts[code] += 1
+    
+    print(f"数据已保存到: {output_file}")
+    return counts
+
+
+def journal_history(scraper: FundScraper, fund_codes: List[str], checkpoint: Checkpoint, **kwargs):
+    """
+    抓取检查点中尚未完成的基金的历史数据，每个基金完成后立即记录到检查点
+    
+    Args:
+        scraper: 爬虫实例
+        fund_codes: 全部基金代码
+        checkpoint: 检查点
+        **kwargs: 传给iter_history的参数（days/start_date/end_date）
+    """
+    pending = checkpoint.pending(fund_codes)
+    print(f"检查点: 已完成 {len(fund_codes) - len(pending)} 个基金，剩余 {len(pending)} 个")
+    try:
+        for code, records in groupby(scraper.iter_history(pending, **kwargs), key=itemgetter('fund_code')):
+            checkpoint.record(code, list(records))
+    except KeyboardInterrupt:
+        checkpoint.close()
+        print(f"\n已中断，已完成 {len(checkpoint)} 个基金，重新运行同一命令即可继续")
+        sys.exit(130)
+
+
+def journal_funds(scraper: FundScraper, fund_codes: List[str], checkpoint: Checkpoint, detailed: bool = False):
+    """
+    抓取检查点中尚未完成的基金的实时数据，每个基金完成后立即记录到检查点
+    
+    Args:
+        scraper: 爬虫实例
+        fund_codes: 全部基金代码
+        checkpoint: 检查点
+        detailed: 是否获取详细信息
+    """
+    pending = checkpoint.pending(fund_codes)
+    print(f"检查点: 已完成 {len(fund_codes) - len(pending)} 个基金，剩余 {len(pending)} 个")
+    try:
+        for data in scraper.iter_funds(pending, detailed=detailed):
+            checkpoint.record(data['fund_code'], data)
+    except KeyboardInterrupt:
+        checkpoint.close()
+        print(f"\n已中断，已完成 {len(checkpoint)} 个基金，重新运行同一命令即可继续")
+        sys.exit(130)
+
+
 def interactive_mode():
     """交互模式"""
     print("\n" + "=" * 60)
@@ -122,7 +203,7 @@ def interactive_mode():
             for fund_code, data_list in history_data.items():
                 print(f"\n基金 {fund_code}:")
                 for record in data_list[:5]:
-                    print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {record['growth_rate']}")
+                    print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {format_percent(record['growth_rate'])}")
                 if len(data_list) > 5:
                     print(f"  ... 共 {len(data_list)} 条记录")
     else:
@@ -161,6 +242,16 @@ def interactive_mode():
 def main():
     """主函数"""
     
+    # 子命令: serve（本地查询服务），其余参数交给fund_server处理
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        import fund_server
+        return fund_server.main(sys.argv[2:])
+    
+    # 子命令: merge（合并 --shard 各分片的输出）
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        import sharding
+        sys.exit(sharding.main(sys.argv[2:]))
+    
     parser = argparse.ArgumentParser(
         description='基金数据抓取工具 - 天天基金网(eastmoney.com)',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -176,6 +267,10 @@ def main():
   python scrape_funds.py -f funds.txt
   python scrape_funds.py -f funds.json
   
+  # 抓取全部基金，或某一类型的全部基金（代码表每天下载一次，缓存在本地）
+  python scrape_funds.py --all -o funds.jsonl -w 8
+  python scrape_funds.py --type 股票型 --type 指数型-股票 -o equity.jsonl
+  
   # 获取详细信息并保存为JSON
   python scrape_funds.py -c 110022 -d -o funds.json
   
@@ -183,6 +278,41 @@ def main():
   python scrape_funds.py -c 110022 --history 30
   python scrape_funds.py -f funds.txt --history 90 -o history.csv
   
+  # 抓取指定日期区间的历史数据
+  python scrape_funds.py -c 110022 --start 2019-01-01 --end 2019-12-31 -o history.csv
+  
+  # 使用8个线程并发抓取
+  python scrape_funds.py -f funds.txt -w 8 -o funds.csv
+  
+  # 每个主机限速5次/秒，允许突发10次
+  python scrape_funds.py -f funds.txt -w 8 --rate 5 --burst 10
+  
+  # 每晚增量同步历史净值到本地存储
+  python scrape_funds.py -f funds.txt --sync nav.db
+  
+  # 长时间批量抓取，中断后重新运行同一命令即可继续
+  python scrape_funds.py -f funds.txt --history 365 --checkpoint ckpt/ -o history.csv
+  
+  # 盘中每分钟刷新估值，只输出变化的基金
+  python scrape_funds.py -f funds.txt --watch --interval 60 >> estimates.jsonl
+  
+  # 启动本地查询服务（HTTP/JSON，参数见 serve --help）
+  python scrape_funds.py serve --port 8080
+  
+  # 查看时间花在网络、解析还是限流等待上，并导出给监控系统
+  python scrape_funds.py -f funds.txt --history 365 --stats --stats-file output/run.prom
+  
+  # 全部基金的历史净值分4份在4台机器上抓取，最后合并
+  python scrape_funds.py --all --history 3650 --shard 1/4 -o history.csv   # 输出 history.shard-1-of-4.csv
+  python scrape_funds.py merge -o history.csv history.shard-*.csv
+  
+  # 录制一次运行，之后离线重现（不访问网络、不限速）
+  python scrape_funds.py -f funds.txt --history 365 --record runs/2024-01-15
+  python scrape_funds.py -f funds.txt --history 365 --replay runs/2024-01-15 --stats
+  
+  # 使用持久化缓存，重复运行时未过期的页面不再下载
+  python scrape_funds.py -f funds.txt --history 365 --cache .fund_cache.db
+  
   # 交互模式
   python scrape_funds.py
         """
@@ -200,6 +330,36 @@ def main():
         help='读取基金代码的文件路径 (支持 .txt 和 .json 格式)'
     )
     
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='抓取全部基金（来自天天基金网的基金代码表）'
+    )
+    
+    parser.add_argument(
+        '--type',
+        action='append',
+        default=[],
+        metavar='TYPE',
+        help='抓取某一类型的全部基金，可重复指定 (例: 股票型、债券型、债券型-长债)'
+    )
+    
+    parser.add_argument(
+        '--universe-cache',
+        type=str,
+        default=DEFAULT_UNIVERSE_PATH,
+        metavar='PATH',
+        help=f'基金代码表的本地缓存文件（默认: {DEFAULT_UNIVERSE_PATH}）'
+    )
+    
+    parser.add_argument(
+        '--universe-ttl',
+        type=float,
+        default=DEFAULT_UNIVERSE_TTL,
+        metavar='SECONDS',
+        help=f'基金代码表缓存的有效期，秒（默认: {DEFAULT_UNIVERSE_TTL}，0表示每次重新下载）'
+    )
+    
     parser.add_argument(
         '-d', '--detailed',
         action='store_true',
@@ -212,6 +372,55 @@ def main():
         help='获取历史净值数据，指定天数 (例: 30, 90)'
     )
     
+    parser.add_argument(
+        '--start',
+        type=str,
+        metavar='YYYY-MM-DD',
+        help='历史净值区间起始日期，由服务器按区间过滤 (例: 2019-01-01)'
+    )
+    
+    parser.add_argument(
+        '--end',
+        type=str,
+        metavar='YYYY-MM-DD',
+        help='历史净值区间结束日期（默认: 最新）'
+    )
+    
+    parser.add_argument(
+        '--sync',
+        type=str,
+        metavar='STORE',
+        help='增量同步历史净值到本地SQLite存储，只下载本地最新日期之后的数据'
+             '（首次同步的天数由 --history 指定，默认365）'
+    )
+    
+    parser.add_argument(
+        '--history-parser',
+        choices=['fast', 'bs4'],
+        default='fast',
+        help='历史净值表格解析器：fast基于lxml，bs4基于BeautifulSoup（默认: fast）'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='监控模式：常驻运行并定时刷新实时估值，只输出估值变化的基金（JSONL，默认输出到标准输出）'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=60.0,
+        help='监控模式交易时段内的刷新间隔，秒（默认: 60）'
+    )
+    
+    parser.add_argument(
+        '--idle-interval',
+        type=float,
+        default=900.0,
+        help='监控模式非交易时段的刷新间隔，秒（默认: 900，不会错过下一次开盘）'
+    )
+    
     parser.add_argument(
         '-t', '--timeout',
         type=int,
@@ -226,16 +435,180 @@ def main():
         help='请求间隔时间（秒，默认: 0.5）'
     )
     
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='每个主机每秒允许的请求数（默认由 --delay 换算为 1/delay）'
+    )
+    
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=1,
+        help='每个主机允许的突发请求数（默认: 1）'
+    )
+    
+    parser.add_argument(
+        '--host-rate',
+        action='append',
+        default=[],
+        metavar='HOST=RATE[:BURST]',
+        help='为特定主机单独限速，可重复指定 (例: fundgz.1234567.com.cn=10:5)'
+    )
+    
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=3,
+        help='超时、连接错误、429/5xx时的最大重试次数（默认: 3，0表示不重试）'
+    )
+    
+    parser.add_argument(
+        '--backoff',
+        type=float,
+        default=0.5,
+        help='重试的指数退避基数，秒（默认: 0.5，第n次重试前随机等待0~backoff*2^n秒）'
+    )
+    
+    parser.add_argument(
+        '--circuit-threshold',
+        type=float,
+        default=0.5,
+        help='主机最近请求的错误率达到该值时熔断（默认: 0.5，0表示不熔断）'
+    )
+    
+    parser.add_argument(
+        '--circuit-cooldown',
+        type=float,
+        default=30.0,
+        help='熔断持续时间，秒（默认: 30）'
+    )
+    
+    parser.add_argument(
+        '--cache',
+        type=str,
+        metavar='PATH',
+        help='启用持久化HTTP缓存，指定SQLite缓存文件路径 (例: .fund_cache.db)'
+    )
+    
+    parser.add_argument(
+        '--cache-ttl',
+        action='append',
+        default=[],
+        metavar='CLASS=SECONDS',
+        help='设置某类接口的缓存有效期，可重复指定 (类别: realtime, detail, fundpage, history, fundlist, missing)'
+    )
+    
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=512,
+        help='缓存容量上限（MB，默认: 512）'
+    )
+    
+    parser.add_argument(
+        '--missing-cache',
+        type=str,
+        default=DEFAULT_MISSING_PATH,
+        metavar='PATH',
+        help='未启用 --cache 时记录实时估值API返回404的基金的文件，下次运行直接跳过'
+             f'（默认: {DEFAULT_MISSING_PATH}，空字符串表示只在本次运行内记录；启用 --cache 时记录在缓存文件中）'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='并发抓取线程数（默认: 1，即串行抓取）'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        metavar='DIR',
+        help='检查点目录：每个基金完成后立即记录，中断后重新运行同一命令只抓取剩余基金'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        type=str,
+        metavar='i/N',
+        help='只抓取N个分片中的第i个（按基金代码的稳定哈希划分，i从1开始）；'
+             '-o/--sync/--checkpoint/--stats-file 自动加上分片后缀，之后用 merge 子命令合并'
+    )
+    
+    parser.add_argument(
+        '--record',
+        type=str,
+        metavar='DIR',
+        help='把本次运行的每个HTTP请求/响应录制到存档目录，之后可用 --replay 重现'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        type=str,
+        metavar='DIR',
+        help='完全从 --record 录制的存档返回响应，不访问网络、不限速'
+    )
+    
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='运行结束时输出统计摘要：各主机/接口的请求耗时分位数、流量、解析耗时、重试、降级和等待时间'
+    )
+    
+    parser.add_argument(
+        '--stats-file',
+        type=str,
+        metavar='PATH',
+        help='把运行统计保存到文件（.json 为JSON，其他后缀如 .prom 为Prometheus文本格式）'
+    )
+    
     parser.add_argument(
         '-o', '--output',
         type=str,
-        help='输出文件路径 (.csv 或 .json，默认: 输出到控制台)'
+        help='输出文件路径 (.csv、.json 或 .jsonl，默认: 输出到控制台)'
     )
     
     args = parser.parse_args()
     
+    try:
+        host_rates = dict(parse_host_rate(item) for item in args.host_rate)
+        cache_ttls = dict(parse_cache_ttl(item) for item in args.cache_ttl)
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    
+    for value in (args.start, args.end):
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                parser.error(f"无效的日期: {value}，格式应为YYYY-MM-DD")
+    if args.start and args.end and args.start > args.end:
+        parser.error("--start 不能晚于 --end")
+    if args.checkpoint and args.sync:
+        parser.error("--sync 本身就是增量的，不需要 --checkpoint")
+    if args.record and args.replay:
+        parser.error("--record 和 --replay 不能同时使用")
+    if (args.record or args.replay) and args.cache:
+        parser.error("--record/--replay 不能与 --cache 同时使用（缓存命中的请求不会经过录制，回放时也不应被缓存替代）")
+    if args.watch:
+        if args.history or args.start or args.end or args.sync or args.checkpoint or args.detailed:
+            parser.error("--watch 只监控实时估值，不能与 --history/--start/--end/--sync/--checkpoint/--detailed 同时使用")
+        if args.output and not args.output.endswith('.jsonl'):
+            parser.error("--watch 的输出文件必须是 .jsonl")
+        if args.interval <= 0 or args.idle_interval <= 0:
+            parser.error("--interval 和 --idle-interval 必须大于0")
+    
+    if shard:
+        # 每个分片写入各自的输出文件、同步存储和检查点，多个分片在同一目录下运行也互不覆盖
+        for name in ('output', 'sync', 'checkpoint', 'stats_file'):
+            if getattr(args, name):
+                setattr(args, name, shard_path(getattr(args, name), *shard))
+    
     # 如果没有任何参数，进入交互模式
-    if not args.codes and not args.file:
+    if not args.codes and not args.file and not args.all and not args.type:
         interactive_mode()
         return
     
@@ -249,101 +622,367 @@ def main():
         file_codes = load_fund_codes_from_file(args.file)
         fund_codes.extend(file_codes)
     
+    # 格式错误的代码在发出任何请求之前剔除
+    fund_codes = [str(code).strip() for code in fund_codes]
+    malformed = [code for code in fund_codes if not is_valid_fund_code(code)]
+    if malformed:
+        print(f"忽略格式错误的基金代码（应为6位数字）: {', '.join(malformed)}")
+        fund_codes = [code for code in fund_codes if is_valid_fund_code(code)]
+    
+    watch_stream = None
+    if args.watch and not args.output:
+        # 监控模式的标准输出只留给JSONL增量，提示信息改写到标准错误
+        watch_stream = sys.stdout
+        sys.stdout = sys.stderr
+    
+    cache = None
+    missing_store = None
+    if args.cache:
+        cache = HttpCache(args.cache, ttls=cache_ttls, max_bytes=args.cache_max_mb * 1024 * 1024)
+    elif args.missing_cache and not (args.record or args.replay):
+        # 录制时跳过的fundgz请求不会进入存档，回放时也不应受上次运行的记录影响
+        missing_store = MissingStore(args.missing_cache, ttl=cache_ttls.get('missing'))
+    
+    transport = None
+    if args.record:
+        transport = RecordTransport(args.record)
+    elif args.replay:
+        try:
+            transport = ReplayTransport(args.replay)
+        except FileNotFoundError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        print(f"已载入 {len(transport)} 个录制的响应")
+        # 回放时响应来自内存，不需要限速和重试退避（FundScraper在回放时也不重试、不熔断）
+        args.delay, args.rate, args.backoff, host_rates = 0, None, 0, {}
+    
+    # 创建爬虫
+    scraper = FundScraper(
+        timeout=args.timeout,
+        delay=args.delay,
+        max_workers=args.workers,
+        rate=args.rate,
+        burst=args.burst,
+        host_rates=host_rates,
+        cache=cache,
+        missing_store=missing_store,
+        history_parser=args.history_parser,
+        retries=args.retries,
+        backoff=args.backoff,
+        circuit_threshold=args.circuit_threshold,
+        circuit_cooldown=args.circuit_cooldown,
+        transport=transport,
+        # 全部基金的历史回溯动辄上百万条记录，使用__slots__记录节省内存；输出时统一经过to_plain/records_to_frame
+        as_records=True
+    )
+    
+    fund_codes = select_fund_codes(args, scraper, fund_codes)
+    
     if not fund_codes:
         print("错误: 未指定基金代码")
         print("使用 -h 或 --help 查看帮助信息")
         sys.exit(1)
     
-    # 去重
-    fund_codes = list(set(fund_codes))
+    # 去重（保持顺序，同一输入在任何机器上得到相同的列表）
+    fund_codes = dedup(fund_codes)
+    
+    if shard:
+        total = len(fund_codes)
+        fund_codes = select_shard(fund_codes, *shard)
+        print(f"分片 {shard[0]}/{shard[1]}: {len(fund_codes)} / {total} 只基金")
+        if not fund_codes:
+            print("本分片没有需要抓取的基金")
+            return
     
     print("=" * 60)
     print(f"基金数据抓取工具")
     print("=" * 60)
     print(f"待抓取基金数量: {len(fund_codes)}")
-    print(f"基金代码: {', '.join(fund_codes)}")
+    if len(fund_codes) > 20:
+        print(f"基金代码: {', '.join(fund_codes[:20])} ... 等 {len(fund_codes)} 个")
+    else:
+        print(f"基金代码: {', '.join(fund_codes)}")
     print(f"详细信息: {'是' if args.detailed else '否'}")
-    if args.history:
+    if args.sync:
+        print(f"增量同步到: {args.sync}")
+    elif args.start or args.end:
+        print(f"历史数据区间: {args.start or '最早'} ~ {args.end or '最新'}")
+    elif args.history:
         print(f"历史数据天数: {args.history} 天")
+    if shard:
+        print(f"分片: {shard[0]}/{shard[1]}")
+    if args.workers > 1:
+        print(f"并发线程数: {args.workers}")
+    if args.rate:
+        print(f"每个主机限速: {args.rate} 次/秒（突发 {args.burst}）")
+    if args.cache:
+        print(f"HTTP缓存: {args.cache}")
+    if args.checkpoint:
+        print(f"检查点目录: {args.checkpoint}")
+    if args.record:
+        print(f"录制到: {args.record}")
+    if args.replay:
+        print(f"回放存档: {args.replay}（不访问网络）")
     print("=" * 60)
     
-    # 创建爬虫
-    scraper = FundScraper(timeout=args.timeout, delay=args.delay)
+    checkpoint = None
+    if args.checkpoint:
+        if args.history or args.start or args.end:
+            params = {'mode': 'history', 'days': None if args.start or args.end else args.history,
+                      'start': args.start, 'end': args.end}
+        else:
+            params = {'mode': 'funds', 'detailed': args.detailed}
+        try:
+            checkpoint = Checkpoint(args.checkpoint, params)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
     
-    # 根据是否指定history参数选择不同的抓取方式
-    if args.history:
-        # 抓取历史数据
-        history_data = scraper.get_multiple_funds_history(fund_codes, days=args.history)
-        
-        if not history_data:
-            print("未获取到任何历史数据")
+    try:
+        run_scrape(args, scraper, fund_codes, checkpoint, watch_stream)
+    finally:
+        # 抓取失败退出或Ctrl-C时也输出统计，这正是最需要看统计的时候；监控模式下标准输出只留给JSONL
+        with redirect_stdout(sys.stderr if args.watch and not args.output else sys.stdout):
+            report_stats(scraper, args)
+            if args.record:
+                transport.close()
+                print(f"已录制 {transport.recorded} 个请求到 {args.record}，使用 --replay {args.record} 重现本次运行")
+            elif args.replay and transport.misses:
+                print(f"回放存档中缺少 {transport.misses} 个请求（参数与录制时不同？）")
+    
+    if args.watch:
+        return
+    
+    if checkpoint is not None:
+        checkpoint.close()
+        print(f"检查点保留在 {args.checkpoint}，删除该目录即可重新开始")
+    
+    print("\n抓取完成")
+
+
+def select_fund_codes(args, scraper: FundScraper, fund_codes: List[str]) -> List[str]:
+    """
+    按 --all/--type 从基金代码表中选取基金，并剔除代码表中不存在的代码
+    
+    指定 --all/--type 时按需下载代码表；只指定 -c/-f 时使用未过期的本地代码表校验（没有则不校验），
+    不为校验单独下载代码表。
+    
+    Args:
+        args: 命令行参数
+        scraper: 用于下载代码表的爬虫实例
+        fund_codes: -c/-f 指定的基金代码（已剔除格式错误的代码）
+    
+    Returns:
+        基金代码列表
+    """
+    if args.all or args.type:
+        universe = FundUniverse.load(scraper, args.universe_cache, ttl=args.universe_ttl)
+        if universe is None:
+            print("错误: 无法获取基金代码表，不能使用 --all/--type")
             sys.exit(1)
+    else:
+        universe = FundUniverse.from_file(args.universe_cache)
+        if universe is None or universe.is_stale(args.universe_ttl):
+            return fund_codes
+    
+    fund_codes, unknown = universe.validate(fund_codes)
+    if unknown:
+        print(f"忽略基金代码表中不存在的基金: {', '.join(unknown)}")
+    
+    if args.all:
+        fund_codes.extend(universe.codes())
+    for fund_type in args.type:
+        selected = universe.by_type(fund_type)
+        if not selected:
+            print(f"基金代码表中没有类型为 {fund_type} 的基金（可选: {', '.join(sorted(universe.types()))}）")
+        else:
+            print(f"类型 {fund_type}: {len(selected)} 只基金")
+        fund_codes.extend(selected)
+    return fund_codes
+
+
+def run_scrape(args, scraper: FundScraper, fund_codes: List[str], checkpoint: Optional[Checkpoint],
+               watch_stream=None):
+    """
+    按命令行参数执行监控、增量同步、历史数据或实时数据抓取
+    
+    Args:
+        args: 命令行参数
+        scraper: FundScraper实例
+        fund_codes: 基金代码列表
+        checkpoint: 检查点，None表示不使用
+        watch_stream: 监控模式未指定输出文件时的JSONL输出流（原标准输出）
+    """
+    if args.watch:
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            watch_stream = open(args.output, 'a', encoding='utf-8')
+        print(f"监控模式: 交易时段每 {args.interval:g} 秒刷新，非交易时段每 {args.idle_interval:g} 秒刷新，Ctrl-C 停止")
+        watcher = FundWatcher(scraper, fund_codes, out=watch_stream,
+                              interval=args.interval, idle_interval=args.idle_interval)
+        try:
+            watcher.run()
+        finally:
+            if args.output:
+                watch_stream.close()
+            else:
+                sys.stdout = watch_stream
+        return
+    
+    # 根据是否指定sync/history参数选择不同的抓取方式
+    if args.sync:
+        # 增量同步历史数据
+        store = HistoryStore(args.sync)
+        added = scraper.sync_multiple_funds_history(fund_codes, store, days=args.history or 365)
         
-        # 输出结果
         print("\n" + "=" * 60)
-        print("历史数据抓取结果")
+        print("历史数据同步结果")
         print("=" * 60)
+        for fund_code, count in added.items():
+            print(f"基金 {fund_code}: 新增 {count} 条，本地最新 {store.last_date(fund_code) or '无'}")
+        print(f"总计新增: {sum(added.values())} 条记录")
         
-        # 输出统计信息
-        total_records = 0
-        for fund_code, data_list in history_data.items():
-            print(f"基金 {fund_code}: {len(data_list)} 条历史记录")
-            total_records += len(data_list)
-        print(f"总计: {total_records} 条记录")
-        
-        # 保存到文件
-        if args.output:
+        # 导出本地存储中的完整历史
+        if args.output and args.output.endswith(('.csv', '.jsonl')):
+            stream_records((record for code in fund_codes for record in store.load(code)), args.output)
+        elif args.output:
+            history_data = {code: store.load(code) for code in fund_codes}
+            history_data = {code: records for code, records in history_data.items() if records}
             if args.output.endswith('.csv'):
                 scraper.save_history_to_csv(history_data, args.output)
             elif args.output.endswith('.json'):
                 scraper.save_history_to_json(history_data, args.output)
             else:
-                print("错误: 不支持的文件格式，请使用 .csv 或 .json")
+                print("错误: 不支持的文件格式，请使用 .csv、.json 或 .jsonl")
                 sys.exit(1)
+    elif args.history or args.start or args.end:
+        # 抓取历史数据（指定--start/--end时按日期区间）
+        history_kwargs = {'days': args.history or 30, 'start_date': args.start, 'end_date': args.end}
+        if checkpoint is not None:
+            journal_history(scraper, fund_codes, checkpoint, **history_kwargs)
+        
+        if args.output and args.output.endswith(('.csv', '.jsonl')):
+            # 流式写入：每个基金抓取完成后立即写入文件
+            if checkpoint is not None:
+                records = (record for _, data in checkpoint.items(fund_codes) for record in data)
+            else:
+                records = scraper.iter_history(fund_codes, **history_kwargs)
+            counts = stream_records(records, args.output)
+            
+            if not counts:
+                print("未获取到任何历史数据")
+                sys.exit(1)
+            
+            print("\n" + "=" * 60)
+            print("历史数据抓取结果")
+            print("=" * 60)
+            for fund_code, count in counts.items():
+                print(f"基金 {fund_code}: {count} 条历史记录")
+            print(f"总计: {sum(counts.values())} 条记录")
         else:
-            # 显示样本数据
-            print("\n历史数据样本（每个基金显示前3条）：")
+            if checkpoint is not None:
+                history_data = dict(checkpoint.items(fund_codes))
+            else:
+                history_data = scraper.get_multiple_funds_history(fund_codes, **history_kwargs)
+            
+            if not history_data:
+                print("未获取到任何历史数据")
+                sys.exit(1)
+            
+            # 输出结果
+            print("\n" + "=" * 60)
+            print("历史数据抓取结果")
+            print("=" * 60)
+            
+            # 输出统计信息
+            total_records = 0
             for fund_code, data_list in history_data.items():
-                print(f"\n基金 {fund_code}:")
-                for record in data_list[:3]:
-                    print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {record['growth_rate']}")
+                print(f"基金 {fund_code}: {len(data_list)} 条历史记录")
+                total_records += len(data_list)
+            print(f"总计: {total_records} 条记录")
+            
+            # 保存到文件
+            if args.output:
+                if args.output.endswith('.json'):
+                    scraper.save_history_to_json(history_data, args.output)
+                else:
+                    print("错误: 不支持的文件格式，请使用 .csv、.json 或 .jsonl")
+                    sys.exit(1)
+            else:
+                # 显示样本数据
+                print("\n历史数据样本（每个基金显示前3条）：")
+                for fund_code, data_list in history_data.items():
+                    print(f"\n基金 {fund_code}:")
+                    for record in data_list[:3]:
+                        print(f"  日期: {record['date']}, 净值: {record['unit_net_value']}, 增长率: {format_percent(record['growth_rate'])}")
     else:
         # 抓取实时数据
-        results = scraper.scrape_multiple_funds(fund_codes, detailed=args.detailed)
-        
-        if not results:
-            print("未获取到任何数据")
-            sys.exit(1)
-        
-        # 输出结果
-        print("\n" + "=" * 60)
-        print("抓取结果")
-        print("=" * 60)
-        
-        df = scraper.to_dataframe(results)
-        
-        # 选择显示的列
-        display_columns = [
-            'fund_code', 'fund_name', 'unit_net_value', 
-            'accumulated_net_value', 'daily_growth_rate', 'update_date'
-        ]
+        if checkpoint is not None:
+            journal_funds(scraper, fund_codes, checkpoint, detailed=args.detailed)
         
-        # 过滤存在的列
-        display_columns = [col for col in display_columns if col in df.columns]
-        
-        print(df[display_columns].to_string(index=False))
-        
-        # 保存到文件
-        if args.output:
-            if args.output.endswith('.csv'):
-                scraper.save_to_csv(df, args.output)
-            elif args.output.endswith('.json'):
-                scraper.save_to_json(results, args.output)
+        if args.output and args.output.endswith('.jsonl'):
+            # 流式写入：每个基金抓取完成后立即写入文件
+            if checkpoint is not None:
+                funds = (data for _, data in checkpoint.items(fund_codes))
             else:
-                print("错误: 不支持的文件格式，请使用 .csv 或 .json")
+                funds = scraper.iter_funds(fund_codes, detailed=args.detailed)
+            counts = stream_records(funds, args.output)
+            
+            if not counts:
+                print("未获取到任何数据")
                 sys.exit(1)
-    
-    print("\n抓取完成")
+            print(f"成功抓取 {len(counts)} 个基金")
+        else:
+            if checkpoint is not None:
+                results = [data for _, data in checkpoint.items(fund_codes)]
+            else:
+                results = scraper.scrape_multiple_funds(fund_codes, detailed=args.detailed)
+            
+            if not results:
+                print("未获取到任何数据")
+                sys.exit(1)
+            
+            # 输出结果
+            print("\n" + "=" * 60)
+            print("抓取结果")
+            print("=" * 60)
+            
+            df = scraper.to_dataframe(results)
+            
+            # 选择显示的列
+            display_columns = [
+                'fund_code', 'fund_name', 'unit_net_value', 
+                'accumulated_net_value', 'daily_growth_rate', 'update_date'
+            ]
+            
+            # 过滤存在的列
+            display_columns = [col for col in display_columns if col in df.columns]
+            
+            print(df[display_columns].to_string(index=False))
+            
+            # 保存到文件
+            if args.output:
+                if args.output.endswith('.csv'):
+                    scraper.save_to_csv(df, args.output)
+                elif args.output.endswith('.json'):
+                    scraper.save_to_json(results, args.output)
+                else:
+                    print("错误: 不支持的文件格式，请使用 .csv、.json 或 .jsonl")
+                    sys.exit(1)
+
+
+def report_stats(scraper: FundScraper, args):
+    """输出运行统计摘要（--stats）并保存到文件（--stats-file）；未开启--stats时只简要输出重试、失败、熔断和降级"""
+    collector = scraper.collector
+    if args.stats:
+        print("\n" + collector.summary())
+    elif collector.counter('retries_total') or collector.counter('failures_total') or collector.issues():
+        print(f"\n请求统计: 重试 {collector.counter('retries_total'):g} 次，"
+              f"最终失败 {collector.counter('failures_total'):g} 个请求")
+        for line in collector.issues():
+            print(line)
+    if args.stats_file:
+        collector.dump(args.stats_file)
 
 
 if __name__ == "__main__":
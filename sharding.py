@@ -0,0 +1,299 @@
+"""
+分片抓取与合并
+把一个大批量任务（如全部基金的历史净值回溯）拆给多个进程或多台机器：
+
+- 按基金代码的稳定哈希分片（--shard i/N），同一代码在任何机器、任何Python版本上都落在同一分片，
+  各分片互不重叠、合起来正好是全部基金
+- 每个分片的输出文件、同步存储、检查点目录和统计文件自动加上分片后缀，互不覆盖
+- merge子命令把各分片的输出合并为一个去重、排序后的CSV/JSONL/JSON/Parquet文件或本地历史存储
+
+用法:
+    python scrape_funds.py --all --history 3650 --shard 1/4 -o history.csv   # 输出 history.shard-1-of-4.csv
+    python scrape_funds.py merge -o history.csv history.shard-*.csv
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+from history_store import HistoryStore
+from records import records_to_frame
+from sinks import open_sink
+
+
+SHARD_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d+)\s*$')
+
+# merge支持的文件格式（另外 .db 为HistoryStore）
+MERGE_FORMATS = ('.csv', '.jsonl', '.json', '.parquet', '.db')
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """
+    解析分片参数
+    
+    Args:
+        text: 格式为 i/N，i从1开始（如 1/4 表示4个分片中的第1个）
+    
+    Returns:
+        (index, count)元组
+    
+    Raises:
+        ValueError: 格式错误或超出范围
+    """
+    match = SHARD_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"无效的分片: {text}，格式应为 i/N（例: 1/4）")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"无效的分片: {text}，i应在1到N之间")
+    return index, count
+
+
+def shard_of(fund_code: str, count: int) -> int:
+    """
+    计算基金代码所属的分片
+    
+    使用MD5而不是内置hash()：后者每个进程随机加盐，不同机器上结果不同。
+    
+    Args:
+        fund_code: 基金代码
+        count: 分片总数
+    
+    Returns:
+        分片序号（1~count）
+    """
+    digest = hashlib.md5(fund_code.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def select_shard(fund_codes: Iterable[str], index: int, count: int) -> List[str]:
+    """
+    选出属于指定分片的基金代码
+    
+    Args:
+        fund_codes: 全部基金代码
+        index: 分片序号（1~count）
+        count: 分片总数
+    
+    Returns:
+        基金代码列表（保持输入顺序）
+    """
+    return [code for code in fund_codes if shard_of(code, count) == index]
+
+
+def dedup(items: Iterable[str]) -> List[str]:
+    """
+    去重并保持首次出现的顺序
+    
+    Args:
+        items: 基金代码等
+    
+    Returns:
+        去重后的列表
+    """
+    return list(dict.fromkeys(items))
+
+
+def shard_path(path: str, index: int, count: int) -> str:
+    """
+    为分片生成输出路径
+    
+    Args:
+        path: 原路径，如 output/history.csv 或检查点目录 ckpt/
+        index: 分片序号
+        count: 分片总数
+    
+    Returns:
+        如 output/history.shard-1-of-4.csv、ckpt.shard-1-of-4
+    """
+    path = Path(path)
+    tag = f".shard-{index}-of-{count}"
+    if path.suffix:
+        return str(path.with_name(path.stem + tag + path.suffix))
+    return str(path.with_name(path.name + tag))
+
+
+def _merge_key(frame: pd.DataFrame) -> List[str]:
+    """历史净值按(基金代码, 日期)去重，实时数据按基金代码去重"""
+    return ['fund_code', 'date'] if 'date' in frame.columns else ['fund_code']
+
+
+def _frame_records(frame: pd.DataFrame) -> List[Dict]:
+    """DataFrame转换为字典列表，缺失值为None（而不是NaN，便于写入JSON和SQLite）"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def read_output(path: str) -> pd.DataFrame:
+    """
+    读取一个抓取输出
+    
+    Args:
+        path: .csv/.jsonl/.json/.parquet 文件或 .db 历史存储
+    
+    Returns:
+        DataFrame（fund_code为字符串，保留前导0）
+    
+    Raises:
+        ValueError: 不支持的格式
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        return pd.read_csv(path, dtype={'fund_code': str}, encoding='utf-8-sig')
+    if suffix == '.jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+    if suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # 历史数据为 {基金代码: [记录, ...]}，实时数据为记录列表
+        if isinstance(data, dict):
+            data = [record for records in data.values() for record in records]
+        return pd.DataFrame(data)
+    if suffix == '.parquet':
+        return pd.read_parquet(path)
+    if suffix == '.db':
+        store = HistoryStore(path)
+        try:
+            return records_to_frame(record for code in store.fund_codes() for record in store.load(code))
+        finally:
+            store.close()
+    raise ValueError(f"不支持的文件格式: {path}（可用: {', '.join(MERGE_FORMATS)}）")
+
+
+def write_output(frame: pd.DataFrame, path: str) -> int:
+    """
+    写入合并结果
+    
+    Args:
+        frame: 合并后的数据
+        path: 输出路径，格式同read_output；.db 时追加到历史存储（已存在的记录保留）
+    
+    Returns:
+        写入的记录数
+    
+    Raises:
+        ValueError: 不支持的格式，或写入 .db 的不是历史净值
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix not in MERGE_FORMATS:
+        raise ValueError(f"不支持的文件格式: {path}（可用: {', '.join(MERGE_FORMATS)}）")
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if suffix in ('.csv', '.jsonl'):
+        with open_sink(path, fieldnames=list(frame.columns)) as sink:
+            return sink.write_many(_frame_records(frame))
+    if suffix == '.json':
+        records = _frame_records(frame)
+        if 'date' in frame.columns:
+            # 与save_history_to_json相同的 {基金代码: [记录, ...]} 结构
+            grouped: Dict[str, List[Dict]] = {}
+            for record in records:
+                grouped.setdefault(record['fund_code'], []).append(record)
+            records = grouped
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        return len(frame)
+    if suffix == '.parquet':
+        frame.to_parquet(path, index=False)
+        return len(frame)
+    missing = [column for column in HistoryStore.COLUMNS if column not in frame.columns]
+    if missing:
+        # 只有历史净值能写入HistoryStore，实时数据分片应合并为CSV/JSONL/JSON/Parquet
+        raise ValueError(f"只有历史净值可以合并到 .db 历史存储，输入缺少列: {', '.join(missing)}")
+    store = HistoryStore(path)
+    try:
+        return store.append(_frame_records(frame[list(HistoryStore.COLUMNS)]))
+    finally:
+        store.close()
+
+
+def merge_outputs(inputs: List[str], output: str) -> Dict[str, int]:
+    """
+    合并多个分片的输出
+    
+    重复的记录（历史净值按基金代码和日期，实时数据按基金代码）保留后出现的一条；
+    结果按基金代码排序，历史净值在同一基金内按日期从新到旧排列（与get_fund_history一致）。
+    
+    Args:
+        inputs: 分片输出路径（可以是不同格式）
+        output: 合并结果路径
+    
+    Returns:
+        {'inputs': 输入文件数, 'read': 读取的记录数, 'duplicates': 去掉的重复记录数, 'written': 写入的记录数}
+    
+    Raises:
+        ValueError: 不支持的格式，或没有任何记录
+    """
+    frames = [read_output(path) for path in inputs]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        raise ValueError("输入文件中没有任何记录")
+    merged = pd.concat(frames, ignore_index=True)
+    read = len(merged)
+    
+    key = _merge_key(merged)
+    merged = merged.drop_duplicates(subset=key, keep='last')
+    ascending = [True, False] if len(key) == 2 else [True]
+    merged = merged.sort_values(key, ascending=ascending, kind='stable').reset_index(drop=True)
+    
+    written = write_output(merged, output)
+    return {'inputs': len(inputs), 'read': read, 'duplicates': read - len(merged), 'written': written}
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """
+    展开输入路径中的通配符（Windows的命令行不会自动展开）
+    
+    Args:
+        patterns: 路径或通配符
+    
+    Returns:
+        路径列表（去重，保持顺序）
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return dedup(paths)
+
+
+def main(argv=None):
+    """merge子命令入口"""
+    parser = argparse.ArgumentParser(
+        prog='scrape_funds.py merge',
+        description='合并 --shard 各分片的输出（去重、排序）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python scrape_funds.py merge -o history.csv history.shard-*.csv
+  python scrape_funds.py merge -o history.parquet history.shard-*.csv
+  python scrape_funds.py merge -o nav.db nav.shard-*.db
+        """
+    )
+    parser.add_argument('inputs', nargs='+', help='分片输出文件（支持通配符）')
+    parser.add_argument('-o', '--output', required=True,
+                        help=f"合并结果路径（{', '.join(MERGE_FORMATS)}，.db 为本地历史存储）")
+    args = parser.parse_args(argv)
+    
+    inputs = expand_inputs(args.inputs)
+    missing = [path for path in inputs if not Path(path).exists()]
+    if missing:
+        parser.error(f"文件不存在: {', '.join(missing)}")
+    if str(Path(args.output).resolve()) in {str(Path(path).resolve()) for path in inputs}:
+        parser.error("输出文件不能同时是输入文件")
+    
+    try:
+        result = merge_outputs(inputs, args.output)
+    except (ValueError, ImportError) as e:
+        # 读写Parquet需要pyarrow，未安装时pandas抛出ImportError
+        print(f"错误: {e}")
+        return 1
+    
+    print(f"合并 {result['inputs']} 个文件: 读取 {result['read']} 条记录，去掉重复 {result['duplicates']} 条，"
+          f"写入 {result['written']} 条到 {args.output}")
+    return 0
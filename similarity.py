@@ -0,0 +1,283 @@
+"""
+基金收益相关性与相似基金查找
+基于日收益率计算基金之间的相关系数，按块计算并只保留每只基金最相似的前k个，
+内存占用为O(块大小 × 基金数)而不是O(基金数²)，用于找出持仓几乎相同的"克隆"基金。
+
+历史长度不同的基金按两两重叠的日期计算相关系数；近似模式先用随机投影的低维草图
+快速筛选候选，再对候选逐对精确计算。
+"""
+
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from panel import build_nav_panel
+
+
+PAIR_CHUNK_ELEMENTS = 16 * 1024 * 1024
+
+
+def panel_returns(panel: pd.DataFrame) -> np.ndarray:
+    """
+    由净值宽表计算日收益率
+    
+    任一端缺失净值的日期收益率为NaN，不做填充，避免把节假日差异算作零收益。
+    
+    Args:
+        panel: 日期 × 基金 的净值宽表
+    
+    Returns:
+        (日期数-1) × 基金数 的收益率数组
+    """
+    values = panel.to_numpy(dtype=np.float64)
+    if len(values) < 2:
+        return np.empty((0, values.shape[1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values[1:] / values[:-1] - 1.0
+
+
+class SimilarityIndex:
+    """每只基金最相似的前k只基金"""
+
+    def __init__(self, fund_codes: List[str], neighbours: np.ndarray, correlations: np.ndarray,
+                 overlaps: np.ndarray):
+        """
+        初始化索引
+        
+        Args:
+            fund_codes: 基金代码列表
+            neighbours: 基金数 × k 的邻居下标，-1表示不足k个
+            correlations: 对应的相关系数（从高到低）
+            overlaps: 对应的重叠交易日数
+        """
+        self.fund_codes = list(fund_codes)
+        self.neighbours = neighbours
+        self.correlations = correlations
+        self.overlaps = overlaps
+        self._positions: Dict[str, int] = {code: i for i, code in enumerate(self.fund_codes)}
+
+    def __len__(self) -> int:
+        return len(self.fund_codes)
+
+    def __contains__(self, fund_code: str) -> bool:
+        return fund_code in self._positions
+
+    def similar(self, fund_code: str, k: Optional[int] = None,
+                min_correlation: Optional[float] = None) -> List[Tuple[str, float, int]]:
+        """
+        查询与某只基金最相似的基金
+        
+        Args:
+            fund_code: 基金代码
+            k: 最多返回的数量，None表示全部
+            min_correlation: 最低相关系数
+        
+        Returns:
+            [(基金代码, 相关系数, 重叠交易日数)]，按相关系数从高到低
+        
+        Raises:
+            KeyError: 索引中没有该基金
+        """
+        row = self._positions[fund_code]
+        result = []
+        for j, corr, overlap in zip(self.neighbours[row], self.correlations[row], self.overlaps[row]):
+            if j < 0 or (min_correlation is not None and corr < min_correlation):
+                break
+            result.append((self.fund_codes[j], float(corr), int(overlap)))
+        return result[:k] if k is not None else result
+
+    def clones(self, threshold: float = 0.98) -> List[Tuple[str, str, float]]:
+        """
+        列出相关系数不低于阈值的基金对（每对只出现一次）
+        
+        Args:
+            threshold: 相关系数阈值
+        
+        Returns:
+            [(基金代码A, 基金代码B, 相关系数)]，按相关系数从高到低
+        """
+        pairs = {}
+        rows, cols = np.nonzero((self.correlations >= threshold) & (self.neighbours >= 0))
+        for i, c in zip(rows, cols):
+            j = self.neighbours[i, c]
+            key = (min(i, j), max(i, j))
+            pairs[key] = float(self.correlations[i, c])
+        return sorted(((self.fund_codes[a], self.fund_codes[b], corr) for (a, b), corr in pairs.items()),
+                      key=lambda pair: -pair[2])
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为长表
+        
+        Returns:
+            列为fund_code、neighbour、correlation、overlap的DataFrame
+        """
+        rows, cols = np.nonzero(self.neighbours >= 0)
+        codes = np.asarray(self.fund_codes, dtype=object)
+        return pd.DataFrame({
+            'fund_code': codes[rows],
+            'neighbour': codes[self.neighbours[rows, cols]],
+            'correlation': self.correlations[rows, cols],
+            'overlap': self.overlaps[rows, cols],
+        })
+
+
+def _overlap_correlation(x_a: np.ndarray, m_a: np.ndarray, x: np.ndarray,
+                         m: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按两两重叠日期计算一块基金与全部基金的相关系数
+    
+    Args:
+        x_a, m_a: 块内基金的收益率（缺失处为0）和观测掩码，日期 × 块大小
+        x, m: 全部基金的收益率和观测掩码，日期 × 基金数
+    
+    Returns:
+        (相关系数, 重叠日数)，形状均为 块大小 × 基金数
+    """
+    n = m_a.T @ m
+    s_a = x_a.T @ m
+    s_b = m_a.T @ x
+    s_aa = (x_a * x_a).T @ m
+    s_bb = m_a.T @ (x * x)
+    s_ab = x_a.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = s_ab - s_a * s_b / n
+        var = (s_aa - s_a * s_a / n) * (s_bb - s_b * s_b / n)
+        corr = cov / np.sqrt(var)
+    return corr, n
+
+
+def _pair_correlation(xt: np.ndarray, mt: np.ndarray, rows: np.ndarray,
+                      candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    逐对精确计算相关系数（近似模式下对候选重新打分）
+    
+    Args:
+        xt, mt: 全部基金的收益率（缺失处为0）和观测掩码，基金数 × 日期（按基金连续存放，收集候选时是整行复制）
+        rows: 块内基金下标，长度b
+        candidates: b × c 的候选基金下标
+    
+    Returns:
+        (相关系数, 重叠日数)，形状均为 b × c
+    """
+    corr = np.empty(candidates.shape)
+    n = np.empty(candidates.shape)
+    # 每次收集的候选收益率不超过PAIR_CHUNK_ELEMENTS个元素，避免 b × c × 日期 的临时数组过大
+    step = max(1, PAIR_CHUNK_ELEMENTS // max(1, xt.shape[1] * candidates.shape[1]))
+    for lo in range(0, len(rows), step):
+        part = slice(lo, lo + step)
+        x_a, m_a = xt[rows[part]], mt[rows[part]]
+        # 块内每只基金的 [掩码, 收益, 收益²]，与候选做批量矩阵乘法一次得到所需的各项求和
+        a_side = np.stack([m_a, x_a, x_a * x_a], axis=-1)
+        x_b, m_b = xt[candidates[part]], mt[candidates[part]]
+        count, s_a, s_aa = np.moveaxis(m_b @ a_side, -1, 0)
+        s_b, s_ab = np.moveaxis(x_b @ a_side[..., :2], -1, 0)
+        s_bb = ((x_b * x_b) @ m_a[..., None])[..., 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = s_ab - s_a * s_b / count
+            var = (s_aa - s_a * s_a / count) * (s_bb - s_b * s_b / count)
+            corr[part] = cov / np.sqrt(var)
+        n[part] = count
+    return corr, n
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """每行得分最高的k个下标（从高到低），scores中的NaN视为最低"""
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _sketch(x: np.ndarray, m: np.ndarray, sketch_dim: Optional[int], seed: int) -> np.ndarray:
+    """
+    构建近似模式的基金向量：每只基金的收益率按自身观测标准化、缺失处补0后归一化，
+    可选再用高斯随机投影降到sketch_dim维，向量点积近似为相关系数
+    
+    Returns:
+        基金数 × 维数 的float32数组
+    """
+    count = m.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = x.sum(axis=0) / count
+        z = np.where(m > 0, x - mean, 0.0)
+        z /= np.linalg.norm(z, axis=0)
+    z = np.nan_to_num(z, copy=False).astype(np.float32)
+    if sketch_dim and sketch_dim < len(z):
+        rng = np.random.default_rng(seed)
+        z = (rng.standard_normal((sketch_dim, len(z)), dtype=np.float32) @ z) / np.sqrt(sketch_dim, dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z /= np.linalg.norm(z, axis=0)
+        z = np.nan_to_num(z, copy=False)
+    return z.T.copy()
+
+
+def top_k_correlations(data: Union[pd.DataFrame, Mapping[str, object]], k: int = 10,
+                       min_overlap: int = 60, block_size: int = 512,
+                       approximate: bool = False, sketch_dim: Optional[int] = 128,
+                       oversample: int = 4, seed: int = 0) -> SimilarityIndex:
+    """
+    计算每只基金日收益率相关系数最高的前k只基金
+    
+    精确模式按块计算每只基金与全部基金在两两重叠日期上的相关系数；近似模式用标准化收益率的
+    低维随机投影快速筛选 k*oversample 个候选，再逐对精确计算并取前k，结果中的相关系数都是精确值。
+    
+    Args:
+        data: 日期 × 基金 的净值宽表，或 {基金代码: NavSeries/历史记录列表}
+              （get_multiple_funds_history的返回值可直接传入，使用累计净值）
+        k: 每只基金保留的相似基金数
+        min_overlap: 两只基金至少重叠的收益率日数，不足时不参与比较
+        block_size: 每块的基金数，决定临时矩阵大小（块大小 × 基金数）
+        approximate: 是否使用近似模式
+        sketch_dim: 近似模式的投影维数，None表示不投影（只做标准化和补0）
+        oversample: 近似模式每只基金的候选倍数
+        seed: 随机投影的种子，固定后结果可复现
+    
+    Returns:
+        SimilarityIndex对象
+    """
+    panel = data.sort_index() if isinstance(data, pd.DataFrame) else build_nav_panel(data)
+    codes = [str(code) for code in panel.columns]
+    returns = panel_returns(panel)
+    n_funds = len(codes)
+    k = max(0, min(k, n_funds - 1))
+    
+    neighbours = np.full((n_funds, k), -1, dtype=np.int64)
+    correlations = np.full((n_funds, k), np.nan)
+    overlaps = np.zeros((n_funds, k), dtype=np.int64)
+    if k == 0:
+        return SimilarityIndex(codes, neighbours, correlations, overlaps)
+    
+    observed = ~np.isnan(returns)
+    m = observed.astype(np.float64)
+    x = np.where(observed, returns, 0.0)
+    if approximate:
+        sketch = _sketch(x, m, sketch_dim, seed)
+        xt, mt = np.ascontiguousarray(x.T), np.ascontiguousarray(m.T)
+    
+    for lo in range(0, n_funds, max(1, block_size)):
+        rows = np.arange(lo, min(lo + block_size, n_funds))
+        if approximate:
+            scores = sketch[rows] @ sketch.T
+            scores[np.arange(len(rows)), rows] = -np.inf
+            candidates = _top_k(scores, min(n_funds - 1, k * max(1, oversample)))
+            corr, n = _pair_correlation(xt, mt, rows, candidates)
+        else:
+            corr, n = _overlap_correlation(x[:, rows], m[:, rows], x, m)
+            candidates = None
+            corr[np.arange(len(rows)), rows] = np.nan
+        
+        corr[n < max(2, min_overlap)] = np.nan
+        best = _top_k(corr, k)
+        best_corr = np.take_along_axis(corr, best, axis=1)
+        best_n = np.take_along_axis(n, best, axis=1)
+        best_index = best if candidates is None else np.take_along_axis(candidates, best, axis=1)
+        
+        missing = np.isnan(best_corr)
+        neighbours[rows] = np.where(missing, -1, best_index)
+        correlations[rows] = best_corr
+        overlaps[rows] = np.where(missing, 0, best_n).astype(np.int64)
+    
+    return SimilarityIndex(codes, neighbours, correlations, overlaps)
@@ -0,0 +1,181 @@
+"""
+流式输出
+逐条追加写入CSV/JSONL文件，配合FundScraper.iter_funds/iter_history使用，
+数据抓取到即落盘，内存占用与基金数量无关。
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from records import to_plain
+
+
+class CsvSink:
+    """逐行写入的CSV输出"""
+
+    def __init__(self, filepath: str, fieldnames: Optional[List[str]] = None, append: bool = False):
+        """
+        初始化CSV输出
+        
+        Args:
+            filepath: 文件路径
+            fieldnames: 列名，None表示使用第一条记录的字段；之后记录中多出的字段会被忽略
+            append: 是否追加到已有文件（已有内容时不再写表头）
+        """
+        self.filepath = str(filepath)
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.count = 0
+        
+        Path(self.filepath).parent.mkdir(parents=True, exist_ok=True)
+        exists = append and Path(self.filepath).exists() and Path(self.filepath).stat().st_size > 0
+        # 与save_to_csv一致使用utf-8-sig，便于Excel直接打开；追加时不能重复写BOM
+        encoding = 'utf-8' if exists else 'utf-8-sig'
+        self._file = open(self.filepath, 'a' if append else 'w', encoding=encoding, newline='')
+        self._writer = None
+        if exists:
+            if self.fieldnames is None:
+                with open(self.filepath, encoding='utf-8-sig', newline='') as f:
+                    self.fieldnames = next(csv.reader(f), None)
+            self._writer = self._make_writer(write_header=False)
+        elif self.fieldnames:
+            self._writer = self._make_writer(write_header=True)
+
+    def _make_writer(self, write_header: bool) -> csv.DictWriter:
+        """创建DictWriter，必要时写入表头"""
+        writer = csv.DictWriter(self._file, fieldnames=self.fieldnames,
+                                restval='', extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        return writer
+
+    def write(self, record: Dict):
+        """
+        写入一条记录
+        
+        Args:
+            record: 记录字典或NavRecord/FundQuote对象
+        """
+        if self._writer is None:
+            self.fieldnames = list(record.keys())
+            self._writer = self._make_writer(write_header=True)
+        if not isinstance(record, dict):
+            # NavRecord/FundQuote：按列名取值，不构造中间字典
+            record = {name: record.get(name, '') for name in self.fieldnames}
+        self._writer.writerow(record)
+        self.count += 1
+
+    def write_many(self, records: Iterable[Dict]) -> int:
+        """
+        写入多条记录并刷新到磁盘
+        
+        Args:
+            records: 记录列表或生成器
+        
+        Returns:
+            本次写入的记录数
+        """
+        before = self.count
+        for record in records:
+            self.write(record)
+        self.flush()
+        return self.count - before
+
+    def flush(self):
+        """将缓冲区内容写入磁盘"""
+        self._file.flush()
+
+    def close(self):
+        """关闭文件"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonlSink:
+    """逐行写入的JSON Lines输出，每行一条记录"""
+
+    def __init__(self, filepath: str, append: bool = False):
+        """
+        初始化JSONL输出
+        
+        Args:
+            filepath: 文件路径
+            append: 是否追加到已有文件
+        """
+        self.filepath = str(filepath)
+        self.count = 0
+        
+        Path(self.filepath).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.filepath, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record: Dict):
+        """
+        写入一条记录
+        
+        Args:
+            record: 记录字典或NavRecord/FundQuote对象
+        """
+        self._file.write(json.dumps(record, ensure_ascii=False, default=to_plain))
+        self._file.write('\n')
+        self.count += 1
+
+    def write_many(self, records: Iterable[Dict]) -> int:
+        """
+        写入多条记录并刷新到磁盘
+        
+        Args:
+            records: 记录列表或生成器
+        
+        Returns:
+            本次写入的记录数
+        """
+        before = self.count
+        for record in records:
+            self.write(record)
+        self.flush()
+        return self.count - before
+
+    def flush(self):
+        """将缓冲区内容写入磁盘"""
+        self._file.flush()
+
+    def close(self):
+        """关闭文件"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_sink(filepath: str, fieldnames: Optional[List[str]] = None, append: bool = False):
+    """
+    根据文件扩展名创建流式输出
+    
+    Args:
+        filepath: 文件路径（.csv 或 .jsonl）
+        fieldnames: CSV列名（仅.csv有效）
+        append: 是否追加到已有文件
+    
+    Returns:
+        CsvSink或JsonlSink对象
+    
+    Raises:
+        ValueError: 不支持的文件格式
+    """
+    suffix = Path(filepath).suffix.lower()
+    if suffix == '.csv':
+        return CsvSink(filepath, fieldnames=fieldnames, append=append)
+    if suffix == '.jsonl':
+        return JsonlSink(filepath, append=append)
+    raise ValueError(f"不支持流式写入的文件格式: {filepath}（请使用 .csv 或 .jsonl）")
@@ -0,0 +1,364 @@
+"""
+抓取过程的运行统计
+按主机和接口记录请求耗时分布、响应字节数、解析耗时、重试、降级和等待时间，
+用于判断一次缓慢的运行到底耗在网络、HTML解析、fundgz→详情页降级还是限流等待上。
+
+结果可以输出为命令行摘要（--stats），也可以导出为Prometheus文本格式或JSON（--stats-file）。
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from unicodedata import east_asian_width
+
+
+# 耗时分布的桶上限（秒），覆盖从亚毫秒级的解析到数秒的慢请求
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 指标名 -> (类型, 说明)
+METRICS = {
+    'http_request_seconds': ('histogram', '每次网络请求的耗时（含失败和重试）'),
+    'http_requests_total': ('counter', '网络请求次数，status为HTTP状态码或error'),
+    'http_response_bytes_total': ('counter', '响应正文字节数'),
+    'cache_hits_total': ('counter', 'HTTP缓存命中次数，result为fresh（直接使用）或revalidated（304）'),
+    'parse_seconds': ('histogram', '响应解析耗时'),
+    'retries_total': ('counter', '重试次数'),
+    'failures_total': ('counter', '重试耗尽后仍失败的请求数'),
+    'fallbacks_total': ('counter', '降级到备用数据源的次数，reason为not_found（fundgz返回404）或known_missing（按负缓存记录跳过）'),
+    'circuit_trips_total': ('counter', '主机熔断次数'),
+    'circuit_rejected_total': ('counter', '熔断期间未发送的请求数'),
+    'sleep_seconds_total': ('counter', '等待时间（秒），reason为rate_limit（限流）或retry_backoff（重试退避）'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """固定桶的耗时分布"""
+    
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        初始化分布
+        
+        Args:
+            buckets: 递增的桶上限，最后隐含一个+Inf桶
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """记录一个观测值"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数（桶内线性插值，与Prometheus的histogram_quantile相同）
+        
+        Args:
+            q: 分位（0~1）
+        
+        Returns:
+            估算值，不会超过观测到的最大值；没有观测值时为0
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict:
+        """转换为字典（桶计数为累计值）"""
+        cumulative, buckets = 0, {}
+        for upper, n in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += n
+            buckets[str(upper)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class StatsCollector:
+    """线程安全的计数器和耗时分布集合，指标按名称和标签区分"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        初始化统计
+        
+        Args:
+            buckets: 耗时分布的桶上限（秒）
+        """
+        self.buckets = buckets
+        self.started = time.time()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """
+        增加计数
+        
+        Args:
+            name: 指标名
+            value: 增加的数量
+            **labels: 标签
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        记录一个耗时观测值
+        
+        Args:
+            name: 指标名
+            value: 观测值（秒）
+            **labels: 标签
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """
+        计时上下文，退出时（包括抛出异常）记录耗时
+        
+        Args:
+            name: 指标名
+            **labels: 标签
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        """
+        读取计数，只指定部分标签时返回所有匹配项之和
+        
+        Args:
+            name: 指标名
+            **labels: 标签过滤条件
+        
+        Returns:
+            计数值
+        """
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (key, key_labels), value in self._counters.items()
+                       if key == name and wanted <= set(key_labels))
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """
+        读取耗时分布，只指定部分标签时合并所有匹配项
+        
+        Args:
+            name: 指标名
+            **labels: 标签过滤条件
+        
+        Returns:
+            Histogram对象（副本）
+        """
+        wanted = set(labels.items())
+        merged = Histogram(self.buckets)
+        with self._lock:
+            for (key, key_labels), histogram in self._histograms.items():
+                if key != name or not wanted <= set(key_labels):
+                    continue
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+                merged.max = max(merged.max, histogram.max)
+        return merged
+
+    def snapshot(self) -> Dict:
+        """
+        导出全部指标
+        
+        Returns:
+            {'elapsed': 运行秒数, 'counters': [...], 'histograms': [...]}，每项含name和labels
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), **histogram.to_dict()}
+                          for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0])]
+        return {'elapsed': time.time() - self.started, 'counters': counters, 'histograms': histograms}
+
+    def to_json(self) -> str:
+        """导出为JSON文本"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = 'fund_scraper') -> str:
+        """
+        导出为Prometheus文本格式（可写入node_exporter的textfile目录）
+        
+        Args:
+            prefix: 指标名前缀
+        
+        Returns:
+            Prometheus exposition格式的文本
+        """
+        def render(labels: Dict, extra: Optional[Tuple[str, str]] = None) -> str:
+            items = list(labels.items()) + ([extra] if extra else [])
+            if not items:
+                return ''
+            return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+        
+        snapshot = self.snapshot()
+        series: Dict[str, List[str]] = {}
+        for item in snapshot['counters']:
+            series.setdefault(item['name'], []).append(
+                f"{prefix}_{item['name']}{render(item['labels'])} {item['value']:g}")
+        for item in snapshot['histograms']:
+            lines = series.setdefault(item['name'], [])
+            for upper, count in item['buckets'].items():
+                lines.append(f"{prefix}_{item['name']}_bucket{render(item['labels'], ('le', upper))} {count}")
+            lines.append(f"{prefix}_{item['name']}_sum{render(item['labels'])} {item['sum']:.6f}")
+            lines.append(f"{prefix}_{item['name']}_count{render(item['labels'])} {item['count']}")
+        
+        output = []
+        for name, lines in series.items():
+            kind, description = METRICS.get(name, ('untyped', name))
+            output.append(f"# HELP {prefix}_{name} {description}")
+            output.append(f"# TYPE {prefix}_{name} {kind}")
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+    def dump(self, filepath: str) -> bool:
+        """
+        保存到文件，.json后缀为JSON，其他后缀（如.prom）为Prometheus文本格式
+        
+        Args:
+            filepath: 文件路径
+        
+        Returns:
+            是否保存成功
+        """
+        try:
+            path = Path(filepath)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            text = self.to_json() if path.suffix == '.json' else self.to_prometheus()
+            path.write_text(text, encoding='utf-8')
+            print(f"运行统计已保存到: {filepath}")
+            return True
+        except Exception as e:
+            print(f"保存运行统计失败: {e}")
+            return False
+
+    def summary(self) -> str:
+        """
+        生成命令行摘要：每个主机/接口的请求数、耗时分位数和流量，解析耗时，重试、降级和等待时间
+        
+        Returns:
+            多行文本
+        """
+        snapshot = self.snapshot()
+        lines = ["=" * 60, f"运行统计（{snapshot['elapsed']:.1f} 秒）", "=" * 60]
+        
+        requests = [item for item in snapshot['histograms'] if item['name'] == 'http_request_seconds']
+        if requests:
+            lines.append(_pad('主机 / 接口', 40) + _pad('请求', 6, True) + f"{'p50':>9}{'p95':>9}"
+                         + _pad('最大', 9, True) + _pad('流量', 10, True))
+            for item in requests:
+                labels = item['labels']
+                size = self.counter('http_response_bytes_total', **labels)
+                lines.append(f"{labels.get('host', '')[:30] + ' ' + labels.get('endpoint', ''):<40}"
+                             f"{item['count']:>6}{_ms(item['p50']):>9}{_ms(item['p95']):>9}"
+                             f"{_ms(item['max']):>9}{_size(size):>10}")
+        else:
+            lines.append("没有发出网络请求")
+        
+        parses = [item for item in snapshot['histograms'] if item['name'] == 'parse_seconds']
+        if parses:
+            lines.append(_pad('解析 / 解析器', 40) + _pad('次数', 6, True) + f"{'p50':>9}{'p95':>9}"
+                         + _pad('合计', 9, True))
+            for item in parses:
+                labels = item['labels']
+                name = labels.get('endpoint', '') + (f" ({labels['parser']})" if 'parser' in labels else '')
+                lines.append(f"{name:<40}{item['count']:>6}{_ms(item['p50']):>9}{_ms(item['p95']):>9}"
+                             f"{_ms(item['sum']):>9}")
+        
+        network = sum(item['sum'] for item in requests)
+        parse = sum(item['sum'] for item in parses)
+        rate_wait = self.counter('sleep_seconds_total', reason='rate_limit')
+        backoff = self.counter('sleep_seconds_total', reason='retry_backoff')
+        lines.append(f"耗时合计: 网络 {network:.2f}s，解析 {parse:.2f}s，限流等待 {rate_wait:.2f}s，重试退避 {backoff:.2f}s"
+                     "（并发时为各线程之和）")
+        lines.append(f"缓存命中 {self.counter('cache_hits_total'):g} 次，重试 {self.counter('retries_total'):g} 次，"
+                     f"最终失败 {self.counter('failures_total'):g} 次，降级到备用数据源 {self.counter('fallbacks_total'):g} 次")
+        lines.extend(self.issues())
+        return '\n'.join(lines)
+
+    def issues(self) -> List[str]:
+        """
+        熔断和实时估值API降级的简要说明（没有发生时为空），未开启 --stats 时也会输出
+        
+        Returns:
+            文本行列表
+        """
+        lines = []
+        trips, rejected = self.counter('circuit_trips_total'), self.counter('circuit_rejected_total')
+        if trips or rejected:
+            lines.append(f"主机熔断 {trips:g} 次，熔断期间跳过 {rejected:g} 个请求")
+        not_found = self.counter('fallbacks_total', endpoint='realtime', reason='not_found')
+        known = self.counter('fallbacks_total', endpoint='realtime', reason='known_missing')
+        if not_found or known:
+            lines.append(f"实时估值API: 404 {not_found:g} 次（已记录），按记录跳过 {known:g} 次请求")
+        return lines
+
+
+def _escape(value) -> str:
+    """转义Prometheus标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _pad(text: str, width: int, right: bool = False) -> str:
+    """按显示宽度补齐（中文字符占两列）"""
+    padding = ' ' * max(0, width - sum(2 if east_asian_width(char) in 'WF' else 1 for char in text))
+    return padding + text if right else text + padding
+
+
+def _ms(seconds: float) -> str:
+    """格式化为毫秒"""
+    return f"{seconds * 1000:.1f}ms"
+
+
+def _size(n: float) -> str:
+    """格式化字节数"""
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == 'B' else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
@@ -2,6 +2,7 @@
 基金数据抓取脚本的测试模块
 """
 
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock
 import json
@@ -43,6 +44,88 @@ class TestFundScraper(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(result['fund_code'], '110022')
         self.assertEqual(result['fund_name'], '易方达消费行业')
+        # 默认返回普通字典，可以直接序列化
+        self.assertIsInstance(result, dict)
+        self.assertEqual(json.loads(json.dumps(result))['fund_name'], '易方达消费行业')
+    
+    def test_pool_sized_for_nested_fan_out(self):
+        """测试连接池按嵌套并发一次建好，并发扩容时只挂载一次适配器"""
+        import threading
+        
+        scraper = FundScraper(delay=0, max_workers=4, history_workers=5)
+        self.assertEqual(scraper._pool_size, 20)
+        self.assertEqual(scraper.session.get_adapter('https://fund.eastmoney.com')._pool_maxsize, 20)
+        
+        barrier = threading.Barrier(8)
+        
+        def grow():
+            barrier.wait()
+            scraper._ensure_pool_size(64)
+        
+        with patch.object(scraper.session, 'mount', wraps=scraper.session.mount) as mock_mount:
+            threads = [threading.Thread(target=grow) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(mock_mount.call_count, 2)
+        self.assertEqual(scraper._pool_size, 64)
+    
+    @patch('fund_scraper.FundScraper.scrape_fund')
+    def test_scrape_multiple_funds_concurrent(self, mock_scrape):
+        """测试并发批量抓取保持输入顺序并跳过失败的基金"""
+        import time
+        
+        def fake_scrape(code, detailed=False):
+            # 让靠前的基金更晚返回，验证结果仍按输入顺序排列
+            time.sleep(0.01 * (5 - int(code[-1])))
+            return None if code == '000003' else {'fund_code': code}
+        
+        mock_scrape.side_effect = fake_scrape
+        codes = ['000001', '000002', '000003', '000004', '000005']
+        
+        results = self.scraper.scrape_multiple_funds(codes, max_workers=4)
+        
+        self.assertEqual([r['fund_code'] for r in results],
+                         ['000001', '000002', '000004', '000005'])
+    
+    @patch('fund_scraper.FundScraper._request')
+    def test_detailed_scrape_fetches_fund_page_once(self, mock_request):
+        """测试详细模式下档案页只下载一次，且同时得到基本信息和业绩"""
+        page = (
+            '<html><body><div class="title"><h1>易方达消费行业</h1></div>'
+            '<dl><dt>基金类型</dt><dd>股票型</dd><dt>基金公司</dt><dd>易方达基金</dd>'
+            '<dt>基金经理</dt><dd><a href="#">萧楠</a></dd></dl>'
+            '<table><tr><td>近1月</td><td>1.23%</td></tr>'
+            '<tr><td>成立以来</td><td>456.78%</td></tr></table>'
+            '</body></html>'
+        ).encode('utf-8')
+        
+        def fake_request(url, params=None, endpoint=None):
+            response = MagicMock()
+            if 'fundgz' in url:
+                response.text = 'jsonpgz({"name":"易方达消费行业","gsz":"5.8234","jsn":"5.8234","dwjz":"0.12","gztime":"2024-01-15"})'
+            else:
+                response.content = page
+            return response
+        
+        mock_request.side_effect = fake_request
+        
+        result = self.scraper.scrape_fund('110022', detailed=True)
+        
+        page_calls = [c for c in mock_request.call_args_list if 'fundpage' in c.args[0]]
+        self.assertEqual(len(page_calls), 1)
+        self.assertEqual(result['fund_type'], '股票型')
+        self.assertEqual(result['fund_company'], '易方达基金')
+        self.assertEqual(result['fund_manager'], '萧楠')
+        self.assertEqual(result['monthly_1_return'], '1.23%')
+        self.assertEqual(result['since_establishment_return'], '456.78%')
+        
+        # 单独调用两个接口也只会命中缓存
+        self.scraper.get_fund_info_from_page('110022')
+        self.scraper.get_fund_performance('110022')
+        page_calls = [c for c in mock_request.call_args_list if 'fundpage' in c.args[0]]
+        self.assertEqual(len(page_calls), 1)
     
     def test_to_dataframe(self):
         """测试转换为DataFrame"""
@@ -102,6 +185,1606 @@ class TestFundScraper(unittest.TestCase):
                 self.assertEqual(loaded_data[0]['fund_code'], '110022')
 
 
+class TestRateLimiter(unittest.TestCase):
+    """测试按主机限速的令牌桶限流器"""
+    
+    def test_token_bucket_caps_rate(self):
+        """测试令牌耗尽后按速率放行"""
+        import time
+        from rate_limiter import TokenBucket
+        
+        bucket = TokenBucket(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        
+        # 前2个令牌立即可用，其余5个每个需要等待1/50秒
+        self.assertGreaterEqual(elapsed, 0.09)
+    
+    def test_hosts_are_independent(self):
+        """测试不同主机使用不同的令牌桶"""
+        from rate_limiter import HostRateLimiter
+        
+        limiter = HostRateLimiter(rate=1, burst=1, host_rates={'b.example.com': 100})
+        self.assertEqual(limiter.acquire('http://a.example.com/x'), 0.0)
+        self.assertEqual(limiter.acquire('http://b.example.com/y'), 0.0)
+        self.assertGreater(limiter._bucket('http://a.example.com/z')._reserve(), 0.5)
+    
+    def test_unlimited_when_no_rate(self):
+        """测试未设置速率时不限速"""
+        from rate_limiter import HostRateLimiter
+        
+        limiter = HostRateLimiter(rate=None)
+        for _ in range(100):
+            self.assertEqual(limiter.acquire('http://a.example.com/'), 0.0)
+    
+    def test_parse_host_rate(self):
+        """测试解析命令行主机限速配置"""
+        from rate_limiter import parse_host_rate
+        
+        self.assertEqual(parse_host_rate('fundgz.1234567.com.cn=10:5'),
+                         ('fundgz.1234567.com.cn', (10.0, 5)))
+        self.assertEqual(parse_host_rate('a.com=2'), ('a.com', (2.0, None)))
+        with self.assertRaises(ValueError):
+            parse_host_rate('a.com')
+
+
+class TestHttpCache(unittest.TestCase):
+    """测试持久化HTTP响应缓存"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmpdir.name) / 'cache.db')
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    @staticmethod
+    def make_response(content, headers=None, status=200):
+        import requests
+        response = requests.Response()
+        response.status_code = status
+        response._content = content
+        response.headers.update(headers or {})
+        response.encoding = 'utf-8'
+        return response
+    
+    def test_classify_url(self):
+        """测试按URL识别接口类别"""
+        from http_cache import classify_url
+        
+        self.assertEqual(classify_url('https://fundgz.1234567.com.cn/js/fundgz_110022.js'), 'realtime')
+        self.assertEqual(classify_url('http://fund.eastmoney.com/f10/F10DataApi.aspx'), 'history')
+        self.assertEqual(classify_url('https://fundpage.eastmoney.com/110022.html'), 'fundpage')
+        self.assertEqual(classify_url('http://fund.eastmoney.com/110022.html'), 'detail')
+    
+    def test_fresh_hit_skips_network(self):
+        """测试有效期内直接返回缓存，不发送请求"""
+        from http_cache import HttpCache
+        
+        cache = HttpCache(self.db_path)
+        scraper = FundScraper(delay=0, cache=cache)
+        url = 'http://fund.eastmoney.com/f10/F10DataApi.aspx'
+        params = {'type': 'lsjz', 'code': '110022', 'page': 1}
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'payload')) as mock_get:
+            first = scraper._request(url, params=params)
+            second = scraper._request(url, params=dict(reversed(list(params.items()))))
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(first.content, b'payload')
+        self.assertEqual(second.text, 'payload')
+    
+    def test_endpoint_override_uses_endpoint_ttl(self):
+        """测试替换接口地址后，缓存有效期按请求的接口类别而不是URL判断"""
+        from http_cache import HttpCache
+        
+        cache = HttpCache(self.db_path, ttls={'history': 3600, 'default': 0})
+        scraper = FundScraper(delay=0, cache=cache, endpoints={'history': 'http://127.0.0.1:9/history'})
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'payload')) as mock_get:
+            scraper._fetch_history_page('110022', 1, 49)
+            scraper._fetch_history_page('110022', 1, 49)
+        self.assertEqual(mock_get.call_count, 1)
+        
+        # 没有指定类别时使用写入时记录的类别
+        key_url = mock_get.call_args.args[0]
+        self.assertTrue(cache.get(key_url, mock_get.call_args.kwargs['params']).fresh)
+    
+    def test_stale_entry_revalidates_with_etag(self):
+        """测试过期条目发送条件请求，304时继续使用缓存内容"""
+        from http_cache import HttpCache
+        
+        cache = HttpCache(self.db_path, ttls={'detail': 0})
+        scraper = FundScraper(delay=0, cache=cache)
+        url = 'http://fund.eastmoney.com/110022.html'
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'<html/>', {'ETag': '"v1"'})):
+            scraper._request(url)
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'', status=304)) as mock_get:
+            response = scraper._request(url)
+        
+        self.assertEqual(mock_get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        self.assertEqual(response.content, b'<html/>')
+    
+    def test_lru_eviction(self):
+        """测试超出容量后淘汰最久未访问的条目"""
+        from http_cache import HttpCache
+        
+        cache = HttpCache(self.db_path, max_bytes=250)
+        for i in range(3):
+            cache.put(f'http://example.com/{i}', None, self.make_response(b'x' * 100))
+        cache.get('http://example.com/0')
+        
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNotNone(cache.get('http://example.com/0'))
+        self.assertIsNone(cache.get('http://example.com/1'))
+        cache.close()
+
+    
+    def test_negative_cache_skips_fundgz(self):
+        """测试fundgz返回404的基金被记录，下次运行直接使用备用数据源"""
+        from http_cache import HttpCache
+        
+        def fake_get(url, params=None, headers=None, timeout=None):
+            if 'fundgz' in url:
+                return self.make_response(b'', status=404)
+            return self.make_response(b'<html></html>')
+        
+        cache = HttpCache(self.db_path)
+        scraper = FundScraper(delay=0, cache=cache)
+        with patch.object(scraper.session, 'get', side_effect=fake_get) as mock_get:
+            self.assertIsNotNone(scraper.get_fund_info('510300'))
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(scraper.collector.counter('fallbacks_total', reason='not_found'), 1)
+        
+        # 新的爬虫实例（模拟下一次运行），详情页缓存过期
+        cache = HttpCache(self.db_path, ttls={'detail': 0})
+        scraper = FundScraper(delay=0, cache=cache)
+        with patch.object(scraper.session, 'get', side_effect=fake_get) as mock_get:
+            self.assertIsNotNone(scraper.get_fund_info('510300'))
+        self.assertEqual([c.args[0] for c in mock_get.call_args_list], ['http://fund.eastmoney.com/510300.html'])
+        self.assertEqual(scraper.collector.counter('fallbacks_total', reason='known_missing'), 1)
+        
+        # 负缓存过期后重新尝试实时估值API
+        cache = HttpCache(self.db_path, ttls={'missing': 0})
+        self.assertFalse(cache.is_missing('https://fundgz.1234567.com.cn/js/fundgz_510300.js'))
+
+    def test_missing_store_without_cache(self):
+        """测试未启用HTTP缓存时，负缓存文件让下一次运行同样跳过fundgz"""
+        from http_cache import MissingStore
+        
+        def fake_get(url, params=None, headers=None, timeout=None):
+            if 'fundgz' in url:
+                return self.make_response(b'', status=404)
+            return self.make_response(b'<html></html>')
+        
+        path = str(Path(self.tmpdir.name) / 'missing.db')
+        scraper = FundScraper(delay=0, missing_store=MissingStore(path))
+        with patch.object(scraper.session, 'get', side_effect=fake_get) as mock_get:
+            scraper.get_fund_info('510300')
+        self.assertEqual(mock_get.call_count, 2)
+        
+        scraper = FundScraper(delay=0, missing_store=MissingStore(path))
+        with patch.object(scraper.session, 'get', side_effect=fake_get) as mock_get:
+            self.assertIsNotNone(scraper.get_fund_info('510300'))
+        self.assertEqual([c.args[0] for c in mock_get.call_args_list], ['http://fund.eastmoney.com/510300.html'])
+        self.assertEqual(scraper.collector.counter('fallbacks_total', reason='known_missing'), 1)
+        
+        self.assertFalse(MissingStore(path, ttl=0).is_missing('https://fundgz.1234567.com.cn/js/fundgz_510300.js'))
+
+
+class TestResilience(unittest.TestCase):
+    """测试请求重试和主机熔断"""
+    
+    make_response = staticmethod(TestHttpCache.make_response)
+    
+    def test_retry_then_success(self):
+        """测试5xx和超时后按退避重试，最终成功"""
+        import requests
+        
+        scraper = FundScraper(delay=0, retries=3, backoff=0)
+        responses = [requests.Timeout('timeout'), self.make_response(b'', status=503), self.make_response(b'ok')]
+        with patch.object(scraper.session, 'get', side_effect=responses) as mock_get:
+            response = scraper._request('http://fund.eastmoney.com/110022.html')
+        
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(scraper.collector.counter('retries_total'), 2)
+    
+    def test_retries_exhausted(self):
+        """测试重试耗尽后连接错误返回None，5xx抛出HTTPError，404不重试"""
+        import requests
+        
+        scraper = FundScraper(delay=0, retries=2, backoff=0, circuit_threshold=None)
+        with patch.object(scraper.session, 'get', side_effect=requests.ConnectionError('down')) as mock_get:
+            self.assertIsNone(scraper._request('http://fund.eastmoney.com/110022.html'))
+        self.assertEqual(mock_get.call_count, 3)
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'', status=502)):
+            with self.assertRaises(requests.HTTPError):
+                scraper._request('http://fund.eastmoney.com/110022.html')
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'', status=404)) as mock_get:
+            with self.assertRaises(requests.HTTPError):
+                scraper._request('https://fundgz.1234567.com.cn/js/fundgz_510300.js')
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(scraper.collector.counter('failures_total'), 2)
+    
+    def test_circuit_breaker_sheds_load(self):
+        """测试主机错误率过高时熔断，只影响该主机"""
+        import requests
+        
+        scraper = FundScraper(delay=0, retries=0, circuit_threshold=0.5, circuit_cooldown=60)
+        with patch.object(scraper.session, 'get', side_effect=requests.ConnectionError('down')) as mock_get:
+            for _ in range(15):
+                self.assertIsNone(scraper._request('http://fund.eastmoney.com/110022.html'))
+        
+        self.assertEqual(mock_get.call_count, 10)
+        self.assertEqual(scraper.collector.counter('circuit_trips_total'), 1)
+        self.assertEqual(scraper.collector.counter('circuit_rejected_total'), 5)
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response(b'ok')):
+            self.assertIsNotNone(scraper._request('https://fundgz.1234567.com.cn/js/fundgz_110022.js'))
+    
+    def test_circuit_breaker_half_open(self):
+        """测试冷却后放行一个试探请求，成功则恢复"""
+        from resilience import CircuitBreaker
+        
+        breaker = CircuitBreaker(threshold=0.5, window=4, min_requests=2, cooldown=0)
+        breaker.record(False)
+        self.assertTrue(breaker.record(False))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+    
+    def test_half_open_probe_released_on_non_retryable_error(self):
+        """测试试探请求遇到不可重试的错误时释放试探名额，主机不会永久熔断"""
+        import requests
+        
+        scraper = FundScraper(delay=0, retries=0, circuit_threshold=0.5, circuit_cooldown=0)
+        url = 'http://fund.eastmoney.com/110022.html'
+        with patch('builtins.print'):
+            with patch.object(scraper.session, 'get', side_effect=requests.ConnectionError('down')):
+                for _ in range(10):
+                    scraper._request(url)
+            self.assertEqual(scraper.breakers.get(url).state, 'open')
+            
+            with patch.object(scraper.session, 'get', side_effect=requests.exceptions.InvalidURL('bad')):
+                self.assertIsNone(scraper._request(url))
+            with patch.object(scraper.session, 'get', return_value=self.make_response(b'ok')) as mock_get:
+                self.assertEqual(scraper._request(url).content, b'ok')
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(scraper.breakers.get(url).state, 'closed')
+
+
+class TestStats(unittest.TestCase):
+    """测试运行统计"""
+    
+    make_response = staticmethod(TestHttpCache.make_response)
+    
+    def test_collector_histogram_and_exports(self):
+        """测试耗时分位数、按部分标签汇总和Prometheus/JSON导出"""
+        from stats import StatsCollector
+        
+        collector = StatsCollector(buckets=(0.01, 0.1, 1.0))
+        for value in (0.005, 0.05, 0.05, 0.5):
+            collector.observe('http_request_seconds', value, host='a', endpoint='history')
+        collector.observe('http_request_seconds', 2.0, host='b', endpoint='history')
+        collector.incr('retries_total', host='a', endpoint='history')
+        collector.incr('retries_total', 2, host='b', endpoint='realtime')
+        
+        merged = collector.histogram('http_request_seconds', endpoint='history')
+        self.assertEqual(merged.count, 5)
+        self.assertEqual(merged.max, 2.0)
+        self.assertTrue(0.01 < merged.quantile(0.5) <= 0.1)
+        self.assertEqual(collector.counter('retries_total'), 3)
+        self.assertEqual(collector.counter('retries_total', host='a'), 1)
+        
+        text = collector.to_prometheus()
+        self.assertIn('# TYPE fund_scraper_http_request_seconds histogram', text)
+        self.assertIn('fund_scraper_http_request_seconds_bucket{endpoint="history",host="a",le="0.1"} 3', text)
+        self.assertIn('fund_scraper_http_request_seconds_bucket{endpoint="history",host="a",le="+Inf"} 4', text)
+        self.assertIn('fund_scraper_retries_total{endpoint="realtime",host="b"} 2', text)
+        
+        snapshot = json.loads(collector.to_json())
+        self.assertEqual(len(snapshot['histograms']), 2)
+        self.assertIn('运行统计', collector.summary())
+    
+    def test_scraper_records_requests_parse_and_fallbacks(self):
+        """测试请求耗时、流量、解析耗时、重试和fundgz→详情页降级都被记录"""
+        import requests
+        
+        responses = [requests.Timeout('timeout'), self.make_response(b'', status=404),
+                     self.make_response(b'<html>' + b' ' * 100 + b'</html>')]
+        scraper = FundScraper(delay=0, backoff=0)
+        with patch.object(scraper.session, 'get', side_effect=responses), patch('builtins.print'):
+            self.assertIsNotNone(scraper.get_fund_info('510300'))
+        
+        collector = scraper.collector
+        self.assertEqual(collector.histogram('http_request_seconds', endpoint='realtime').count, 2)
+        self.assertEqual(collector.counter('http_requests_total', endpoint='realtime', status='error'), 1)
+        self.assertEqual(collector.counter('http_requests_total', endpoint='realtime', status='404'), 1)
+        self.assertEqual(collector.counter('http_response_bytes_total', host='fund.eastmoney.com',
+                                           endpoint='detail'), 113)
+        self.assertEqual(collector.counter('retries_total', endpoint='realtime'), 1)
+        self.assertEqual(collector.counter('fallbacks_total', reason='not_found'), 1)
+        self.assertEqual(collector.histogram('parse_seconds', endpoint='detail').count, 1)
+        self.assertEqual(collector.issues(), ["实时估值API: 404 1 次（已记录），按记录跳过 0 次请求"])
+        self.assertIn(collector.issues()[0], collector.summary())
+
+
+class TestHistorySync(unittest.TestCase):
+    """测试历史净值增量同步"""
+    
+    @staticmethod
+    def make_page(dates):
+        rows = ''.join(
+            f"<tr><td>{d}</td><td class='tor bold'>1.0{i}</td><td class='tor bold'>2.0{i}</td>"
+            f"<td class='tor bold red'>0.{i}%</td><td>开放申购</td><td>开放赎回</td><td></td></tr>"
+            for i, d in enumerate(dates)
+        )
+        return (f'var apidata={{ content:"<table class=\'w782 comm lsjz\'><thead><tr><th>净值日期</th></tr></thead>'
+                f'<tbody>{rows}</tbody></table>",records:{len(dates)},pages:1,curpage:1}};')
+    
+    def test_history_pages_fetched_from_metadata(self):
+        """测试按第1页返回的总页数并发请求剩余页，并按日期顺序合并"""
+        from datetime import datetime, timedelta
+        
+        today = datetime.now().date()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(6)]
+        pages = {1: dates[0:2], 2: dates[2:4], 3: dates[4:6]}
+        
+        def fake_request(url, params=None, endpoint=None):
+            response = MagicMock()
+            text = self.make_page(pages[params['page']])
+            response.text = text.replace('records:2,pages:1', 'records:6,pages:3')
+            return response
+        
+        scraper = FundScraper(delay=0, history_workers=3)
+        with patch.object(scraper, '_request', side_effect=fake_request) as mock_request:
+            history = scraper.get_fund_history('110022', days=3650)
+        
+        self.assertEqual(sorted(c.kwargs['params']['page'] for c in mock_request.call_args_list), [1, 2, 3])
+        self.assertEqual([r['date'] for r in history], dates)
+    
+    def test_history_stops_at_day_cutoff(self):
+        """测试只请求天数范围内需要的页数"""
+        from datetime import datetime, timedelta
+        
+        today = datetime.now().date()
+        dates = [(today - timedelta(days=i * 10)).strftime('%Y-%m-%d') for i in range(3)]
+        
+        response = MagicMock()
+        response.text = self.make_page(dates).replace('pages:1', 'pages:40')
+        scraper = FundScraper(delay=0)
+        with patch.object(scraper, '_request', return_value=response) as mock_request:
+            history = scraper.get_fund_history('110022', days=15)
+        
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual([r['date'] for r in history], dates[:2])
+    
+    def test_history_returns_plain_dicts_unless_as_records(self):
+        """测试默认返回可以直接序列化、转换为DataFrame的字典，as_records时返回NavRecord"""
+        import pandas as pd
+        from datetime import datetime
+        from records import NavRecord
+        
+        response = MagicMock()
+        response.text = self.make_page([datetime.now().strftime('%Y-%m-%d')])
+        for as_records in (False, True):
+            scraper = FundScraper(delay=0, as_records=as_records)
+            with patch.object(scraper, '_request', return_value=response):
+                history = scraper.get_fund_history('110022', days=30)
+            self.assertIsInstance(history[0], NavRecord if as_records else dict)
+        
+        scraper = FundScraper(delay=0)
+        with patch.object(scraper, '_request', return_value=response):
+            history = scraper.get_fund_history('110022', days=30)
+        self.assertEqual(json.loads(json.dumps(history)), history)
+        self.assertEqual(list(pd.DataFrame(history).columns), list(NavRecord.FIELDS))
+        
+        record = NavRecord('110022', '2024-01-05', 1.662, 3.562, None)
+        record['growth_rate'] = -0.54
+        self.assertEqual(record.growth_rate, -0.54)
+        with self.assertRaises(KeyError):
+            record['extra'] = 1
+    
+    def test_history_date_range_passed_to_server(self):
+        """测试日期区间通过sdate/edate传给服务器，页数由返回的pages决定"""
+        dates = ['2019-03-08', '2019-03-07', '2019-03-06', '2019-03-05', '2019-03-04', '2019-03-01']
+        pages = {1: dates[0:2], 2: dates[2:4], 3: dates[4:6]}
+        
+        def fake_request(url, params=None, endpoint=None):
+            response = MagicMock()
+            text = self.make_page(pages[params['page']])
+            response.text = text.replace('records:2,pages:1', 'records:6,pages:3')
+            return response
+        
+        scraper = FundScraper(delay=0, history_workers=2)
+        with patch.object(scraper, '_request', side_effect=fake_request) as mock_request:
+            history = scraper.get_fund_history('110022', start_date='2019-03-01', end_date='2019-03-07')
+        
+        params = [c.kwargs['params'] for c in mock_request.call_args_list]
+        self.assertEqual(sorted(p['page'] for p in params), [1, 2, 3])
+        self.assertTrue(all(p['sdate'] == '2019-03-01' and p['edate'] == '2019-03-07' for p in params))
+        # 区间外的记录即使被返回也会被过滤
+        self.assertEqual([r['date'] for r in history], dates[1:])
+        
+        with patch.object(scraper, '_request') as mock_request:
+            self.assertIsNone(scraper.get_fund_history('110022', start_date='2019/03/01'))
+            self.assertIsNone(scraper.get_fund_history('110022', start_date='2019-03-07', end_date='2019-03-01'))
+        mock_request.assert_not_called()
+    
+    def test_sync_only_appends_new_rows(self):
+        """测试同步遇到本地已有日期即停止，只追加新记录"""
+        from datetime import datetime, timedelta
+        from history_store import HistoryStore
+        
+        today = datetime.now().date()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(5)]
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = HistoryStore(str(Path(tmpdir) / 'nav.db'))
+            scraper = FundScraper(delay=0)
+            
+            response = MagicMock()
+            response.text = self.make_page(dates[2:])
+            with patch.object(scraper, '_request', return_value=response):
+                self.assertEqual(scraper.sync_history('110022', store), 3)
+            self.assertEqual(store.last_date('110022'), dates[2])
+            
+            response.text = self.make_page(dates)
+            with patch.object(scraper, '_request', return_value=response) as mock_request:
+                self.assertEqual(scraper.sync_history('110022', store), 2)
+            
+            # 本地已有数据时从最新日期的次日开始由服务器按区间过滤
+            self.assertEqual(mock_request.call_args.kwargs['params']['sdate'], dates[1])
+            self.assertEqual([r['date'] for r in store.load('110022')], dates)
+            store.close()
+
+
+class TestStreaming(unittest.TestCase):
+    """测试流式生成器和流式输出"""
+    
+    def test_iter_history_streams_in_order(self):
+        """测试iter_history按输入顺序逐个基金产出，且不会提前抓取全部基金"""
+        fetched = []
+        
+        def fake_history(code, days=30, start_date=None, end_date=None):
+            fetched.append(code)
+            return [{'fund_code': code, 'date': '2024-01-0%d' % i} for i in (2, 1)]
+        
+        def codes():
+            for i in range(100):
+                yield f'{i:06d}'
+        
+        scraper = FundScraper(delay=0, max_workers=2)
+        with patch.object(scraper, 'get_fund_history', side_effect=fake_history):
+            stream = scraper.iter_history(codes())
+            first = [next(stream) for _ in range(4)]
+            self.assertLess(len(fetched), 10)
+            rest = list(stream)
+        
+        self.assertEqual([r['fund_code'] for r in first], ['000000', '000000', '000001', '000001'])
+        self.assertEqual(len(first) + len(rest), 200)
+        self.assertEqual(rest[-1]['fund_code'], '000099')
+    
+    def test_iter_funds_skips_failures(self):
+        """测试iter_funds跳过失败的基金"""
+        scraper = FundScraper(delay=0)
+        results = {'110022': {'fund_code': '110022'}, '161725': None}
+        with patch.object(scraper, 'scrape_fund', side_effect=lambda code, detailed=False: results[code]):
+            self.assertEqual(list(scraper.iter_funds(['110022', '161725'])), [{'fund_code': '110022'}])
+    
+    def test_sinks(self):
+        """测试CSV/JSONL流式输出"""
+        from sinks import open_sink
+        
+        records = [
+            {'fund_code': '110022', 'date': '2024-01-02', 'unit_net_value': 1.5},
+            {'fund_code': '110022', 'date': '2024-01-01', 'unit_net_value': 1.4, 'extra': 'x'},
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / 'out' / 'history.csv'
+            with open_sink(str(csv_path)) as sink:
+                self.assertEqual(sink.write_many(records[:1]), 1)
+            with open_sink(str(csv_path), append=True) as sink:
+                sink.write_many(records[1:])
+            
+            import pandas as pd
+            df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype=str)
+            self.assertEqual(list(df.columns), ['fund_code', 'date', 'unit_net_value'])
+            self.assertEqual(df['date'].tolist(), ['2024-01-02', '2024-01-01'])
+            
+            jsonl_path = Path(tmpdir) / 'history.jsonl'
+            with open_sink(str(jsonl_path)) as sink:
+                sink.write_many(iter(records))
+            lines = jsonl_path.read_text(encoding='utf-8').splitlines()
+            self.assertEqual([json.loads(line) for line in lines], records)
+            
+            with self.assertRaises(ValueError):
+                open_sink(str(Path(tmpdir) / 'history.json'))
+
+
+class TestCheckpoint(unittest.TestCase):
+    """测试检查点日志和断点续跑"""
+    
+    def test_checkpoint_resume(self):
+        """测试重新打开检查点后跳过已完成的基金，并容忍不完整的最后一行"""
+        from checkpoint import Checkpoint
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            params = {'mode': 'history', 'days': 30}
+            with Checkpoint(tmpdir, params) as checkpoint:
+                checkpoint.record('110022', [{'fund_code': '110022', 'date': '2024-01-02'}])
+                checkpoint.record('161725', [{'fund_code': '161725', 'date': '2024-01-02'}])
+            
+            # 模拟写入过程中被终止
+            with open(Path(tmpdir) / Checkpoint.JOURNAL_FILE, 'ab') as f:
+                f.write(b'{"fund_code": "163402", "da')
+            
+            with Checkpoint(tmpdir, params) as checkpoint:
+                self.assertEqual(checkpoint.pending(['163402', '110022', '161725']), ['163402'])
+                checkpoint.record('163402', [])
+                self.assertEqual([code for code, _ in checkpoint.items(['163402', '161725', '110022'])],
+                                 ['163402', '161725', '110022'])
+                self.assertEqual(checkpoint.get('161725')[0]['fund_code'], '161725')
+            
+            with self.assertRaises(ValueError):
+                Checkpoint(tmpdir, {'mode': 'history', 'days': 90})
+    
+    def test_cli_resumes_from_checkpoint(self):
+        """测试命令行中断后续跑只抓取剩余基金，并合并输出全部结果"""
+        import sys
+        import scrape_funds
+        
+        failing = {'161725'}
+        calls = []
+        
+        def fake_history(self, code, days=30, start_date=None, end_date=None):
+            calls.append(code)
+            if code in failing:
+                return None
+            return [{'fund_code': code, 'date': '2024-01-02', 'unit_net_value': 1.0,
+                     'accumulated_net_value': 2.0, 'growth_rate': '0.1%'}]
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = str(Path(tmpdir) / 'history.jsonl')
+            argv = ['scrape_funds.py', '-c', '110022', '161725', '163402', '--history', '30',
+                    '--checkpoint', str(Path(tmpdir) / 'ckpt'), '-l', '0', '-o', output,
+                    '--missing-cache', str(Path(tmpdir) / 'missing.db')]
+            
+            with patch.object(FundScraper, 'get_fund_history', fake_history), \
+                 patch.object(sys, 'argv', argv), patch('builtins.print'):
+                scrape_funds.main()
+                self.assertEqual(sorted(calls), ['110022', '161725', '163402'])
+                
+                calls.clear()
+                failing.clear()
+                scrape_funds.main()
+                self.assertEqual(calls, ['161725'])
+            
+            lines = Path(output).read_text(encoding='utf-8').splitlines()
+            self.assertEqual(sorted(json.loads(line)['fund_code'] for line in lines),
+                             ['110022', '161725', '163402'])
+
+
+class TestWatch(unittest.TestCase):
+    """测试盘中估值监控"""
+    
+    def test_trading_hours_backoff(self):
+        """测试交易时段判断和非交易时段的轮询间隔"""
+        from datetime import datetime
+        from watch import MARKET_TZ, is_trading_time, next_poll_delay, seconds_until_open
+        
+        monday_morning = datetime(2024, 1, 15, 10, 0, tzinfo=MARKET_TZ)
+        lunch = datetime(2024, 1, 15, 12, 50, tzinfo=MARKET_TZ)
+        friday_night = datetime(2024, 1, 19, 20, 0, tzinfo=MARKET_TZ)
+        
+        self.assertTrue(is_trading_time(monday_morning))
+        self.assertFalse(is_trading_time(lunch))
+        self.assertEqual(next_poll_delay(60, 900, monday_morning), 60)
+        # 午休时按idle间隔等待，但不会错过13:00开盘
+        self.assertEqual(seconds_until_open(lunch), 600)
+        self.assertEqual(next_poll_delay(60, 900, lunch), 600)
+        self.assertEqual(next_poll_delay(60, 900, friday_night), 900)
+        self.assertEqual(seconds_until_open(friday_night), (2 * 24 + 13.5) * 3600)
+    
+    def test_poll_emits_only_changed_estimates(self):
+        """测试只输出估值时间或估值发生变化的基金"""
+        import io
+        from records import FundQuote
+        from watch import FundWatcher
+        
+        rounds = [
+            {'110022': ('2024-01-15 10:00', 5.1), '161725': ('2024-01-15 10:00', 1.2)},
+            {'110022': ('2024-01-15 10:01', 5.2), '161725': ('2024-01-15 10:00', 1.2)},
+            {'110022': ('2024-01-15 10:01', 5.2), '161725': ('2024-01-15 10:00', 1.2)},
+        ]
+        
+        def fake_iter_funds(self, fund_codes, detailed=False, max_workers=None):
+            current = rounds.pop(0)
+            for code in fund_codes:
+                update_date, value = current[code]
+                yield FundQuote(code, unit_net_value=value, update_date=update_date)
+        
+        out = io.StringIO()
+        sleeps = []
+        with patch.object(FundScraper, 'iter_funds', fake_iter_funds), patch('builtins.print'):
+            watcher = FundWatcher(FundScraper(delay=0), ['110022', '161725'], out=out,
+                                  sleep=sleeps.append)
+            watcher.run(max_polls=3)
+        
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line['fund_code'] for line in lines], ['110022', '161725', '110022'])
+        self.assertEqual(lines[-1]['unit_net_value'], 5.2)
+        self.assertEqual(len(sleeps), 2)
+        self.assertEqual(watcher.emitted, 3)
+    
+    def test_cli_watch_writes_jsonl_to_stdout(self):
+        """测试--watch时标准输出只有JSONL"""
+        import io
+        import sys
+        import scrape_funds
+        from records import FundQuote
+        from watch import FundWatcher
+        
+        def fake_iter_funds(self, fund_codes, detailed=False, max_workers=None):
+            print("模拟的抓取日志")
+            for code in fund_codes:
+                yield FundQuote(code, unit_net_value=1.0, update_date='2024-01-15 10:00')
+        
+        run = FundWatcher.run
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ['scrape_funds.py', '-c', '110022', '--watch', '--interval', '5', '-l', '0', '--missing-cache', '']
+        with patch.object(FundScraper, 'iter_funds', fake_iter_funds), \
+             patch.object(FundWatcher, 'run', lambda self: run(self, max_polls=1)), \
+             patch.object(sys, 'argv', argv), patch.object(sys, 'stdout', stdout), \
+             patch.object(sys, 'stderr', stderr):
+            scrape_funds.main()
+            self.assertIs(sys.stdout, stdout)
+        
+        self.assertEqual([json.loads(line)['fund_code'] for line in stdout.getvalue().splitlines()], ['110022'])
+        self.assertIn("模拟的抓取日志", stderr.getvalue())
+
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+class TestHistoryParser(unittest.TestCase):
+    """测试历史净值表格的fast/bs4解析器一致性"""
+    
+    def load_fixture(self, name):
+        return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+    
+    def test_fast_parser_matches_bs4(self):
+        """测试两种解析器在录制的响应上输出完全一致"""
+        from fund_scraper import parse_history_page
+        
+        text = self.load_fixture('lsjz_110022_page1.txt')
+        for days in (36500, 0):
+            fast = parse_history_page('110022', text, days, parser='fast')
+            bs4 = parse_history_page('110022', text, days, parser='bs4')
+            self.assertEqual(fast, bs4)
+        
+        records, reached_cutoff = parse_history_page('110022', text, 36500, parser='fast')
+        self.assertFalse(reached_cutoff)
+        self.assertEqual(len(records), 8)
+        self.assertEqual(records[0]['unit_net_value'], 1.662)
+        self.assertEqual(records[2]['growth_rate'], 0.0)
+        self.assertIsNone(records[-1].growth_rate)
+        
+        since = parse_history_page('110022', text, 36500, start_date='2024-01-03', parser='fast')
+        self.assertEqual(since, parse_history_page('110022', text, 36500, start_date='2024-01-03', parser='bs4'))
+        self.assertEqual([r['date'] for r in since[0]], ['2024-01-05', '2024-01-04', '2024-01-03'])
+        self.assertTrue(since[1])
+    
+    def test_fast_parser_matches_bs4_on_empty_table(self):
+        """测试无数据和格式异常的响应"""
+        from fund_scraper import parse_history_page
+        
+        for text in (self.load_fixture('lsjz_empty.txt'),
+                     'var apidata={ content:"",records:0,pages:0,curpage:1};',
+                     'var apidata={ content:"<table></table>",records:0,pages:0,curpage:1};',
+                     'not a payload'):
+            fast = parse_history_page('110022', text, 30, parser='fast')
+            bs4 = parse_history_page('110022', text, 30, parser='bs4')
+            self.assertEqual(fast, bs4)
+    
+    def test_unknown_parser_rejected(self):
+        """测试未知的解析器名称"""
+        from fund_scraper import parse_history_page
+        
+        with self.assertRaises(ValueError):
+            FundScraper(history_parser='html5lib')
+        with self.assertRaises(ValueError):
+            parse_history_page('110022', '', 30, parser='html5lib')
+
+
+class TestRecords(unittest.TestCase):
+    """测试FundQuote/NavRecord记录类型"""
+    
+    def test_nav_record_compatible_with_dict_access(self):
+        """测试NavRecord的字典式访问、转换和序列化"""
+        from records import NavRecord, parse_percent, records_to_frame, to_plain
+        
+        record = NavRecord('110022', '2024-01-05', 1.662, 3.562, parse_percent('-0.54%'))
+        self.assertEqual(record.growth_rate, -0.54)
+        self.assertEqual(record['unit_net_value'], 1.662)
+        self.assertIsNone(record.get('missing'))
+        self.assertEqual(record.as_dict(), {
+            'fund_code': '110022', 'date': '2024-01-05', 'unit_net_value': 1.662,
+            'accumulated_net_value': 3.562, 'growth_rate': -0.54,
+        })
+        self.assertEqual(json.loads(json.dumps([record], default=to_plain))[0], record.as_dict())
+        
+        df = records_to_frame([record, NavRecord('110022', '2024-01-04', 1.671, 3.571, None)])
+        self.assertEqual(list(df.columns), list(NavRecord.FIELDS))
+        self.assertEqual(df['growth_rate'].dtype.kind, 'f')
+        
+        self.assertEqual(parse_percent(''), 0.0)
+        self.assertIsNone(parse_percent('--'))
+    
+    def test_fund_quote_extra_fields(self):
+        """测试FundQuote合并详细模式的额外字段"""
+        from records import FundQuote
+        
+        quote = FundQuote('110022', fund_name='易方达消费行业', unit_net_value=5.8234)
+        quote.update({'fund_type': '股票型', 'unit_net_value': 5.9})
+        self.assertEqual(quote.unit_net_value, 5.9)
+        self.assertEqual(quote['fund_type'], '股票型')
+        self.assertIn('fund_type', quote)
+        self.assertEqual(quote.keys()[-1], 'fund_type')
+        self.assertEqual(quote.as_dict()['fund_type'], '股票型')
+    
+    def test_fund_quote_as_plain_dict(self):
+        """测试FundQuote可以像旧版dict一样遍历，额外字段按需创建并展开为DataFrame的列"""
+        from records import FundQuote, format_percent, records_to_frame
+        
+        quote = FundQuote('110022', fund_name='易方达消费行业', unit_net_value=5.8234)
+        self.assertIsNone(quote.extra)
+        self.assertNotIn('fund_type', quote)
+        self.assertIsNone(quote.get('fund_type'))
+        self.assertEqual(dict(quote.items()), quote.as_dict())
+        self.assertEqual(list(quote), list(FundQuote.FIELDS))
+        
+        quote['fund_type'] = '股票型'
+        self.assertEqual(dict(quote), quote.as_dict())
+        self.assertEqual(dict(quote.items())['fund_type'], '股票型')
+        self.assertEqual(quote.values()[-1], '股票型')
+        self.assertEqual(len(quote), len(FundQuote.FIELDS) + 1)
+        
+        df = records_to_frame([quote, FundQuote('161725')])
+        self.assertIn('fund_type', df.columns)
+        self.assertNotIn('extra', df.columns)
+        self.assertEqual(df['fund_type'].tolist()[0], '股票型')
+        
+        self.assertEqual(format_percent(1.234), '1.23%')
+        self.assertEqual(format_percent(None), '--')
+    
+    def test_history_store_reads_legacy_text_growth(self):
+        """测试读取旧版以文本保存增长率的历史库"""
+        import sqlite3
+        from history_store import HistoryStore
+        from records import NavRecord
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / 'history.db')
+            conn = sqlite3.connect(path)
+            conn.execute("""
+                CREATE TABLE nav_history (
+                    fund_code TEXT NOT NULL, date TEXT NOT NULL,
+                    unit_net_value REAL, accumulated_net_value REAL, growth_rate TEXT,
+                    PRIMARY KEY (fund_code, date)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("INSERT INTO nav_history VALUES ('110022', '2024-01-04', 1.671, 3.571, '0.3%')")
+            conn.commit()
+            conn.close()
+            
+            store = HistoryStore(path)
+            store.append([NavRecord('110022', '2024-01-05', 1.662, 3.562, -0.54)])
+            records = store.load('110022')
+            store.close()
+        
+        self.assertEqual([r.growth_rate for r in records], [-0.54, 0.3])
+
+
+class TestNavSeries(unittest.TestCase):
+    """测试NavSeries净值序列"""
+    
+    def setUp(self):
+        from fund_scraper import parse_history_page
+        
+        text = (FIXTURES_DIR / 'lsjz_110022_page1.txt').read_text(encoding='utf-8')
+        self.records = parse_history_page('110022', text, 36500)[0]
+    
+    def test_from_records_sorted_and_typed(self):
+        """测试由从新到旧的记录构建升序的NumPy序列"""
+        import numpy as np
+        from nav_series import NavSeries
+        
+        series = NavSeries.from_records(self.records)
+        self.assertEqual(len(series), 8)
+        self.assertEqual(series.dates.dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(str(series.start), '2023-12-26')
+        self.assertEqual(str(series.end), '2024-01-05')
+        self.assertTrue(np.isnan(series.growth_rate[0]))
+        self.assertEqual(series.unit_net_value[-1], 1.662)
+        self.assertEqual(series.to_records(), self.records)
+        
+        legacy = [dict(record.as_dict(), growth_rate=f"{record.growth_rate}%") for record in self.records[:-1]]
+        self.assertTrue(np.array_equal(NavSeries.from_records(legacy).growth_rate,
+                                       series.growth_rate[1:]))
+    
+    def test_from_rows_matches_records(self):
+        """测试get_nav_series直接由表格单元格构建序列，结果与由记录构建相同"""
+        import numpy as np
+        from nav_series import NavSeries
+        
+        text = (FIXTURES_DIR / 'lsjz_110022_page1.txt').read_text(encoding='utf-8')
+        scraper = FundScraper(delay=0)
+        pages = lambda code, page, per, **kwargs: text if page == 1 else None
+        with patch.object(scraper, '_fetch_history_page', side_effect=pages), patch('builtins.print'):
+            series = scraper.get_nav_series('110022', days=36500)
+        expected = NavSeries.from_records(self.records)
+        self.assertTrue(np.array_equal(series.dates, expected.dates))
+        for name in NavSeries.FIELDS:
+            self.assertTrue(np.array_equal(getattr(series, name), getattr(expected, name), equal_nan=True))
+        
+        series = NavSeries.from_rows('110022', [('2024-01-05', '--', '3.562', '-0.54%'),
+                                                ('2024-01-04', '1.671', '3.571', '--')])
+        self.assertTrue(np.isnan(series.unit_net_value[1]))
+        self.assertTrue(np.isnan(series.growth_rate[0]))
+        self.assertEqual(series.accumulated_net_value.tolist(), [3.571, 3.562])
+    
+    def test_between_and_pandas_share_memory(self):
+        """测试按日期切片和转换为pandas时不复制数据"""
+        import numpy as np
+        from nav_series import NavSeries
+        
+        series = NavSeries.from_records(self.records)
+        window = series.between('2023-12-28', '2024-01-03')
+        self.assertEqual([str(d) for d in window.dates],
+                         ['2023-12-28', '2023-12-29', '2024-01-02', '2024-01-03'])
+        self.assertTrue(np.shares_memory(window.unit_net_value, series.unit_net_value))
+        self.assertEqual(len(series.between(start_date='2030-01-01')), 0)
+        
+        frame = series.to_frame()
+        self.assertEqual(list(frame.columns), list(NavSeries.FIELDS))
+        self.assertTrue(np.shares_memory(frame['accumulated_net_value'].to_numpy(),
+                                         series.accumulated_net_value))
+        self.assertEqual(series.to_series().name, '110022')
+        self.assertEqual(len(series.returns()), 7)
+    
+    def test_history_store_load_series(self):
+        """测试从本地历史库直接读取序列"""
+        from history_store import HistoryStore
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = HistoryStore(str(Path(tmpdir) / 'history.db'))
+            store.append(self.records)
+            series = store.load_series('110022', start_date='2024-01-01')
+            empty = store.load_series('000000')
+            store.close()
+        
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.accumulated_net_value.tolist(),
+                         [r.accumulated_net_value for r in reversed(self.records[:4])])
+        self.assertEqual(len(empty), 0)
+
+
+class TestAnalytics(unittest.TestCase):
+    """测试本地业绩指标计算"""
+    
+    def test_compute_performance_matches_hand_calculation(self):
+        """测试各项指标与逐只基金的手工计算一致"""
+        import numpy as np
+        import pandas as pd
+        from analytics import compute_performance
+        
+        dates = pd.to_datetime(['2023-01-03', '2023-02-03', '2023-03-03', '2023-04-03', '2024-01-03'])
+        panel = pd.DataFrame({
+            'A': [1.0, 1.2, 0.9, np.nan, 1.5],
+            'B': [np.nan, np.nan, 2.0, 2.2, np.nan],
+            'C': [np.nan] * 5,
+        }, index=dates)
+        
+        metrics = compute_performance(panel, chunk_size=2)
+        a, b, c = metrics.loc['A'], metrics.loc['B'], metrics.loc['C']
+        
+        self.assertAlmostEqual(a['yearly_1_return'], 50.0)
+        self.assertAlmostEqual(a['monthly_3_return'], (1.5 / 0.9 - 1) * 100)
+        self.assertAlmostEqual(a['max_drawdown'], -25.0)
+        self.assertAlmostEqual(a['annual_return'], 50.0)
+        returns = np.array([0.2, 0.9 / 1.2 - 1, 0.0, 1.5 / 0.9 - 1])
+        self.assertAlmostEqual(a['annual_volatility'], returns.std(ddof=1) * np.sqrt(252) * 100)
+        self.assertAlmostEqual(a['sharpe_ratio'], returns.mean() * 252 / (returns.std(ddof=1) * np.sqrt(252)))
+        self.assertAlmostEqual(a['calmar_ratio'], 0.5 / 0.25)
+        
+        # 成立晚于窗口起点的基金没有该阶段收益；清盘后的日期不计入
+        self.assertTrue(np.isnan(b['yearly_1_return']))
+        self.assertAlmostEqual(b['monthly_1_return'], 10.0)
+        self.assertEqual(str(b['end_date'].date()), '2023-04-03')
+        self.assertEqual(b['observations'], 2)
+        self.assertTrue(np.isnan(c['annual_return']))
+        self.assertEqual(c['observations'], 0)
+    
+    def test_compute_performance_from_history_dict(self):
+        """测试直接使用get_multiple_funds_history的返回值"""
+        from analytics import compute_performance
+        from fund_scraper import parse_history_page
+        
+        text = (FIXTURES_DIR / 'lsjz_110022_page1.txt').read_text(encoding='utf-8')
+        records = parse_history_page('110022', text, 36500)[0]
+        metrics = compute_performance({'110022': records})
+        
+        expected = (records[0].accumulated_net_value / records[-1].accumulated_net_value - 1) * 100
+        self.assertAlmostEqual(metrics.loc['110022', 'since_establishment_return'], expected)
+
+
+class TestNavPanel(unittest.TestCase):
+    """测试净值宽表的构建"""
+    
+    def make_history(self):
+        from records import NavRecord
+        
+        return {
+            'A': [NavRecord('A', d, v, v, 0.0) for d, v in
+                  [('2024-01-05', 1.4), ('2024-01-03', 1.2), ('2024-01-02', 1.1)]],
+            'B': [NavRecord('B', d, v, v, 0.0) for d, v in
+                  [('2024-01-04', 2.1), ('2024-01-03', 2.0)]],
+        }
+    
+    def test_aligned_panel_and_fill(self):
+        """测试日期对齐、float32存储、分类列和缺口填充"""
+        import numpy as np
+        import pandas as pd
+        from panel import build_nav_panel
+        
+        panel = build_nav_panel(self.make_history(), dtype=np.float32, categorical=True)
+        self.assertEqual([str(d.date()) for d in panel.index],
+                         ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05'])
+        self.assertIsInstance(panel.columns, pd.CategoricalIndex)
+        self.assertTrue((panel.dtypes == np.float32).all())
+        self.assertTrue(np.isnan(panel.loc['2024-01-04', 'A']))
+        
+        filled = build_nav_panel(self.make_history(), fill='ffill')
+        self.assertAlmostEqual(filled.loc['2024-01-04', 'A'], 1.2)
+        # 首个净值之前和最后一个净值之后不填充
+        self.assertTrue(np.isnan(filled.loc['2024-01-02', 'B']))
+        self.assertTrue(np.isnan(filled.loc['2024-01-05', 'B']))
+        
+        interpolated = build_nav_panel(self.make_history(), fill='interpolate')
+        self.assertAlmostEqual(interpolated.loc['2024-01-04', 'A'], 1.3)
+        
+        calendar = pd.bdate_range('2024-01-01', '2024-01-05')
+        limited = build_nav_panel(self.make_history(), index=calendar, fill='ffill', limit=1)
+        self.assertEqual(len(limited), 5)
+        self.assertTrue(np.isnan(limited.loc['2024-01-01', 'A']))
+        
+        with self.assertRaises(ValueError):
+            build_nav_panel(self.make_history(), fill='zero')
+    
+    def test_builder_from_record_stream(self):
+        """测试从iter_history式的记录流逐只构建"""
+        from panel import NavPanelBuilder, build_nav_panel
+        
+        history = self.make_history()
+        stream = (record for code in ('A', 'B') for record in history[code])
+        builder = NavPanelBuilder(field='unit_net_value')
+        self.assertEqual(builder.add_records(stream), 2)
+        self.assertTrue(builder.build().equals(build_nav_panel(history, field='unit_net_value')))
+
+
+class TestSimilarity(unittest.TestCase):
+    """测试基金相关性与相似基金查找"""
+    
+    def make_panel(self):
+        import numpy as np
+        import pandas as pd
+        
+        rng = np.random.default_rng(7)
+        base = rng.normal(0, 0.01, (300, 3))
+        returns = np.column_stack([base[:, i % 3] + rng.normal(0, 0.0005 * (i + 1), 300) for i in range(12)])
+        values = np.cumprod(1 + returns, axis=0)
+        values[:150, 3] = np.nan       # 成立较晚
+        values[::17, 5] = np.nan       # 零星缺失
+        values[:-20, 11] = np.nan      # 历史太短
+        return pd.DataFrame(values, index=pd.bdate_range('2023-01-02', periods=300),
+                            columns=[f"{i:06d}" for i in range(12)])
+    
+    def test_exact_matches_pairwise_pandas_corr(self):
+        """测试精确模式与pandas两两重叠的相关系数一致"""
+        import numpy as np
+        from similarity import top_k_correlations
+        
+        panel = self.make_panel()
+        index = top_k_correlations(panel, k=3, min_overlap=60, block_size=5)
+        expected = panel.pct_change(fill_method=None).corr(min_periods=60)
+        
+        for code in ('000000', '000003', '000005'):
+            top = expected[code].drop(code).dropna().sort_values(ascending=False)[:3]
+            similar = index.similar(code)
+            self.assertEqual([c for c, _, _ in similar], list(top.index))
+            self.assertTrue(np.allclose([corr for _, corr, _ in similar], top.values))
+        
+        self.assertEqual(index.similar('000011'), [])
+        self.assertEqual(index.similar('000003')[0][2], 149)
+        self.assertEqual(index.similar('000000', k=1)[0][0], index.similar('000000')[0][0])
+        with self.assertRaises(KeyError):
+            index.similar('999999')
+        
+        clones = index.clones(threshold=0.9)
+        self.assertTrue(clones)
+        self.assertEqual(len({(a, b) for a, b, _ in clones}), len(clones))
+        self.assertTrue(all(corr >= 0.9 for _, _, corr in clones))
+        self.assertEqual(set(index.to_frame().columns), {'fund_code', 'neighbour', 'correlation', 'overlap'})
+    
+    def test_approximate_mode_rescored_exactly(self):
+        """测试近似模式返回的相关系数是精确值"""
+        import numpy as np
+        from similarity import top_k_correlations
+        
+        panel = self.make_panel()
+        exact = top_k_correlations(panel, k=2)
+        approx = top_k_correlations(panel, k=2, approximate=True, sketch_dim=16, oversample=3)
+        expected = panel.pct_change(fill_method=None).corr(min_periods=60)
+        
+        for code in panel.columns[:11]:
+            for neighbour, corr, _ in approx.similar(code):
+                self.assertAlmostEqual(corr, expected.loc[code, neighbour])
+            self.assertEqual(approx.similar(code)[0][0], exact.similar(code)[0][0])
+
+
+try:
+    from async_fund_scraper import AsyncFundScraper, AsyncResponse, aiohttp
+except ImportError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, "未安装aiohttp")
+class TestFundServer(unittest.TestCase):
+    """测试本地查询服务（上游为本地测试桩）"""
+    
+    JSONP = 'jsonpgz({"name":"易方达消费行业","gsz":"5.8234","jsn":"5.8234","dwjz":"0.12","gztime":"2024-01-15"})'
+    
+    def setUp(self):
+        import threading
+        from collections import Counter
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from fund_server import FundService, make_server
+        
+        hits = self.hits = Counter()
+        jsonp = self.JSONP.encode('utf-8')
+        # 只返回1页，避免按录制的pages继续翻页
+        history = (FIXTURES_DIR / 'lsjz_110022_page1.txt').read_text(encoding='utf-8') \
+            .replace('pages:339', 'pages:1').encode('utf-8')
+        
+        class Upstream(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                hits[path] += 1
+                if path == '/js/fundgz_110022.js':
+                    threading.Event().wait(0.2)
+                    body = jsonp
+                elif path == '/f10/F10DataApi.aspx':
+                    body = history
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.upstream = ThreadingHTTPServer(('127.0.0.1', 0), Upstream)
+        base = f"http://127.0.0.1:{self.upstream.server_address[1]}"
+        scraper = FundScraper(delay=0, retries=0, endpoints={
+            'realtime': base + '/js/fundgz_{code}.js',
+            'history': base + '/f10/F10DataApi.aspx',
+        })
+        self.service = FundService(scraper, ttls={'quote': 60})
+        self.server = make_server(self.service, port=0, quiet=True)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        for server in (self.upstream, self.server):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    def tearDown(self):
+        for server in (self.server, self.upstream):
+            server.shutdown()
+            server.server_close()
+    
+    def get(self, path):
+        import urllib.error
+        import urllib.request
+        try:
+            with urllib.request.urlopen(self.base + path, timeout=10) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+    
+    def test_concurrent_quotes_share_one_upstream_request(self):
+        """测试并发的相同请求只触发一次上游抓取，之后命中缓存"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with patch('builtins.print'), ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self.get('/quote/110022'), range(8)))
+            status, quote = self.get('/quote/110022')
+        
+        self.assertEqual({status for status, _ in results}, {200})
+        self.assertEqual(quote['unit_net_value'], 5.8234)
+        self.assertEqual(self.hits['/js/fundgz_110022.js'], 1)
+        stats = self.service.snapshot()
+        self.assertEqual(stats['upstream'], 1)
+        self.assertIn('http_requests_total', {item['name'] for item in stats['upstream_stats']['counters']})
+        self.assertGreaterEqual(stats['hits'], 1)
+    
+    def test_history_and_errors(self):
+        """测试历史净值接口和参数错误"""
+        with patch('builtins.print'):
+            status, records = self.get('/history/110022?start=2024-01-02&end=2024-01-05')
+            self.get('/history/110022?start=2024-01-02&end=2024-01-05')
+            
+            self.assertEqual(status, 200)
+            self.assertEqual(records[0]['date'], '2024-01-05')
+            self.assertEqual(records[0]['unit_net_value'], 1.662)
+            self.assertEqual(self.hits['/f10/F10DataApi.aspx'], 1)
+            
+            self.assertEqual(self.get('/quote/abc')[0], 400)
+            self.assertEqual(self.get('/history/110022?days=x')[0], 400)
+            self.assertEqual(self.get('/unknown/110022')[0], 404)
+            self.assertEqual(self.get('/health'), (200, {'status': 'ok'}))
+        
+        with self.assertRaises(ValueError):
+            from fund_server import FundService
+            FundService(self.service.scraper, ttls={'nav': 10})
+    
+    def test_default_days_share_cache_entry(self):
+        """测试省略days、days=0和days=30是同一个上游请求，共用缓存"""
+        record = {'fund_code': '110022', 'date': '2024-01-05'}
+        with patch.object(self.service.scraper, 'get_fund_history', return_value=[record]) as mock_history:
+            for days in (30, 0, None):
+                self.service.history('110022', days=days)
+        mock_history.assert_called_once_with('110022', days=30, start_date=None, end_date=None)
+
+
+class TestBenchmark(unittest.TestCase):
+    """测试离线基准的测试桩和对比逻辑"""
+    
+    def test_stub_replays_fixtures_through_scraper(self):
+        """测试抓取器经测试桩获取实时数据、档案页和分页历史净值"""
+        from benchmark import StubUpstream, bench_export, bench_history, bench_scrape
+        
+        with StubUpstream(history_records=120).start() as stub, patch('builtins.print'):
+            scraper = FundScraper(delay=0, retries=0, endpoints=stub.endpoints)
+            fund = scraper.scrape_fund('161725', detailed=True)
+            history = scraper.get_fund_history('161725', days=3650)
+            self.assertEqual(fund['fund_code'], '161725')
+            self.assertEqual(fund['unit_net_value'], 3.8734)
+            self.assertEqual(fund['fund_type'], '股票型')
+            self.assertEqual(len(history), 120)
+            self.assertEqual(len({record['date'] for record in history}), 120)
+            
+            self.assertGreater(bench_scrape(stub, funds=3, workers=2)['scrape_funds_per_sec'], 0)
+            metrics, data = bench_history(stub, funds=2, days=30, workers=2)
+            self.assertGreater(metrics['history_rows_per_sec'], 0)
+            self.assertEqual(set(bench_export(data)),
+                             {'export_csv_rows_per_sec', 'export_jsonl_rows_per_sec', 'export_json_rows_per_sec'})
+    
+    def test_compare_flags_regressions_by_direction(self):
+        """测试吞吐下降和耗时上升都判定为退化"""
+        from benchmark import compare
+        
+        baseline = {'scrape_funds_per_sec': 100.0, 'parse_detail_us': 1000.0, 'peak_rss_mb': 90.0}
+        current = {'scrape_funds_per_sec': 85.0, 'parse_detail_us': 900.0, 'peak_rss_mb': 120.0, 'new_us': 1.0}
+        rows = {row['metric']: row for row in compare(current, baseline, threshold=0.1)}
+        
+        self.assertEqual(set(rows), {'scrape_funds_per_sec', 'parse_detail_us', 'peak_rss_mb'})
+        self.assertTrue(rows['scrape_funds_per_sec']['regression'])
+        self.assertFalse(rows['parse_detail_us']['regression'])
+        self.assertAlmostEqual(rows['parse_detail_us']['change'], 0.1)
+        self.assertTrue(rows['peak_rss_mb']['regression'])
+    
+    def test_best_of_rounds(self):
+        """测试多轮结果中吞吐取最大、耗时和内存取最小"""
+        from benchmark import best_of
+        
+        runs = [{'history_rows_per_sec': 5000.0, 'parse_detail_us': 900.0, 'peak_rss_mb': 95.0},
+                {'history_rows_per_sec': 6000.0, 'parse_detail_us': 1000.0, 'peak_rss_mb': 90.0},
+                {'history_rows_per_sec': 4500.0, 'parse_detail_us': 950.0}]
+        self.assertEqual(best_of(runs), {'history_rows_per_sec': 6000.0, 'parse_detail_us': 900.0, 'peak_rss_mb': 90.0})
+
+
+class TestTransport(unittest.TestCase):
+    """测试HTTP流量录制与回放"""
+    
+    def test_replay_reproduces_recorded_run_offline(self):
+        """测试回放得到与录制时相同的结果，且不访问网络"""
+        from benchmark import StubUpstream
+        from transport import RecordTransport, ReplayTransport
+        
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            with StubUpstream(history_records=60).start() as stub:
+                endpoints = stub.endpoints
+                recorder = RecordTransport(tmpdir)
+                scraper = FundScraper(delay=0, retries=0, endpoints=endpoints, transport=recorder)
+                fund = scraper.scrape_fund('161725', detailed=True)
+                history = scraper.get_fund_history('161725', days=3650)
+                recorder.close()
+            
+            # 测试桩已停止，回放不访问网络
+            replayer = ReplayTransport(tmpdir)
+            self.assertEqual(len(replayer), recorder.recorded)
+            scraper = FundScraper(delay=0, retries=0, endpoints=endpoints, transport=replayer)
+            self.assertEqual(scraper.scrape_fund('161725', detailed=True), fund)
+            self.assertEqual(scraper.get_fund_history('161725', days=3650), history)
+            self.assertEqual(replayer.misses, 0)
+            
+            # 存档中没有的请求直接失败，不重试
+            self.assertIsNone(scraper.get_fund_info('000001'))
+            self.assertEqual(replayer.misses, 1)
+    
+    def test_repeated_requests_replay_in_recorded_order(self):
+        """测试同一URL多次请求按录制顺序回放，用完后重复最后一次"""
+        import requests
+        from transport import RecordTransport, ReplayTransport
+        
+        make_response = TestHttpCache.make_response
+        url = 'https://fundgz.1234567.com.cn/js/fundgz_110022.js'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            recorder = RecordTransport(tmpdir)
+            for body in (b'first', b'second'):
+                recorder.record(requests.Request('GET', url + '?rt=1&v=2').prepare(), make_response(body))
+            recorder.close()
+            
+            replayer = ReplayTransport(tmpdir)
+            scraper = FundScraper(delay=0, transport=replayer)
+            bodies = [scraper._request(url, params={'v': 2, 'rt': 1}).content for _ in range(3)]
+            self.assertEqual(bodies, [b'first', b'second', b'second'])
+    
+    def test_replay_misses_do_not_trip_breaker(self):
+        """测试回放时不重试、不熔断，存档缺少的请求不影响同一主机的其他请求"""
+        import requests
+        from transport import RecordTransport, ReplayTransport
+        
+        url = 'http://fund.eastmoney.com/110022.html'
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            recorder = RecordTransport(tmpdir)
+            recorder.record(requests.Request('GET', url).prepare(), TestHttpCache.make_response(b'ok'))
+            recorder.close()
+            
+            replayer = ReplayTransport(tmpdir)
+            scraper = FundScraper(delay=0, retries=3, circuit_threshold=0.5, transport=replayer)
+            self.assertIsNone(scraper.breakers)
+            for i in range(20):
+                self.assertIsNone(scraper._request(f'http://fund.eastmoney.com/{i:06d}.html'))
+            self.assertEqual(scraper._request(url).content, b'ok')
+            self.assertEqual(replayer.misses, 20)
+
+
+class TestUniverse(unittest.TestCase):
+    """测试全部基金代码表"""
+    
+    FIXTURE = Path(__file__).parent / 'fixtures' / 'fundcode_search.js'
+    
+    def make_scraper(self):
+        """返回代码表响应来自录制数据的爬虫"""
+        scraper = FundScraper(delay=0)
+        response = MagicMock()
+        response.content = self.FIXTURE.read_bytes()
+        scraper._request = MagicMock(return_value=response)
+        return scraper
+    
+    def test_parse_fund_list(self):
+        """测试解析fundcode_search.js（带BOM）"""
+        from fund_scraper import parse_fund_list
+        
+        listings = parse_fund_list(self.FIXTURE.read_bytes())
+        self.assertEqual(len(listings), 10)
+        self.assertEqual(listings[0].as_tuple(),
+                         ('000001', 'HXCZHH', '华夏成长混合', '混合型-灵活', 'HUAXIACHENGZHANGHUNHE'))
+        with self.assertRaises(ValueError):
+            parse_fund_list(b'<html>error</html>')
+    
+    def test_index(self):
+        """测试按代码、类型、拼音和名称查找"""
+        from fund_scraper import parse_fund_list
+        from universe import FundUniverse
+        
+        universe = FundUniverse(parse_fund_list(self.FIXTURE.read_bytes()))
+        self.assertIn('110022', universe)
+        self.assertEqual(universe.get('110022').fund_name, '易方达消费行业股票')
+        self.assertEqual(universe.by_type('股票型'), ['110022', '001714'])
+        self.assertEqual(universe.by_type('指数型'), ['000051', '161725'])
+        self.assertEqual(universe.by_type('混合型-偏股'), ['000011', '163402'])
+        self.assertEqual(universe.types()['指数型-股票'], 2)
+        self.assertEqual([f.fund_code for f in universe.search('0000')], ['000001', '000011', '000051'])
+        self.assertEqual([f.fund_code for f in universe.search('hxcz')], ['000001'])
+        self.assertEqual([f.fund_code for f in universe.search('ZHAOSHANG')], ['161725'])
+        self.assertEqual([f.fund_code for f in universe.search('白酒')], ['161725'])
+        self.assertEqual(universe.validate(['163402', '999999', '110022']), (['163402', '110022'], ['999999']))
+    
+    def test_load_caches_with_ttl(self):
+        """测试代码表缓存在本地，有效期内不再下载，下载失败时使用过期的本地文件"""
+        from universe import FundUniverse
+        
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            path = Path(tmpdir) / 'universe.json'
+            scraper = self.make_scraper()
+            universe = FundUniverse.load(scraper, path)
+            self.assertEqual(len(universe), 10)
+            self.assertTrue(path.exists())
+            
+            universe = FundUniverse.load(scraper, path)
+            self.assertEqual(scraper._request.call_count, 1)
+            self.assertEqual(universe.get('000300').fund_type, '债券型-长债')
+            
+            scraper._request.return_value = None
+            universe = FundUniverse.load(scraper, path, ttl=0)
+            self.assertEqual(scraper._request.call_count, 2)
+            self.assertEqual(len(universe), 10)
+    
+    def test_cli_selection_rejects_unknown_codes(self):
+        """测试 --type 选取基金，代码表中不存在的代码在请求之前剔除"""
+        from argparse import Namespace
+        from scrape_funds import select_fund_codes
+        
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            args = Namespace(all=False, type=['股票型'], universe_cache=str(Path(tmpdir) / 'u.json'),
+                             universe_ttl=3600)
+            scraper = self.make_scraper()
+            codes = select_fund_codes(args, scraper, ['161725', '999999'])
+            self.assertEqual(codes, ['161725', '110022', '001714'])
+            
+            # 只指定代码时使用本地代码表校验，不下载
+            args.type = []
+            self.assertEqual(select_fund_codes(args, scraper, ['999999', '518600']), ['518600'])
+            self.assertEqual(scraper._request.call_count, 1)
+
+
+class TestSharding(unittest.TestCase):
+    """测试分片抓取与合并"""
+    
+    CODES = [f'{i:06d}' for i in range(1000)]
+    
+    def test_parse_shard(self):
+        """测试解析 --shard i/N"""
+        from sharding import parse_shard
+        
+        self.assertEqual(parse_shard('1/4'), (1, 4))
+        self.assertEqual(parse_shard(' 4 / 4 '), (4, 4))
+        for text in ('0/4', '5/4', '1/0', '1-4', 'a/b'):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+    
+    def test_shards_partition_codes(self):
+        """测试各分片互不重叠、合起来正好是全部基金，且划分结果固定、大致均衡"""
+        from sharding import select_shard, shard_of
+        
+        shards = [select_shard(self.CODES, i, 4) for i in range(1, 5)]
+        self.assertEqual(sorted(code for shard in shards for code in shard), self.CODES)
+        for shard in shards:
+            self.assertGreater(len(shard), 200)
+        # 不依赖进程的哈希种子，不同机器上结果相同
+        self.assertEqual([shard_of(code, 4) for code in ('110022', '161725', '000001')], [3, 3, 1])
+    
+    def test_dedup_and_shard_path(self):
+        """测试保持顺序的去重和分片输出路径"""
+        from sharding import dedup, shard_path
+        
+        self.assertEqual(dedup(['163402', '110022', '163402', '000001', '110022']), ['163402', '110022', '000001'])
+        self.assertEqual(Path(shard_path('output/history.csv', 2, 4)), Path('output/history.shard-2-of-4.csv'))
+        self.assertEqual(Path(shard_path('ckpt/', 1, 3)), Path('ckpt.shard-1-of-3'))
+    
+    def test_merge_history_outputs(self):
+        """测试合并各分片的历史净值输出：去重、排序，CSV与存储互相转换"""
+        from history_store import HistoryStore
+        from records import NavRecord
+        from sharding import merge_outputs, read_output
+        from sinks import open_sink
+        
+        records = [NavRecord('000001', '2024-01-02', 1.1, 3.1, 0.5), NavRecord('000001', '2024-01-03', 1.2, 3.2, None),
+                   NavRecord('110022', '2024-01-02', 2.1, 2.1, -0.3)]
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            tmp = Path(tmpdir)
+            with open_sink(tmp / 'h.shard-1-of-2.csv') as sink:
+                sink.write_many([records[2], records[0]])
+            store = HistoryStore(tmp / 'h.shard-2-of-2.db')
+            store.append(records[:2])
+            store.close()
+            
+            result = merge_outputs([str(tmp / 'h.shard-1-of-2.csv'), str(tmp / 'h.shard-2-of-2.db')],
+                                   str(tmp / 'merged.csv'))
+            self.assertEqual(result, {'inputs': 2, 'read': 4, 'duplicates': 1, 'written': 3})
+            merged = read_output(str(tmp / 'merged.csv'))
+            self.assertEqual(list(zip(merged['fund_code'], merged['date'])),
+                             [('000001', '2024-01-03'), ('000001', '2024-01-02'), ('110022', '2024-01-02')])
+            
+            merge_outputs([str(tmp / 'merged.csv')], str(tmp / 'merged.db'))
+            self.assertEqual(HistoryStore(tmp / 'merged.db').load('000001'), records[1::-1])
+    
+    def test_merge_quote_outputs(self):
+        """测试合并实时数据输出按基金代码去重，后出现的记录优先"""
+        from sharding import main, merge_outputs, read_output
+        
+        with tempfile.TemporaryDirectory() as tmpdir, patch('builtins.print'):
+            tmp = Path(tmpdir)
+            (tmp / 'a.jsonl').write_text('{"fund_code": "110022", "unit_net_value": 1.0}\n', encoding='utf-8')
+            (tmp / 'b.json').write_text(json.dumps([{'fund_code': '110022', 'unit_net_value': 2.0},
+                                                    {'fund_code': '000001', 'unit_net_value': 3.0}]), encoding='utf-8')
+            result = merge_outputs([str(tmp / 'a.jsonl'), str(tmp / 'b.json')], str(tmp / 'merged.jsonl'))
+            self.assertEqual(result['duplicates'], 1)
+            merged = read_output(str(tmp / 'merged.jsonl'))
+            self.assertEqual(merged.to_dict('records'), [{'fund_code': '000001', 'unit_net_value': 3.0},
+                                                         {'fund_code': '110022', 'unit_net_value': 2.0}])
+            
+            # 实时数据不能合并到历史存储：给出错误信息而不是KeyError
+            with self.assertRaisesRegex(ValueError, 'date'):
+                merge_outputs([str(tmp / 'a.jsonl')], str(tmp / 'merged.db'))
+            self.assertFalse((tmp / 'merged.db').exists())
+            self.assertEqual(main(['-o', str(tmp / 'merged.db'), str(tmp / 'a.jsonl')]), 1)
+
+
+class TestAsyncFundScraper(unittest.IsolatedAsyncioTestCase):
+    """测试AsyncFundScraper类"""
+    
+    JSONP = 'jsonpgz({"name":"易方达消费行业","gsz":"5.8234","jsn":"5.8234","dwjz":"0.12","gztime":"2024-01-15"})'
+    
+    async def test_get_fund_info_matches_sync_engine(self):
+        """测试异步引擎与同步引擎返回相同的数据"""
+        scraper = AsyncFundScraper(delay=0)
+        with patch.object(scraper, '_request', return_value=AsyncResponse(self.JSONP.encode('utf-8'))):
+            result = await scraper.get_fund_info('110022')
+        
+        sync_scraper = FundScraper(delay=0)
+        mock_response = MagicMock()
+        mock_response.text = self.JSONP
+        with patch.object(sync_scraper, '_request', return_value=mock_response):
+            expected = sync_scraper.get_fund_info('110022')
+        
+        self.assertEqual(result, expected)
+    
+    async def test_scrape_multiple_funds_keeps_order(self):
+        """测试并发批量抓取保持输入顺序"""
+        scraper = AsyncFundScraper(delay=0)
+        
+        async def fake_scrape(code, detailed=False):
+            return None if code == '000002' else {'fund_code': code}
+        
+        with patch.object(scraper, 'scrape_fund', side_effect=fake_scrape):
+            results = await scraper.scrape_multiple_funds(['000001', '000002', '000003'])
+        
+        self.assertEqual([r['fund_code'] for r in results], ['000001', '000003'])
+    
+    async def test_fund_page_downloaded_once(self):
+        """测试基本信息和历史业绩共用一次档案页下载，并发调用也只下载一次"""
+        page = (FIXTURES_DIR / 'fundpage_110022.html').read_bytes()
+        scraper = AsyncFundScraper(delay=0)
+        
+        async def fake_request(url, params=None, endpoint=None):
+            await asyncio.sleep(0)
+            return AsyncResponse(page)
+        
+        with patch.object(scraper, '_request', side_effect=fake_request) as mock_request:
+            info, performance, details = await asyncio.gather(
+                scraper.get_fund_info_from_page('110022'),
+                scraper.get_fund_performance('110022'),
+                scraper.get_fund_page_details('110022'),
+            )
+        self.assertEqual(mock_request.call_count, 1)
+        
+        sync_scraper = FundScraper(delay=0)
+        mock_response = MagicMock()
+        mock_response.content = page
+        with patch.object(sync_scraper, '_request', return_value=mock_response):
+            self.assertEqual(info, sync_scraper.get_fund_info_from_page('110022'))
+            self.assertEqual(performance, sync_scraper.get_fund_performance('110022'))
+            self.assertEqual(details, sync_scraper.get_fund_page_details('110022'))
+        
+        # 请求失败的结果不缓存
+        scraper.clear_page_cache()
+        with patch.object(scraper, '_request', return_value=None) as mock_request:
+            self.assertIsNone(await scraper.get_fund_performance('110022'))
+            self.assertIsNone(await scraper.get_fund_info_from_page('110022'))
+        self.assertEqual(mock_request.call_count, 2)
+    
+    async def test_history_rejects_invalid_date_range(self):
+        """测试异步引擎与同步引擎一样拒绝错误或颠倒的日期区间"""
+        scraper = AsyncFundScraper(delay=0)
+        with patch.object(scraper, '_request') as mock_request:
+            self.assertIsNone(await scraper.get_fund_history('110022', start_date='2024-13-01'))
+            self.assertIsNone(await scraper.get_fund_history(
+                '110022', start_date='2024-02-01', end_date='2024-01-01'))
+        mock_request.assert_not_called()
+    
+    async def test_request_retries_server_errors(self):
+        """测试5xx响应按退避重试，并记录统计"""
+        scraper = AsyncFundScraper(delay=0, retries=2, backoff=0)
+        statuses = [503, 200]
+        
+        class FakeResponse:
+            def __init__(self, status):
+                self.status = status
+                self.charset = 'utf-8'
+                self.headers = {}
+            
+            async def read(self):
+                return b'ok'
+            
+            def raise_for_status(self):
+                if self.status >= 400:
+                    raise aiohttp.ClientResponseError(MagicMock(), (), status=self.status)
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+        
+        session = MagicMock(closed=False)
+        session.get.side_effect = lambda url, params=None: FakeResponse(statuses.pop(0))
+        scraper.session = session
+        scraper._semaphore = asyncio.Semaphore(1)
+        
+        response = await scraper._request('https://fundgz.1234567.com.cn/js/fundgz_110022.js',
+                                          endpoint='realtime')
+        self.assertEqual(response.text, 'ok')
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(scraper.collector.counter('retries_total'), 1)
+        self.assertEqual(scraper.collector.counter('http_requests_total', status='503'), 1)
+        self.assertEqual(scraper.collector.counter('http_requests_total', status='200'), 1)
+    
+    async def test_missing_fundgz_skipped_on_second_call(self):
+        """测试fundgz返回404后记录负缓存，下次直接使用备用数据源"""
+        scraper = AsyncFundScraper(delay=0)
+        not_found = aiohttp.ClientResponseError(MagicMock(), (), status=404)
+        
+        async def fake_detail(code):
+            return {'fund_code': code}
+        
+        with patch.object(scraper, '_request', side_effect=not_found) as mock_request, \
+                patch.object(scraper, 'get_fund_from_detail_page', side_effect=fake_detail):
+            self.assertEqual(await scraper.get_fund_info('510300'), {'fund_code': '510300'})
+            self.assertEqual(await scraper.get_fund_info('510300'), {'fund_code': '510300'})
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(scraper.collector.counter('fallbacks_total', reason='known_missing'), 1)
+    
+    async def test_batch_bounded_by_max_concurrency(self):
+        """测试批量抓取同时处理的基金数不超过max_concurrency"""
+        scraper = AsyncFundScraper(delay=0, max_concurrency=3)
+        running = 0
+        peak = 0
+        
+        async def fake_scrape(code, detailed=False):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0)
+            running -= 1
+            return {'fund_code': code}
+        
+        codes = [f"{i:06d}" for i in range(20)]
+        with patch.object(scraper, 'scrape_fund', side_effect=fake_scrape):
+            results = await scraper.scrape_multiple_funds(codes)
+        
+        self.assertEqual([r['fund_code'] for r in results], codes)
+        self.assertEqual(peak, 3)
+
+
 class TestCommandLineInterface(unittest.TestCase):
     """测试命令行工具"""
     
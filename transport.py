@@ -0,0 +1,243 @@
+"""
+HTTP流量录制与回放
+作为requests的传输适配器挂在FundScraper的Session上（位于_request之下，缓存、重试、限流、统计照常工作）：
+
+- RecordTransport: 照常访问网络，同时把每一对请求/响应写入存档目录（SQLite，正文zlib压缩）
+- ReplayTransport: 完全从存档返回响应，不访问网络；存档一次性读入内存
+
+同一URL被请求多次时（如监控模式的轮询）按录制顺序依次回放，用完后重复最后一次的响应，
+因此回放一次运行可以得到与录制时相同的结果。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+ARCHIVE_FILENAME = 'traffic.db'
+
+# 存档中保存的是解压后的正文，这些响应头回放时不再适用
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class ReplayMissError(requests.RequestException):
+    """回放存档中没有该请求（不重试，_request直接返回None）"""
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化URL作为存档键（查询参数按名称排序，与参数顺序无关）
+    
+    Args:
+        url: 完整URL（含查询参数）
+    
+    Returns:
+        规范化后的URL
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+
+
+def _open_archive(directory: str) -> sqlite3.Connection:
+    """打开（必要时创建）存档数据库"""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path / ARCHIVE_FILENAME), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS exchanges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            method TEXT NOT NULL,
+            key TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            reason TEXT,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            elapsed REAL NOT NULL,
+            recorded_at REAL NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+class RecordingAdapter(HTTPAdapter):
+    """访问网络并把请求/响应写入存档的适配器"""
+
+    def __init__(self, transport: 'RecordTransport', **kwargs):
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if not kwargs.get('stream'):
+            self.transport.record(request, response)
+        return response
+
+
+class RecordTransport:
+    """录制模式：照常访问网络，每个响应写入存档目录"""
+
+    def __init__(self, directory: str, compress_level: int = 6):
+        """
+        初始化录制
+        
+        Args:
+            directory: 存档目录（不存在时创建，已有存档时追加）
+            compress_level: 正文的zlib压缩级别
+        """
+        self.directory = str(directory)
+        self.compress_level = compress_level
+        self.recorded = 0
+        self._conn = _open_archive(self.directory)
+        self._lock = threading.Lock()
+
+    def adapter(self, pool_size: int) -> RecordingAdapter:
+        """
+        生成挂到Session上的适配器
+        
+        Args:
+            pool_size: 连接池大小
+        
+        Returns:
+            RecordingAdapter对象
+        """
+        return RecordingAdapter(self, pool_connections=10, pool_maxsize=pool_size)
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response):
+        """
+        写入一对请求/响应
+        
+        Args:
+            request: 已发送的请求
+            response: 收到的响应
+        """
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+        body = zlib.compress(response.content, self.compress_level)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO exchanges (method, key, url, status, reason, headers, body, elapsed, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request.method, normalize_url(request.url), request.url, response.status_code, response.reason,
+                 json.dumps(headers, ensure_ascii=False), body, response.elapsed.total_seconds(), time.time())
+            )
+            self._conn.commit()
+            self.recorded += 1
+
+    def close(self):
+        """关闭存档"""
+        with self._lock:
+            self._conn.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """从内存中的存档返回响应的适配器"""
+
+    def __init__(self, transport: 'ReplayTransport'):
+        super().__init__()
+        self.transport = transport
+
+    def send(self, request, **kwargs):
+        return self.transport.replay(request)
+
+    def close(self):
+        pass
+
+
+class ReplayTransport:
+    """回放模式：所有响应来自存档，不访问网络"""
+
+    def __init__(self, directory: str):
+        """
+        读取存档
+        
+        Args:
+            directory: RecordTransport录制的存档目录
+        
+        Raises:
+            FileNotFoundError: 目录中没有存档
+        """
+        path = Path(directory) / ARCHIVE_FILENAME
+        if not path.exists():
+            raise FileNotFoundError(f"未找到回放存档: {path}")
+        self.directory = str(directory)
+        self.replayed = 0
+        self.misses = 0
+        # (方法, 规范化URL) -> 按录制顺序的 [(状态码, 原因, 响应头, 正文)]
+        self._exchanges: Dict[Tuple[str, str], List[Tuple[int, str, Dict, bytes]]] = {}
+        self._cursors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        
+        conn = sqlite3.connect(str(path))
+        try:
+            rows = conn.execute("SELECT method, key, status, reason, headers, body FROM exchanges ORDER BY id")
+            for method, key, status, reason, headers, body in rows:
+                self._exchanges.setdefault((method, key), []).append(
+                    (status, reason, json.loads(headers), zlib.decompress(body)))
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+    def adapter(self, pool_size: int) -> ReplayAdapter:
+        """
+        生成挂到Session上的适配器
+        
+        Args:
+            pool_size: 连接池大小（回放时不使用）
+        
+        Returns:
+            ReplayAdapter对象
+        """
+        return ReplayAdapter(self)
+
+    def replay(self, request: requests.PreparedRequest) -> requests.Response:
+        """
+        返回存档中与请求对应的下一个响应
+        
+        Args:
+            request: 请求
+        
+        Returns:
+            Response对象
+        
+        Raises:
+            ReplayMissError: 存档中没有该请求
+        """
+        key = (request.method, normalize_url(request.url))
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                self.misses += 1
+                raise ReplayMissError(f"回放存档中没有该请求: {request.url}", request=request)
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.replayed += 1
+        status, reason, headers, body = exchanges[min(cursor, len(exchanges) - 1)]
+        
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,249 @@
+"""
+全部基金代码表
+从天天基金网的fundcode_search.js下载全部基金的代码、拼音缩写、名称和类型，
+保存在本地JSON文件中（默认每天更新一次），并在内存中按代码、拼音、名称和类型建立索引：
+
+- 按代码查找、校验输入的基金代码（不存在的代码不会发出请求）
+- 按类型筛选（如 股票型、债券型，也可以指定细分类型 债券型-长债）
+- 按代码前缀、拼音缩写/全拼前缀或名称片段搜索
+
+用法:
+    universe = FundUniverse.load(scraper)
+    codes = universe.by_type('股票型')
+    universe.search('HXCZ')
+"""
+
+import bisect
+import json
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fund_scraper import FundScraper
+from records import FundListing
+
+
+DEFAULT_UNIVERSE_PATH = '.fund_universe.json'
+DEFAULT_UNIVERSE_TTL = 24 * 3600
+
+FUND_CODE_PATTERN = re.compile(r'^\d{6}$')
+
+
+def is_valid_fund_code(code: str) -> bool:
+    """
+    检查基金代码格式（6位数字）
+    
+    Args:
+        code: 基金代码
+    
+    Returns:
+        格式是否正确
+    """
+    return bool(FUND_CODE_PATTERN.match(code))
+
+
+class FundUniverse:
+    """全部基金代码表的内存索引"""
+
+    def __init__(self, listings: Iterable[FundListing], fetched_at: Optional[float] = None):
+        """
+        建立索引
+        
+        Args:
+            listings: FundListing列表
+            fetched_at: 代码表的下载时间（时间戳），默认为当前时间
+        """
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self._by_code: Dict[str, FundListing] = {}
+        self._by_type: Dict[str, List[str]] = {}
+        # 拼音缩写和全拼的有序列表，前缀搜索时二分查找
+        self._spellings: List[Tuple[str, str]] = []
+        
+        for listing in listings:
+            if listing.fund_code in self._by_code:
+                continue
+            self._by_code[listing.fund_code] = listing
+            self._by_type.setdefault(listing.fund_type, []).append(listing.fund_code)
+            for spelling in {listing.abbreviation.upper(), listing.pinyin.upper()}:
+                if spelling:
+                    self._spellings.append((spelling, listing.fund_code))
+        self._codes = sorted(self._by_code)
+        self._spellings.sort()
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._by_code
+
+    def __iter__(self) -> Iterator[FundListing]:
+        return iter(self._by_code.values())
+
+    def get(self, code: str) -> Optional[FundListing]:
+        """
+        按代码查找
+        
+        Args:
+            code: 基金代码
+        
+        Returns:
+            FundListing，不存在时为None
+        """
+        return self._by_code.get(code)
+
+    def codes(self) -> List[str]:
+        """全部基金代码（按代码表顺序）"""
+        return list(self._by_code)
+
+    def types(self) -> Counter:
+        """
+        各类型的基金数量
+        
+        Returns:
+            Counter {类型: 数量}
+        """
+        return Counter({fund_type: len(codes) for fund_type, codes in self._by_type.items()})
+
+    def by_type(self, fund_type: str) -> List[str]:
+        """
+        按类型筛选基金代码
+        
+        大类（如 债券型）同时匹配其下的细分类型（债券型-长债、债券型-混合债等）。
+        
+        Args:
+            fund_type: 类型名称
+        
+        Returns:
+            基金代码列表（按代码表顺序）
+        """
+        prefix = fund_type + '-'
+        return [code for listing_type, codes in self._by_type.items()
+                if listing_type == fund_type or listing_type.startswith(prefix)
+                for code in codes]
+
+    def search(self, query: str, limit: int = 20) -> List[FundListing]:
+        """
+        搜索基金
+        
+        全数字按代码前缀匹配，字母按拼音缩写或全拼前缀匹配（不区分大小写），其他按名称片段匹配。
+        
+        Args:
+            query: 搜索内容
+            limit: 最多返回的结果数
+        
+        Returns:
+            FundListing列表
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if query.isdigit():
+            start = bisect.bisect_left(self._codes, query)
+            codes = []
+            for code in self._codes[start:]:
+                if not code.startswith(query) or len(codes) >= limit:
+                    break
+                codes.append(code)
+        elif query.isascii():
+            query = query.upper()
+            start = bisect.bisect_left(self._spellings, (query, ''))
+            codes = []
+            for spelling, code in self._spellings[start:]:
+                if not spelling.startswith(query) or len(codes) >= limit:
+                    break
+                if code not in codes:
+                    codes.append(code)
+        else:
+            codes = [listing.fund_code for listing in self._by_code.values() if query in listing.fund_name][:limit]
+        return [self._by_code[code] for code in codes]
+
+    def validate(self, codes: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """
+        区分代码表中存在和不存在的基金代码
+        
+        Args:
+            codes: 基金代码
+        
+        Returns:
+            (valid, invalid)元组，均保持输入顺序
+        """
+        valid, invalid = [], []
+        for code in codes:
+            (valid if code in self._by_code else invalid).append(code)
+        return valid, invalid
+
+    def is_stale(self, ttl: float = DEFAULT_UNIVERSE_TTL) -> bool:
+        """代码表是否已超过有效期"""
+        return time.time() - self.fetched_at >= ttl
+
+    def save(self, path: str = DEFAULT_UNIVERSE_PATH):
+        """
+        保存到本地JSON文件
+        
+        Args:
+            path: 文件路径
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'fetched_at': self.fetched_at, 'funds': [listing.as_tuple() for listing in self]}
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        tmp.replace(path)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_UNIVERSE_PATH) -> Optional['FundUniverse']:
+        """
+        读取本地保存的代码表
+        
+        Args:
+            path: 文件路径
+        
+        Returns:
+            FundUniverse，文件不存在或损坏时为None
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls((FundListing(*row) for row in data['funds']), fetched_at=data['fetched_at'])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"基金代码表缓存已损坏，将重新下载: {path}, 错误: {e}")
+            return None
+
+    @classmethod
+    def load(cls, scraper: FundScraper, path: str = DEFAULT_UNIVERSE_PATH,
+             ttl: float = DEFAULT_UNIVERSE_TTL, refresh: bool = False) -> Optional['FundUniverse']:
+        """
+        读取代码表：本地文件未过期时直接使用，否则重新下载并保存
+        
+        下载失败时退回使用过期的本地文件。
+        
+        Args:
+            scraper: 用于下载的爬虫实例（限流、重试、缓存照常生效）
+            path: 本地文件路径
+            ttl: 有效期（秒）
+            refresh: 忽略本地文件，强制重新下载
+        
+        Returns:
+            FundUniverse，下载失败且没有本地文件时为None
+        """
+        cached = cls.from_file(path)
+        if cached is not None and not refresh and not cached.is_stale(ttl):
+            return cached
+        
+        listings = scraper.get_fund_list()
+        if not listings:
+            if cached is not None:
+                print(f"基金代码表下载失败，使用过期的本地文件: {path}")
+            return cached
+        
+        universe = cls(listings)
+        try:
+            universe.save(path)
+        except OSError as e:
+            print(f"保存基金代码表失败: {path}, 错误: {e}")
+        return universe
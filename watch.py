@@ -0,0 +1,163 @@
+"""
+盘中估值监控
+常驻进程按固定间隔刷新关注列表的实时估值（fundgz的gsz/gztime），只输出估值发生变化的基金，
+每行一条JSON。复用同一个FundScraper（连接池、限速器、缓存都保持热状态），
+非交易时段自动放慢轮询频率。
+"""
+
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from records import to_plain
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo('Asia/Shanghai')
+except Exception:
+    # 没有时区数据库时使用固定的UTC+8（中国不实行夏令时，结果相同）
+    MARKET_TZ = timezone(timedelta(hours=8))
+
+
+# A股交易时段（北京时间），盘中估值只在这些时间内更新
+TRADING_SESSIONS = (((9, 30), (11, 30)), ((13, 0), (15, 0)))
+
+
+def _session_bounds(day: datetime) -> List[Tuple[datetime, datetime]]:
+    """某个交易日各交易时段的起止时间"""
+    return [(day.replace(hour=start[0], minute=start[1], second=0, microsecond=0),
+             day.replace(hour=end[0], minute=end[1], second=0, microsecond=0))
+            for start, end in TRADING_SESSIONS]
+
+
+def is_trading_time(now: Optional[datetime] = None) -> bool:
+    """
+    判断是否处于交易时段（只按周一至周五判断，不含法定节假日）
+    
+    Args:
+        now: 时间（带时区），默认当前时间
+    
+    Returns:
+        是否处于交易时段
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return any(start <= now < end for start, end in _session_bounds(now))
+
+
+def seconds_until_open(now: Optional[datetime] = None) -> float:
+    """
+    距离下一个交易时段开始的秒数
+    
+    Args:
+        now: 时间（带时区），默认当前时间
+    
+    Returns:
+        秒数，处于交易时段内时为0
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if is_trading_time(now):
+        return 0.0
+    day = now
+    for _ in range(8):
+        if day.weekday() < 5:
+            for start, _end in _session_bounds(day):
+                if start > now:
+                    return (start - now).total_seconds()
+        day = (day + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return 0.0
+
+
+def next_poll_delay(interval: float, idle_interval: float, now: Optional[datetime] = None) -> float:
+    """
+    计算下一次轮询前的等待时间
+    
+    交易时段内按interval轮询；非交易时段按idle_interval轮询，但不会错过下一次开盘。
+    
+    Args:
+        interval: 交易时段内的轮询间隔（秒）
+        idle_interval: 非交易时段的轮询间隔（秒）
+        now: 时间（带时区），默认当前时间
+    
+    Returns:
+        等待秒数
+    """
+    until_open = seconds_until_open(now)
+    if until_open <= 0:
+        return interval
+    return max(interval, min(idle_interval, until_open))
+
+
+class FundWatcher:
+    """按间隔轮询实时估值，只输出发生变化的基金"""
+
+    def __init__(self, scraper, fund_codes: List[str], out: TextIO = None,
+                 interval: float = 60.0, idle_interval: float = 900.0,
+                 clock: Callable[[], datetime] = None, sleep: Callable[[float], None] = time.sleep):
+        """
+        初始化监控
+        
+        Args:
+            scraper: FundScraper实例（在整个监控期间复用）
+            fund_codes: 关注的基金代码
+            out: JSONL输出流，默认标准输出
+            interval: 交易时段内的轮询间隔（秒）
+            idle_interval: 非交易时段的轮询间隔（秒）
+            clock: 返回当前时间的函数（测试用）
+            sleep: 等待函数（测试用）
+        """
+        self.scraper = scraper
+        self.fund_codes = list(fund_codes)
+        self.out = out or sys.stdout
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.clock = clock or (lambda: datetime.now(MARKET_TZ))
+        self.sleep = sleep
+        # 基金代码 -> 上一次输出时的(估值时间, 估值)
+        self._last: Dict[str, Tuple] = {}
+        self.polls = 0
+        self.emitted = 0
+
+    def poll(self) -> int:
+        """
+        刷新一次关注列表，输出估值有变化的基金（首次轮询输出全部）
+        
+        Returns:
+            本次输出的基金数
+        """
+        changed = 0
+        for quote in self.scraper.iter_funds(self.fund_codes):
+            key = (quote['update_date'], quote['unit_net_value'])
+            code = quote['fund_code']
+            if self._last.get(code) == key:
+                continue
+            self._last[code] = key
+            self.out.write(json.dumps(quote, ensure_ascii=False, default=to_plain) + '\n')
+            changed += 1
+        self.out.flush()
+        self.polls += 1
+        self.emitted += changed
+        return changed
+
+    def run(self, max_polls: Optional[int] = None):
+        """
+        持续轮询，直到Ctrl-C或达到max_polls次
+        
+        Args:
+            max_polls: 最多轮询次数，None表示不限
+        """
+        try:
+            while max_polls is None or self.polls < max_polls:
+                changed = self.poll()
+                now = self.clock()
+                delay = next_poll_delay(self.interval, self.idle_interval, now)
+                print(f"[{now:%H:%M:%S}] 第{self.polls}次轮询: {changed} 个基金估值变化，"
+                      f"{delay:.0f} 秒后再次刷新{'' if is_trading_time(now) else '（非交易时段）'}")
+                if max_polls is not None and self.polls >= max_polls:
+                    break
+                self.sleep(delay)
+        except KeyboardInterrupt:
+            print(f"\n监控已停止，共轮询 {self.polls} 次，输出 {self.emitted} 条估值变化")